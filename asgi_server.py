@@ -0,0 +1,127 @@
+"""
+ASGI serving mode (--server asgi).
+Runs the dashboard's Flask routes and Socket.IO events on uvicorn with
+python-socketio's asyncio server instead of the Werkzeug development server.
+Socket.IO connections are asyncio tasks, so idle clients cost no threads;
+Flask routes (including streaming responses) run on a worker thread pool.
+
+Motor updates are still produced by the broadcaster thread. Its emits are
+handed to the event loop through a bounded thread-safe queue and sent by a
+single pump task, so a slow loop drops the oldest updates instead of
+blocking the broadcaster (and the DDS callback behind it).
+"""
+
+import asyncio
+import threading
+import time
+
+DEFAULT_WSGI_WORKERS = 32   # concurrent Flask requests / streaming responses
+DEFAULT_MAX_PENDING = 64    # emits queued for the event loop before the oldest is dropped
+
+
+class AsgiSocketIO:
+    """
+    Drop-in for the Flask-SocketIO object in ASGI mode: provides the subset of
+    its API used by MotorBroadcaster and main() (emit, server.enter_room /
+    leave_room, start_background_task, sleep, run).
+
+    handlers maps Socket.IO event names to functions called as
+    handler(sid, *args); 'connect' handlers receive (sid, auth).
+    """
+
+    def __init__(self, app, handlers, wsgi_workers=DEFAULT_WSGI_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING):
+        try:
+            from a2wsgi import WSGIMiddleware
+            import socketio
+            import uvicorn  # noqa: F401  (checked here so a missing install fails before startup)
+        except ImportError as e:
+            raise RuntimeError(f"--server asgi requires uvicorn and a2wsgi ({e}). "
+                               "Install them with: uv sync --extra asgi (or pip install -e '.[asgi]')") from None
+
+        self.sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+        self.server = self  # MotorBroadcaster calls socketio.server.enter_room(...)
+        self.asgi_app = socketio.ASGIApp(
+            self.sio,
+            other_asgi_app=WSGIMiddleware(app, workers=wsgi_workers),
+            on_startup=self._startup,
+        )
+        self.max_pending = max_pending
+        self._loop = None
+        self._queue = None
+        self._pump_task = None
+        # Counters (read via stats())
+        self.queued = 0    # emits handed over by other threads
+        self.sent = 0      # emits delivered to Socket.IO
+        self.dropped = 0   # emits discarded because the queue was full
+        for event, handler in handlers.items():
+            self._register(event, handler)
+
+    def _register(self, event, handler):
+        if event == 'connect':
+            async def on_event(sid, environ, auth=None):
+                return handler(sid, auth)
+        else:
+            async def on_event(sid, *args):
+                return handler(sid, *args)
+        self.sio.on(event, on_event)
+
+    async def _startup(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        while True:
+            event, data, to, namespace = await self._queue.get()
+            try:
+                await self.sio.emit(event, data, to=to, namespace=namespace)
+                self.sent += 1
+            except Exception as e:
+                print(f"Error emitting {event}: {e}")
+
+    def _enqueue(self, item):
+        # Runs on the event loop thread
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    # Flask-SocketIO compatible API
+
+    def emit(self, event, data, to=None, namespace='/'):
+        """Queue an emit from any thread; it is sent by the event loop."""
+        if self._loop is None:
+            return  # server not started yet, nobody is connected
+        self.queued += 1
+        self._loop.call_soon_threadsafe(self._enqueue, (event, data, to, namespace))
+
+    def enter_room(self, sid, room, namespace='/'):
+        # Called from event handlers, i.e. on the event loop thread
+        self.sio.manager.basic_enter_room(sid, namespace, room)
+
+    def leave_room(self, sid, room, namespace='/'):
+        self.sio.manager.basic_leave_room(sid, namespace, room)
+
+    def start_background_task(self, target, *args, **kwargs):
+        """Run target on a daemon thread (it may block; emits cross over via the queue)."""
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def sleep(self, seconds=0):
+        time.sleep(seconds)
+
+    def run(self, app=None, host='0.0.0.0', port=8081, debug=False):
+        """Serve until interrupted (app is accepted for signature compatibility and ignored)."""
+        import uvicorn
+        uvicorn.run(self.asgi_app, host=host, port=port,
+                    log_level='info' if debug else 'warning')
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+        }
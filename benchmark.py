@@ -0,0 +1,911 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the dashboard data path.
+Runs against synthetic LowState messages, so no robot or Unitree SDK is needed.
+
+Usage:
+    python benchmark.py callback [--readers 0 1 4 16] [--seconds 3] [--rate 500]
+    python benchmark.py load [--servers threading asgi] [--clients 10 50 200]
+    python benchmark.py assets [--robot g1] [--mbps 20] [--rtt-ms 5]
+    python benchmark.py kinematics [--robot g1] [--rate 500] [--batch 500 5000 30000]
+    python benchmark.py record [--seconds 30] [--rate 500] [--dir /tmp/telemetry-bench]
+    python benchmark.py recording [--dir /tmp/telemetry-24h] [--hours 24] [--motor 3] [--above 90]
+    python benchmark.py visual [--clients 1 10 50] [--windows 2] [--cycles 5]
+    python benchmark.py adapt [--fps 15] [--kbps 8000] [--link-kbps 4000]
+    python benchmark.py capture [--display :99] [--windows 4] [--seconds 5]
+
+The load test runs dashboard_3d.py fed with synthetic samples (`serve`), so it
+needs unitree_sdk2py importable, plus aiohttp for the Socket.IO test clients.
+"""
+
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from threading import Event, Lock, Thread
+from types import SimpleNamespace
+
+import numpy as np
+from flask import Flask, Response, jsonify
+
+from config_g1 import MOTOR_NAMES, MOTOR_TO_MESH
+from motor_layout import MotorLayout, MotorSnapshot
+
+NUM_G1_MOTORS = 35  # motor_state length of a unitree_hg LowState
+
+
+def make_messages(count, num_motors=NUM_G1_MOTORS, seed=0):
+    """Synthetic G1-style LowState messages with drifting temperatures and joint angles."""
+    rng = np.random.default_rng(seed)
+    messages = []
+    for i in range(count):
+        motors = [SimpleNamespace(temperature=[40 + (i + k) % 7, 45 + (i + k) % 9],
+                                  q=float(rng.normal()), dq=float(rng.normal()),
+                                  tau_est=float(rng.normal()))
+                  for k in range(num_motors)]
+        messages.append(SimpleNamespace(motor_state=motors))
+    return messages
+
+
+def percentiles_us(samples):
+    """p50/p90/p99/max of a list of durations in seconds, as microseconds."""
+    if not samples:
+        return {}
+    values = np.array(samples) * 1e6
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': values.max()}
+
+
+class LockedState:
+    """Former data path: one lock held by the callback and by /api/motors while it serializes."""
+
+    name = 'locked'
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.lock = Lock()
+        self.motor_data = layout.to_payload(None)
+
+    def callback(self, msg):
+        frame = self.layout.decode(msg, time.time())
+        payload = self.layout.to_payload(frame)
+        with self.lock:
+            self.motor_data = payload
+
+    def get_motors(self):
+        with self.lock:
+            return jsonify(self.motor_data)
+
+
+class SwapState:
+    """Current data path: immutable MotorSnapshot published by reference assignment."""
+
+    name = 'swap'
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.snapshot = None
+        self.seq = 0
+
+    def callback(self, msg):
+        frame = self.layout.decode(msg, time.time())
+        self.seq += 1
+        self.snapshot = MotorSnapshot(self.layout, frame, self.seq)
+
+    def get_motors(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return jsonify(self.layout.to_payload(None))
+        response = Response(snapshot.json(), mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        return response
+
+
+def run_callback(state, messages, readers, seconds, rate):
+    """Drive state.callback at `rate` Hz while `readers` threads poll /api/motors."""
+    app = Flask(__name__)
+    app.add_url_rule('/api/motors', 'get_motors', state.get_motors)
+    state.callback(messages[0])
+
+    stop = Event()
+    served = [0] * readers
+
+    def reader(k):
+        client = app.test_client()
+        while not stop.is_set():
+            client.get('/api/motors')
+            served[k] += 1
+
+    threads = [Thread(target=reader, args=(k,), daemon=True) for k in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    period = 1.0 / rate
+    deadline = time.perf_counter() + seconds
+    next_tick = time.perf_counter()
+    i = 0
+    while next_tick < deadline:
+        msg = messages[i % len(messages)]
+        start = time.perf_counter()
+        state.callback(msg)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(served)
+
+
+def bench_callback(args):
+    layout = MotorLayout('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+    messages = make_messages(64)
+    print(f"DDS callback latency at {args.rate:g} Hz with N concurrent /api/motors readers (us)")
+    print(f"{'mode':<8} {'N':>3} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>9} {'reads/s':>9}")
+    for readers in args.readers:
+        for state_cls in (LockedState, SwapState):
+            state = state_cls(layout)
+            latencies, served = run_callback(state, messages, readers, args.seconds, args.rate)
+            p = percentiles_us(latencies)
+            print(f"{state.name:<8} {readers:>3} {p['p50']:>8.1f} {p['p90']:>8.1f} "
+                  f"{p['p99']:>8.1f} {p['max']:>9.1f} {served / args.seconds:>9.0f}")
+
+
+def feed_samples(callback, messages, rate):
+    """Call callback(msg) at `rate` Hz forever, like the DDS subscriber thread."""
+    period = 1.0 / rate
+    next_tick = time.perf_counter()
+    i = 0
+    while True:
+        callback(messages[i % len(messages)])
+        i += 1
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def bench_serve(args):
+    """Run dashboard_3d with synthetic LowState samples instead of a robot connection."""
+    import dashboard_3d as dashboard
+
+    robot = dashboard.add_robot(dashboard.DEFAULT_ROBOT, args.robot)
+    if args.server == 'asgi':
+        dashboard.server = dashboard.create_asgi_server()
+    robot.broadcaster = dashboard.create_broadcaster(robot, args.emit_hz, dashboard.server)
+    robot.broadcaster.start()
+    num_motors = NUM_G1_MOTORS if args.robot == 'g1' else 20
+    messages = make_messages(64, num_motors)
+    Thread(target=feed_samples, args=(dashboard.low_state_callback, messages, args.rate),
+           daemon=True).start()
+    print(f"Serving simulated {args.robot.upper()} ({args.server}) on port {args.port}", flush=True)
+    if args.server == 'asgi':
+        dashboard.server.run(dashboard.app, host='127.0.0.1', port=args.port)
+    else:
+        dashboard.socketio.run(dashboard.app, host='127.0.0.1', port=args.port,
+                               allow_unsafe_werkzeug=True)
+
+
+def wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+async def measure_clients(url, count, seconds):
+    """Connect `count` Socket.IO clients and collect motor_update latencies (s) for `seconds`."""
+    import socketio
+
+    latencies = []
+    clients = []
+
+    def make_client():
+        client = socketio.AsyncClient(reconnection=False)
+
+        @client.on('motor_update')
+        def on_update(data):
+            latencies.append(time.time() - data['timestamp'])
+        return client
+
+    async def connect(client):
+        try:
+            await client.connect(url, transports=['websocket'], wait_timeout=10)
+            return client
+        except Exception:
+            return None
+
+    results = await asyncio.gather(*(connect(make_client()) for _ in range(count)))
+    clients = [client for client in results if client is not None]
+    await asyncio.sleep(1.0)  # let the first keyframes and connection bursts pass
+    latencies.clear()
+    await asyncio.sleep(seconds)
+    samples = list(latencies)
+    await asyncio.gather(*(client.disconnect() for client in clients), return_exceptions=True)
+    return len(clients), samples
+
+
+def _client_worker(job):
+    url, count, seconds = job
+    return asyncio.run(measure_clients(url, count, seconds))
+
+
+def run_clients(url, count, seconds, procs):
+    """Split `count` clients over `procs` processes so the clients are not the bottleneck."""
+    procs = max(1, min(procs, count))
+    jobs = [(url, count // procs + (1 if k < count % procs else 0), seconds) for k in range(procs)]
+    if procs == 1:
+        return _client_worker(jobs[0])
+    with multiprocessing.Pool(procs) as pool:
+        results = pool.map(_client_worker, jobs)
+    return sum(r[0] for r in results), [s for r in results for s in r[1]]
+
+
+def bench_load(args):
+    try:
+        import aiohttp  # noqa: F401  (python-socketio's asyncio client transport)
+    except ImportError:
+        print("The load test needs aiohttp: pip install aiohttp")
+        sys.exit(1)
+
+    print(f"motor_update latency (sample decoded -> client received) at --emit-hz {args.emit_hz:g}, ms")
+    print(f"{'server':<10} {'clients':>7} {'connected':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'msg/s/client':>13}")
+    for server in args.servers:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'serve', '--robot', args.robot,
+             '--server', server, '--port', str(args.port), '--emit-hz', str(args.emit_hz),
+             '--rate', str(args.rate)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_port(args.port):
+                print(f"{server:<10} server did not start")
+                continue
+            for count in args.clients:
+                connected, samples = run_clients(f'http://127.0.0.1:{args.port}', count,
+                                                 args.seconds, args.client_procs)
+                p = percentiles_us(samples)
+                if not p:
+                    print(f"{server:<10} {count:>7} {connected:>9} {'no updates received':>26}")
+                    continue
+                rate = len(samples) / args.seconds / max(connected, 1)
+                print(f"{server:<10} {count:>7} {connected:>9} {p['p50'] / 1e3:>8.1f} "
+                      f"{p['p90'] / 1e3:>8.1f} {p['p99'] / 1e3:>8.1f} {rate:>13.1f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def page_assets(robot, assets):
+    """Asset paths a cold load of index_<robot>.html fetches: page scripts/styles, then every URDF mesh."""
+    app = Flask(__name__)
+    app.add_template_global(assets.url, 'asset_url')
+    app.add_template_global(assets.urls, 'asset_urls')
+    with app.test_request_context():
+        from flask import render_template
+        html = render_template(f'index_{robot}.html')
+    hashed = {assets.url(path): path for path in assets.urls('')}
+    paths = [hashed[url] for url in re.findall(r'(?:src|href)="([^"]+)"', html) if url in hashed]
+
+    config = importlib.import_module(f'config_{robot}')
+    with open(os.path.join(config.URDF_PATH, config.URDF_FILENAME)) as f:
+        meshes = re.findall(r'<mesh\s+filename="[^"]*?meshes/([^"]+)"', f.read())
+    paths += sorted({f'{robot}/meshes/{name}' for name in meshes})
+    return len(html.encode('utf-8')), paths
+
+
+def bench_assets(args):
+    from static_assets import StaticAssets
+
+    assets = StaticAssets()
+    print("Building missing gzip/brotli variants (first run only)...", flush=True)
+    assets.compress()
+    html_bytes, paths = page_assets(args.robot, assets)
+
+    app = Flask(__name__)
+    app.add_url_rule('/assets/<path:filename>', 'serve_assets', assets.serve)
+    client = app.test_client()
+
+    def transfer_s(nbytes, requests):
+        # Meshes are fetched one after another, so every request pays a round trip
+        return nbytes * 8 / (args.mbps * 1e6) + requests * args.rtt_ms / 1e3
+
+    before = html_bytes + sum(os.path.getsize(os.path.join(assets.root, path)) for path in paths)
+    after = html_bytes
+    encodings = {}
+    start = time.perf_counter()
+    for path in paths:
+        response = client.get(assets.url(path), headers={'Accept-Encoding': 'gzip, deflate, br'})
+        after += len(response.data)
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        encodings[encoding] = encodings.get(encoding, 0) + 1
+    serve_ms = (time.perf_counter() - start) * 1e3
+    requests = len(paths) + 1
+
+    print(f"Cold load of index_{args.robot}.html: {requests} requests, "
+          f"modelled at {args.mbps:g} Mbit/s and {args.rtt_ms:g} ms RTT")
+    print(f"{'':<8} {'bytes':>12} {'time (s)':>9}")
+    print(f"{'before':<8} {before:>12,} {transfer_s(before, requests):>9.2f}")
+    print(f"{'after':<8} {after:>12,} {transfer_s(after, requests):>9.2f}")
+    print(f"Encodings served: {encodings}; server time {serve_ms:.0f} ms (no recompression)")
+    print(f"Warm reload: before {requests} revalidations, after 1 (the page; assets are immutable)")
+
+
+def per_joint_transforms(model, joint_names, joint_q):
+    """Reference forward kinematics: one 4x4 product per joint, like the browser does."""
+    from kinematics import rpy_matrix
+
+    world = {model.root: np.eye(4)}
+    for name in joint_names:
+        joint = model.joints[name]
+        local = np.eye(4)
+        local[:3, :3] = rpy_matrix(joint['rpy'])
+        local[:3, 3] = joint['xyz']
+        if joint['type'] in ('revolute', 'continuous'):
+            x, y, z = np.asarray(joint['axis']) / np.linalg.norm(joint['axis'])
+            k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+            angle = joint_q.get(name, 0.0)
+            motion = np.eye(4)
+            motion[:3, :3] = np.eye(3) + np.sin(angle) * k + (1 - np.cos(angle)) * (k @ k)
+            local = local @ motion
+        world[joint['child']] = world[joint['parent']] @ local
+    return world
+
+
+def bench_kinematics(args):
+    from kinematics import ForwardKinematics
+    from urdf_model import RobotModel
+
+    config = importlib.import_module(f'config_{args.robot}')
+    model = RobotModel(args.robot.upper(), os.path.join(config.URDF_PATH, config.URDF_FILENAME),
+                       config.MOTOR_TO_MESH)
+    layout = MotorLayout(args.robot.upper(), config.MOTOR_NAMES, config.MOTOR_TO_MESH)
+    fk = ForwardKinematics(model, layout.motor_ids)
+    rng = np.random.default_rng(0)
+    samples = int(args.rate * args.seconds)
+    q = rng.uniform(-1.5, 1.5, size=(samples, layout.num_motors))
+    column_joint = [(k, model.motor_joints.get(motor_id)) for k, motor_id in enumerate(layout.motor_ids)]
+
+    def joint_q(row):
+        return {name: row[k] for k, name in column_joint if name}
+
+    # Both implementations must agree before their timings mean anything
+    reference = per_joint_transforms(model, fk.joint_names, joint_q(q[0]))
+    rotations, translations = fk.transforms(q[0])
+    error = max(max(np.abs(reference[name][:3, :3] - rotations[i]).max(),
+                    np.abs(reference[name][:3, 3] - translations[i]).max())
+                for i, name in enumerate(fk.link_names))
+
+    print(f"{args.robot.upper()}: {fk.num_links} links, {fk.num_joints} joints "
+          f"({len(model.motor_joints)} driven), {fk.num_levels} tree levels; max difference {error:.1e}")
+    print(f"\nLive path: one sample per LowState message, budget {1e6 / args.rate:.0f} us at {args.rate:g} Hz (us)")
+    print(f"{'method':<12} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>9}")
+    for label, compute in (('per-joint', lambda row: per_joint_transforms(model, fk.joint_names, joint_q(row))),
+                           ('batched', fk.transforms),
+                           ('+ quats', fk.poses)):
+        latencies = []
+        for row in q[:min(samples, 2000)]:
+            start = time.perf_counter()
+            compute(row)
+            latencies.append(time.perf_counter() - start)
+        p = percentiles_us(latencies)
+        print(f"{label:<12} {p['p50']:>8.1f} {p['p90']:>8.1f} {p['p99']:>8.1f} {p['max']:>9.1f}")
+
+    print("\nHistory replay: T samples in one call (poses with quaternions)")
+    print(f"{'T':>7} {'ms/call':>9} {'samples/s':>11} {'x realtime':>11}")
+    for steps in args.batch:
+        batch = rng.uniform(-1.5, 1.5, size=(steps, layout.num_motors))
+        start = time.perf_counter()
+        fk.poses(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{steps:>7} {elapsed * 1e3:>9.1f} {steps / elapsed:>11,.0f} {steps / elapsed / args.rate:>11.1f}")
+
+
+def bench_record(args):
+    import shutil
+    from recording import Recorder
+
+    layout = MotorLayout('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+    messages = make_messages(64)
+    shutil.rmtree(args.dir, ignore_errors=True)
+    recorder = Recorder(args.dir, layout, chunk_rows=int(args.rate * 10), chunk_seconds=10.0)
+    recorder.start()
+
+    # Same pacing as the DDS callback; time only what the recorder adds to it
+    latencies = []
+    period = 1.0 / args.rate
+    start = next_tick = time.perf_counter()
+    i = 0
+    while next_tick < start + args.seconds:
+        frame = layout.decode(messages[i % len(messages)], time.time())
+        begin = time.perf_counter()
+        recorder.append(frame)
+        latencies.append(time.perf_counter() - begin)
+        i += 1
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    recorder.close()
+
+    stats = recorder.stats()
+    p = percentiles_us(latencies)
+    per_sample = stats['bytes'] / max(stats['recorded'], 1)
+    print(f"Recorder at {args.rate:g} Hz for {args.seconds:g} s: {stats['recorded']} samples, "
+          f"{stats['dropped']} dropped, {stats['written']} chunks")
+    print(f"append() on the callback thread (us): p50 {p['p50']:.1f}  p90 {p['p90']:.1f}  "
+          f"p99 {p['p99']:.1f}  max {p['max']:.1f}")
+    print(f"Writer thread busy {stats['write_seconds'] / args.seconds * 100:.1f}% of the time "
+          f"({stats['write_seconds'] / max(stats['written'], 1) * 1e3:.1f} ms per chunk, fsync included)")
+    print(f"Disk: {per_sample:.0f} bytes/sample = {per_sample * args.rate / 1e3:.0f} kB/s = "
+          f"{per_sample * args.rate * 86400 / 1e9:.1f} GB/day")
+    shutil.rmtree(args.dir, ignore_errors=True)
+
+
+def scan_recording(path, since, until, motor, field, above):
+    """Index-free baseline: open every chunk header, then scan every overlapping chunk in order."""
+    import glob
+    from recording import CHUNK_SUFFIX, Chunk
+
+    first_hit, read = None, 0
+    for file in sorted(glob.glob(os.path.join(path, '*' + CHUNK_SUFFIX))):
+        chunk = Chunk(file)
+        if chunk.end < since or chunk.start > until:
+            continue
+        read += 1
+        values = np.asarray(chunk.column(field)[:, motor])
+        hits = np.flatnonzero(values >= above)
+        if len(hits):
+            first_hit = float(chunk.column('timestamp')[hits[0]])
+        chunk.close()
+        if first_hit is not None:
+            break
+    return first_hit, read
+
+
+def bench_recording(args):
+    from recording import Recording, synthesize
+    from telemetry_index import INDEX_FILENAME, TelemetryIndex
+
+    if not os.path.isdir(args.dir) or not os.listdir(args.dir):
+        print(f"Writing a synthetic {args.hours:g} h, {args.rate:g} Hz G1 recording to {args.dir} (once)...", flush=True)
+        start = time.perf_counter()
+        synthesize(args.dir, 'g1', args.hours * 3600, args.rate)
+        print(f"  {time.perf_counter() - start:.0f} s")
+
+    index_file = os.path.join(args.dir, INDEX_FILENAME)
+    if os.path.exists(index_file):
+        os.remove(index_file)
+    start = time.perf_counter()
+    index = TelemetryIndex(args.dir)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index = TelemetryIndex(args.dir)
+    load = time.perf_counter() - start
+    stats = index.stats()
+    size = sum(os.path.getsize(os.path.join(args.dir, name)) for name in os.listdir(args.dir))
+    print(f"{stats['chunks']} chunks, {stats['samples']:,} samples, {size / 1e9:.1f} GB, "
+          f"{(stats['end'] - stats['start']) / 3600:.1f} h; index {os.path.getsize(index_file) / 1e6:.1f} MB")
+    print(f"Index: built from chunk headers in {build * 1e3:.0f} ms, loaded from {INDEX_FILENAME} in {load * 1e3:.0f} ms")
+
+    column = sorted(MOTOR_NAMES).index(args.motor)
+    field, above = 'temp2', args.above
+    row = "{:<44} {:>9.1f} {:>12}"
+    print(f"\n{'query (motor ' + str(args.motor) + ', ' + field + ' >= ' + format(above, 'g') + ')':<44} "
+          f"{'ms':>9} {'chunks read':>12}")
+
+    start = time.perf_counter()
+    first_scan, scan_read = scan_recording(args.dir, -np.inf, np.inf, column, field, above)
+    print(row.format('first crossing, scanning every chunk', (time.perf_counter() - start) * 1e3, scan_read))
+    start = time.perf_counter()
+    matches, considered, read = index.search(motors=[column], field=field, above=above, limit=1)
+    print(row.format('first crossing, index-pruned', (time.perf_counter() - start) * 1e3, read))
+    if not matches:
+        print(f"Motor {args.motor} never reaches {above:g} in this recording; try a lower --above")
+        return
+    first = matches[0]['start']
+    assert first_scan == first, (first_scan, first)
+
+    start = time.perf_counter()
+    recording = Recording(args.dir)
+    rows = sum(len(timestamps) for timestamps, _ in recording.blocks(first - 300, first, rows=1 << 20))
+    print(row.format('5 min before it, opening every chunk', (time.perf_counter() - start) * 1e3,
+                     sum(1 for c in recording.chunks if c.end >= first - 300 and c.start <= first)))
+    start = time.perf_counter()
+    result = index.read(first - 300, first, [column], ['temp1', 'temp2', 'q'], max_points=rows)
+    print(row.format('5 min before it, index-pruned', (time.perf_counter() - start) * 1e3, result['chunks_read']))
+
+    start = time.perf_counter()
+    matches, considered, read = index.search(motors=[column], field=field, above=above, limit=10000)
+    print(row.format(f'all {len(matches)} episodes, index-pruned', (time.perf_counter() - start) * 1e3, read))
+    print(f"\nFirst crossing at +{(first - stats['start']) / 3600:.2f} h; "
+          f"{considered} of {stats['chunks']} chunks can hold {field} >= {above:g} for motor {args.motor}")
+
+
+def synthetic_windows(count, width, height, seed=0):
+    """Desktop-like window images (text lines and a plot), as capture_app_windows returns them."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    windows = []
+    for i in range(count):
+        image = np.full((height, width, 3), 245, dtype=np.uint8)
+        cv2.rectangle(image, (0, 0), (width, 40), (60, 60, 60), -1)
+        for y in range(70, height // 2, 24):
+            words = ' '.join('x' * int(n) for n in rng.integers(2, 10, 8))
+            cv2.putText(image, words, (12, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (30, 30, 30), 1)
+        x = np.linspace(0, width - 1, 200)
+        y = height * 3 // 4 + 80 * np.sin(x / 40 + i) + rng.normal(0, 8, x.size)
+        cv2.polylines(image, [np.stack([x, y], axis=1).astype(np.int32)], False, (200, 80, 20), 2)
+        windows.append({'id': f'bench_{i}', 'name': f'window {i}', 'image': image,
+                        'width': width, 'height': height, 'app': 'bench'})
+    return windows
+
+
+def put_dropping_oldest(frame_queue, frame):
+    """Per-client queue put of the previous visual.py: drop the oldest frame when full."""
+    import queue
+
+    if frame_queue.full():
+        try:
+            frame_queue.get_nowait()
+        except queue.Empty:
+            pass
+    frame_queue.put_nowait(frame)
+
+
+def bench_visual(args):
+    import queue
+    from collections import defaultdict
+
+    import cv2
+    from visual_frames import JPEG_QUALITY, EncodedFrames, FramePublisher, StreamSlots, WindowCache, encode_jpeg
+
+    windows = synthetic_windows(args.windows, args.width, args.height)
+    # Same 3-column, 400x300 tiles as visual.create_tiled_view
+    rows = (len(windows) + 2) // 3
+    tiled_image = np.zeros((rows * 300, 1200, 3), dtype=np.uint8)
+    for i, window in enumerate(windows):
+        tile = cv2.resize(window['image'], (360, 270))
+        y, x = (i // 3) * 300 + 15, (i % 3) * 400 + 20
+        tiled_image[y:y + 270, x:x + 360] = tile
+
+    def new_queues():
+        return (defaultdict(lambda: queue.Queue(maxsize=10)),
+                defaultdict(lambda: defaultdict(lambda: queue.Queue(maxsize=10))))
+
+    def per_client(client_ids, target):
+        # Original broadcast_frames: every client re-encodes the same images into its queues
+        tiled_queues, window_queues = target
+        for client_id in client_ids:
+            _, buffer = cv2.imencode('.jpg', tiled_image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            put_dropping_oldest(tiled_queues[client_id], buffer.tobytes())
+            for i, window in enumerate(windows):
+                _, buffer = cv2.imencode('.jpg', window['image'], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                put_dropping_oldest(window_queues[client_id][i], buffer.tobytes())
+
+    def shared_queues(client_ids, target):
+        # Encoded once, the same bytes queued for every client
+        tiled_queues, window_queues = target
+        tiled, encoded = encode_jpeg(tiled_image), [encode_jpeg(window['image']) for window in windows]
+        for client_id in client_ids:
+            put_dropping_oldest(tiled_queues[client_id], tiled)
+            for i, data in enumerate(encoded):
+                put_dropping_oldest(window_queues[client_id][i], data)
+
+    # Two sets of the same images: alternating them makes every window a change to encode
+    grab_sets = (windows, [dict(window, image=window['image'].copy()) for window in windows])
+
+    def new_publisher():
+        # No bitrate target, so quality stays at JPEG_QUALITY like the other strategies
+        return FramePublisher(StreamSlots(len(windows), bitrate=float('inf')), len(windows))
+
+    def shared_slots(client_ids, publisher):
+        # Current broadcast_frames: encoded once, published to one slot per stream.
+        # One simulated second per cycle keeps every stream due for a frame.
+        publisher.submit(grab_sets[publisher.published % 2], lambda grabs: tiled_image,
+                         now=float(publisher.published))
+
+    def held_bytes(target):
+        # Frames kept alive for viewers that have not read them yet (shared bytes counted once)
+        if isinstance(target, FramePublisher):
+            frames = [slot.latest()[1] for slot in [target.slots.tiled] + target.slots.windows]
+        else:
+            tiled_queues, window_queues = target
+            frames = [f for q in tiled_queues.values() for f in q.queue]
+            frames += [f for per in window_queues.values() for q in per.values() for f in q.queue]
+        return sum(len(f) for f in {id(f): f for f in frames if f is not None}.values())
+
+    strategies = (('per-client encode, queues', per_client, new_queues),
+                  ('encode once, queues', shared_queues, new_queues),
+                  ('encode once, latest-frame slots', shared_slots, new_publisher))
+    print(f"Capture cycle without the capture itself: {len(windows)} windows of {args.width}x{args.height} "
+          f"+ tiled view, JPEG quality {JPEG_QUALITY}, {args.cycles} cycles per step")
+    print(f"{'fan-out':<32} {'clients':>7} {'cycle ms':>9} {'held MB':>8}")
+    for count in args.clients:
+        client_ids = list(range(count))
+        for name, cycle, make_target in strategies:
+            target = make_target()
+            for _ in range(10):   # fill the 10-frame queues, as a stalled viewer would
+                cycle(client_ids, target)
+            start = time.perf_counter()
+            for _ in range(args.cycles):
+                cycle(client_ids, target)
+            elapsed = (time.perf_counter() - start) / args.cycles
+            print(f"{name:<32} {count:>7} {elapsed * 1e3:>9.1f} {held_bytes(target) / 1e6:>8.1f}")
+
+    # A viewer reading at half the capture rate falls behind a 10-frame queue; a slot always has the newest
+    slot = StreamSlots(1).tiled
+    backlog = queue.Queue(maxsize=10)
+    queue_lag = slot_lag = sent = 0
+    for cycle in range(1, 101):
+        slot.publish(cycle)
+        put_dropping_oldest(backlog, cycle)
+        if cycle % 2 == 0:
+            queue_lag = cycle - backlog.get_nowait()
+            sent, captured = slot.wait(sent, timeout=0)
+            slot_lag = cycle - captured
+    print(f"\nViewer reading at half the capture rate, after 100 cycles: gets a frame {queue_lag} cycles old "
+          f"from a 10-frame queue, {slot_lag} from the slot")
+
+    # Idle desktop: every grab returns the same pixels (as fresh arrays, like XShmCapture.capture)
+    def tile(grabs):
+        return tiled_image
+
+    def previous_loop(deadline):
+        # Former broadcast_frames: encode every cycle, no sleep
+        cycles = 0
+        while time.perf_counter() < deadline:
+            grabs = [dict(window, image=window['image'].copy()) for window in windows]
+            frames = EncodedFrames(encode_jpeg(tile(grabs)), [encode_jpeg(window['image']) for window in grabs])
+            StreamSlots(len(grabs)).publish(frames)
+            cycles += 1
+        return cycles
+
+    def change_detected_loop(deadline):
+        cache, publisher = WindowCache(), FramePublisher(StreamSlots(len(windows)), len(windows))
+        cycles = 0
+        while time.perf_counter() < deadline:
+            grabs = []
+            for window in windows:
+                raw = window['image'].copy()
+                cached = cache.lookup(window['id'], raw)
+                if cached is None:
+                    cached = dict(window, image=raw)
+                    cache.store(window['id'], raw, cached)
+                grabs.append(cached)
+            publisher.submit(grabs, tile)
+            cycles += 1
+            if publisher.delay:
+                time.sleep(publisher.delay)
+        return cycles, publisher.published
+
+    print(f"\nIdle desktop for {args.idle_seconds:g} s, capture excluded:")
+    start_cpu = time.process_time()
+    cycles = previous_loop(time.perf_counter() + args.idle_seconds)
+    print(f"  encode every cycle:   {(time.process_time() - start_cpu) / args.idle_seconds * 100:5.1f}% CPU, "
+          f"{cycles} cycles encoded")
+    start_cpu = time.process_time()
+    cycles, published = change_detected_loop(time.perf_counter() + args.idle_seconds)
+    print(f"  change detection:     {(time.process_time() - start_cpu) / args.idle_seconds * 100:5.1f}% CPU, "
+          f"{cycles} cycles, {published} encoded")
+
+
+def bench_adapt(args):
+    from visual_frames import FramePublisher, StreamSlots
+
+    # A window whose content changes every frame (scrolling text), streamed to one viewer on a slow link
+    base = synthetic_windows(1, args.width, args.height)[0]
+    variants = [dict(base, image=np.roll(base['image'], 24 * k, axis=0)) for k in range(16)]
+    slots = StreamSlots(1, args.fps, args.kbps * 1000 / 8)
+    publisher = FramePublisher(slots, 1)
+    slot = slots.windows[0]
+    stop = Event()
+    received = [0]
+
+    def viewer():
+        # Same skip detection as visual.generate_frames; sending a frame takes size / link rate
+        seq = 0
+        while not stop.is_set():
+            latest = slot.wait(seq, timeout=0.5)
+            if latest is None:
+                continue
+            if seq and latest[0] > seq + 1:
+                slot.controller.on_dropped(latest[0] - seq - 1)
+            seq, frame = latest
+            time.sleep(len(frame) / (args.link_kbps * 1000 / 8))
+            received[0] += 1
+
+    thread = Thread(target=viewer, daemon=True)
+    thread.start()
+    print(f"One {args.width}x{args.height} window changing every frame; target {args.fps:g} fps, "
+          f"{args.kbps:g} kbit/s; viewer link {args.link_kbps:g} kbit/s")
+    print(f"{'s':>4} {'quality':>8} {'scale':>6} {'fps limit':>10} {'fps':>6} {'kbit/s':>8} {'viewer fps':>11} {'skipped':>8}")
+    start = time.monotonic()
+    next_report, k, last_received = start + 1.0, 0, 0
+    while time.monotonic() - start < args.seconds:
+        publisher.submit([variants[k % len(variants)]], lambda windows: windows[0]['image'])
+        k += 1
+        now = time.monotonic()
+        if now >= next_report:
+            c = slot.controller
+            print(f"{now - start:>4.0f} {c.quality:>8} {c.scale:>6.2f} {c.fps_limit:>10.1f} {c.fps:>6.1f} "
+                  f"{c.bytes_per_second * 8 / 1000:>8.0f} {received[0] - last_received:>11} {c.dropped:>8}")
+            last_received = received[0]
+            next_report += 1.0
+        time.sleep(publisher.delay)
+    stop.set()
+    thread.join()
+
+
+def subprocess_capture(window_id, display):
+    """Subprocess path of visual.capture_clean_window ('import' method): 7 processes and a PNG per frame."""
+    import tempfile
+
+    import cv2
+
+    def run(command):
+        return subprocess.run(f"DISPLAY={display} {command}", shell=True, capture_output=True, text=True, timeout=5)
+
+    focused = run("xdotool getwindowfocus").stdout.strip()
+    run(f"wmctrl -i -r {window_id} -b add,above")
+    root = re.search(r'0x[0-9a-f]+', run("xwininfo -root | grep 'Window id:'").stdout)
+    if root:
+        run(f"xdotool windowfocus {root.group(0)}")
+    with tempfile.NamedTemporaryFile(suffix='.png') as file:
+        run(f"import -window {window_id} -frame -quality 100 {file.name}")
+        img = cv2.imread(file.name)
+    run(f"wmctrl -i -r {window_id} -b remove,above")
+    if focused:
+        run(f"xdotool windowfocus {focused}")
+    return img
+
+
+def bench_capture(args):
+    from x11_capture import XShmCapture
+
+    try:
+        listing = subprocess.run(['wmctrl', '-l'], env=dict(os.environ, DISPLAY=args.display),
+                                 capture_output=True, text=True, timeout=5)
+    except FileNotFoundError:
+        print("wmctrl not found: sudo apt install wmctrl x11-utils xdotool imagemagick")
+        return
+    window_ids = [line.split()[0] for line in listing.stdout.splitlines() if line.strip()][:args.windows]
+    if not window_ids:
+        print(f"No windows on {args.display}; start the visual blueprint (or Xvfb {args.display} and some apps) first")
+        return
+    try:
+        capture = XShmCapture(args.display)
+    except RuntimeError as e:
+        print(f"XShm capture unavailable: {e}")
+        return
+
+    print(f"Window capture on {args.display}, {args.seconds:g} s per window and method")
+    print(f"{'window':<12} {'method':<11} {'size':>10} {'fps':>8} {'ms/frame':>9} {'failed':>7}")
+    for window_id in window_ids:
+        methods = (('subprocess', lambda: subprocess_capture(window_id, args.display)),
+                   ('xshm', lambda: capture.capture(window_id)))
+        for name, grab in methods:
+            frames = failed = 0
+            size = '-'
+            start = time.perf_counter()
+            while time.perf_counter() - start < args.seconds:
+                img = grab()
+                frames += 1
+                if img is None:
+                    failed += 1
+                else:
+                    size = f"{img.shape[1]}x{img.shape[0]}"
+            elapsed = time.perf_counter() - start
+            print(f"{window_id:<12} {name:<11} {size:>10} {frames / elapsed:>8.1f} "
+                  f"{elapsed / frames * 1e3:>9.1f} {failed:>7}")
+    capture.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard data path micro-benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('callback', help='LowState callback latency under concurrent /api/motors readers')
+    p.add_argument('--readers', type=int, nargs='+', default=[0, 1, 4, 16],
+                   help='Numbers of concurrent reader threads to test (default: 0 1 4 16)')
+    p.add_argument('--seconds', type=float, default=3.0, help='Duration per run (default: 3)')
+    p.add_argument('--rate', type=float, default=500.0, help='Callback rate in Hz (default: 500)')
+    p.set_defaults(func=bench_callback)
+
+    p = sub.add_parser('serve', help='Run dashboard_3d fed with synthetic LowState samples')
+    p.add_argument('--robot', choices=['g1', 'h1'], default='g1')
+    p.add_argument('--server', choices=['threading', 'asgi'], default='threading')
+    p.add_argument('--port', type=int, default=8090)
+    p.add_argument('--emit-hz', type=float, default=20.0)
+    p.add_argument('--rate', type=float, default=500.0, help='Synthetic LowState rate in Hz (default: 500)')
+    p.set_defaults(func=bench_serve)
+
+    p = sub.add_parser('load', help='Emit latency vs. number of connected Socket.IO clients')
+    p.add_argument('--robot', choices=['g1', 'h1'], default='g1')
+    p.add_argument('--servers', nargs='+', choices=['threading', 'asgi'], default=['threading', 'asgi'])
+    p.add_argument('--clients', type=int, nargs='+', default=[10, 50, 200],
+                   help='Numbers of concurrent clients to test (default: 10 50 200)')
+    p.add_argument('--seconds', type=float, default=5.0, help='Measurement time per step (default: 5)')
+    p.add_argument('--client-procs', type=int, default=1,
+                   help='Processes to spread the clients over (default: 1)')
+    p.add_argument('--port', type=int, default=8090)
+    p.add_argument('--emit-hz', type=float, default=20.0)
+    p.add_argument('--rate', type=float, default=500.0, help='Synthetic LowState rate in Hz (default: 500)')
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser('assets', help='Cold-load bytes and time of the dashboard page, before/after precompression')
+    p.add_argument('--robot', choices=['g1', 'h1'], default='g1')
+    p.add_argument('--mbps', type=float, default=20.0, help='Link bandwidth in Mbit/s (default: 20)')
+    p.add_argument('--rtt-ms', type=float, default=5.0, help='Round-trip time in ms (default: 5)')
+    p.set_defaults(func=bench_assets)
+
+    p = sub.add_parser('kinematics', help='Forward kinematics per sample and over history batches')
+    p.add_argument('--robot', choices=['g1', 'h1'], default='g1')
+    p.add_argument('--rate', type=float, default=500.0, help='LowState rate in Hz (default: 500)')
+    p.add_argument('--seconds', type=float, default=4.0, help='Seconds of samples for the live path (default: 4)')
+    p.add_argument('--batch', type=int, nargs='+', default=[500, 5000, 30000],
+                   help='History batch sizes in samples (default: 500 5000 30000)')
+    p.set_defaults(func=bench_kinematics)
+
+    p = sub.add_parser('record', help='Cost of the on-disk recorder on the callback thread, and disk usage')
+    p.add_argument('--seconds', type=float, default=30.0, help='Duration (default: 30)')
+    p.add_argument('--rate', type=float, default=500.0, help='Callback rate in Hz (default: 500)')
+    p.add_argument('--dir', default='/tmp/telemetry-bench', help='Scratch recording directory (deleted afterwards)')
+    p.set_defaults(func=bench_record)
+
+    p = sub.add_parser('recording', help='Index-pruned vs. full-scan queries over a synthetic 24 h recording')
+    p.add_argument('--dir', default='/tmp/telemetry-24h',
+                   help='Recording directory; a synthetic one is written there if empty (default: /tmp/telemetry-24h)')
+    p.add_argument('--hours', type=float, default=24.0, help='Length of the synthetic recording (default: 24)')
+    p.add_argument('--rate', type=float, default=500.0, help='Sample rate of the synthetic recording (default: 500)')
+    p.add_argument('--motor', type=int, default=3, help='Motor id to query (default: 3)')
+    p.add_argument('--above', type=float, default=90.0, help='Winding temperature threshold (default: 90)')
+    p.set_defaults(func=bench_recording)
+
+    p = sub.add_parser('visual', help='/visual capture-cycle time vs. number of stream viewers')
+    p.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50],
+                   help='Numbers of connected clients to test (default: 1 10 50)')
+    p.add_argument('--windows', type=int, default=2, help='Captured windows (default: 2)')
+    p.add_argument('--width', type=int, default=960, help='Window width (default: 960, half of the :99 screen)')
+    p.add_argument('--height', type=int, default=1080, help='Window height (default: 1080)')
+    p.add_argument('--cycles', type=int, default=5, help='Capture cycles per step (default: 5)')
+    p.add_argument('--idle-seconds', type=float, default=5.0,
+                   help='Duration of the idle-desktop comparison (default: 5)')
+    p.set_defaults(func=bench_visual)
+
+    p = sub.add_parser('adapt', help='/visual stream controller: quality/scale/fps for one viewer on a slow link')
+    p.add_argument('--fps', type=float, default=15.0, help='Target frames per second (default: 15)')
+    p.add_argument('--kbps', type=float, default=8000.0, help='Target bitrate per stream in kbit/s (default: 8000)')
+    p.add_argument('--link-kbps', type=float, default=4000.0, help="Viewer's link in kbit/s (default: 4000)")
+    p.add_argument('--width', type=int, default=960, help='Window width (default: 960)')
+    p.add_argument('--height', type=int, default=1080, help='Window height (default: 1080)')
+    p.add_argument('--seconds', type=float, default=20.0, help='Duration (default: 20)')
+    p.set_defaults(func=bench_adapt)
+
+    p = sub.add_parser('capture', help='Frames per second per window: XShm vs. subprocess capture on a live display')
+    p.add_argument('--display', default=':99', help='X display of the visual blueprint (default: :99)')
+    p.add_argument('--windows', type=int, default=4, help='Windows to measure (default: 4)')
+    p.add_argument('--seconds', type=float, default=5.0, help='Measurement time per window and method (default: 5)')
+    p.set_defaults(func=bench_capture)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
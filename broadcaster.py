@@ -0,0 +1,237 @@
+"""
+Rate-limited Socket.IO broadcaster for motor updates.
+Decouples DDS ingest from client fan-out: the LowState callback only stores
+the latest sample, and a background loop emits coalesced snapshots.
+
+Clients subscribe to named channels (one Socket.IO room each), such as a
+wire format ('json', 'binary', 'delta') or a content/rate pair like
+'temps@1Hz'. Each channel runs at its own rate and encodes the latest sample
+once per emit, and only while it has subscribers, no matter how many clients
+it has.
+
+Occasional events for every client (such as thermal alerts) are queued with
+post() and sent by the same loop, so the ingest side never emits itself.
+
+With a `room`, one broadcaster serves one robot of a fleet: channel rooms are
+named '<room>/<channel>' and posted events go to the room of the robot's
+clients only.
+"""
+
+import collections
+import time
+from threading import Lock
+
+
+class _Channel:
+    """One Socket.IO room with its event name, encoder and emit interval."""
+
+    __slots__ = ('name', 'room', 'event', 'encode', 'interval', 'members', 'next_due', 'last_sample', 'emitted')
+
+    def __init__(self, name, room, event, encode, interval):
+        self.name = name
+        self.room = room
+        self.event = event
+        self.encode = encode
+        self.interval = interval
+        self.members = set()
+        self.next_due = 0.0
+        self.last_sample = 0   # sample number last sent on this channel
+        self.emitted = 0
+
+
+MAX_POSTED = 256   # queued post() events; the oldest are dropped beyond this
+
+
+class MotorBroadcaster:
+    """Coalesces motor samples and emits the newest one to each channel at its rate."""
+
+    def __init__(self, socketio, emit_hz=20.0, namespace='/', room=None):
+        if emit_hz <= 0:
+            raise ValueError(f"emit_hz must be positive, got {emit_hz}")
+        self.socketio = socketio
+        self.namespace = namespace
+        self.room = room   # all of this broadcaster's clients; None: everyone connected
+        self.interval = 1.0 / emit_hz   # default channel interval and idle poll period
+        self._lock = Lock()
+        self._latest = None
+        self._sample_no = 0
+        self._fresh = False
+        self._running = False
+        self._channels = {}       # name -> _Channel
+        self._client_channels = {}  # sid -> set of channel names
+        self._posted = collections.deque()  # (event, data) for all clients, see post()
+        # Counters (read via stats())
+        self.received = 0     # samples handed over by the ingest side
+        self.emitted = 0      # ticks on which at least one channel was sent
+        self.coalesced = 0    # samples replaced by a newer one before the next tick
+        self.dropped = 0      # channel payloads lost because encoding/emitting failed
+        self.late_ticks = 0   # ticks that started after their deadline had passed
+        self.posted = 0       # events queued with post()
+
+    def add_channel(self, name, event, encode, hz=None):
+        """
+        Register a channel: its subscribers receive `event` with encode(sample, sample_no)
+        at `hz` (default: the broadcaster's emit_hz). Encoders may return None to skip a tick.
+        """
+        if hz is not None and hz <= 0:
+            raise ValueError(f"Channel {name}: hz must be positive, got {hz}")
+        with self._lock:
+            room = f'{self.room}/{name}' if self.room else name
+            self._channels[name] = _Channel(name, room, event, encode, 1.0 / hz if hz else self.interval)
+
+    @property
+    def channels(self):
+        return list(self._channels)
+
+    def subscribe(self, sid, names):
+        """Replace a connected client's channel subscriptions."""
+        names = set(names)
+        for name in names:
+            if name not in self._channels:
+                raise ValueError(f"Unknown channel: {name}")
+        self.unsubscribe(sid)
+        if self.room:
+            self.socketio.server.enter_room(sid, self.room, namespace=self.namespace)
+        for name in names:
+            self.socketio.server.enter_room(sid, self._channels[name].room, namespace=self.namespace)
+        with self._lock:
+            self._client_channels[sid] = names
+            for name in names:
+                channel = self._channels[name]
+                channel.members.add(sid)
+                # Stateful encoders (delta) must resend a full frame for the newcomer
+                if hasattr(channel.encode, 'request_keyframe'):
+                    channel.encode.request_keyframe()
+                    channel.last_sample = 0
+
+    def unsubscribe(self, sid):
+        """Remove a client from all of its channels (on disconnect or resubscribe)."""
+        with self._lock:
+            names = self._client_channels.pop(sid, ())
+            rooms = [self._channels[name].room for name in names]
+            for name in names:
+                self._channels[name].members.discard(sid)
+        if self.room:
+            rooms.append(self.room)
+        for room in rooms:
+            try:
+                self.socketio.server.leave_room(sid, room, namespace=self.namespace)
+            except Exception:
+                # Client already gone; Socket.IO drops its rooms on disconnect
+                pass
+
+    def publish(self, sample):
+        """Store the latest sample. Called from the DDS callback thread; never blocks on I/O."""
+        with self._lock:
+            if self._fresh:
+                self.coalesced += 1
+            self._latest = sample
+            self._sample_no += 1
+            self._fresh = True
+            self.received += 1
+
+    def post(self, event, data):
+        """Queue an event for all clients (of the room), sent on the next tick. Never blocks on I/O."""
+        with self._lock:
+            if len(self._posted) >= MAX_POSTED:
+                self._posted.popleft()
+                self.dropped += 1
+            self._posted.append((event, data))
+            self.posted += 1
+
+    def start(self):
+        """Start the emit loop as a Socket.IO background task."""
+        if self._running:
+            return
+        self._running = True
+        self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        self._running = False
+
+    def _due_channels(self, now):
+        """Take the latest sample, the subscribed channels that are due and behind it, and posted events."""
+        with self._lock:
+            self._fresh = False
+            sample, sample_no = self._latest, self._sample_no
+            due = []
+            next_wake = now + self.interval
+            for channel in self._channels.values():
+                if not channel.members:
+                    continue
+                if channel.next_due <= now:
+                    if sample is not None and channel.last_sample != sample_no:
+                        due.append(channel)
+                        channel.next_due += channel.interval
+                        if channel.next_due <= now:
+                            # First emit or fell behind: restart the schedule from now
+                            channel.next_due = now + channel.interval
+                        channel.last_sample = sample_no
+                    else:
+                        # Nothing new for this channel yet: check again one interval later
+                        channel.next_due = now + channel.interval
+                next_wake = min(next_wake, channel.next_due)
+            posted = list(self._posted)
+            self._posted.clear()
+            return sample, sample_no, due, next_wake, posted
+
+    def _emit_posted(self, posted):
+        for event, data in posted:
+            try:
+                self.socketio.emit(event, data, to=self.room, namespace=self.namespace)
+            except Exception as e:
+                self.dropped += 1
+                print(f"Error emitting {event}: {e}")
+
+    def _emit(self, sample, sample_no, due):
+        for channel in due:
+            try:
+                payload = channel.encode(sample, sample_no)
+                if payload is None:
+                    # Encoder had nothing new to send (e.g. delta within deadbands)
+                    continue
+                self.socketio.emit(channel.event, payload, to=channel.room, namespace=self.namespace)
+                channel.emitted += 1
+            except Exception as e:
+                self.dropped += 1
+                print(f"Error emitting {channel.event} on {channel.name}: {e}")
+        self.emitted += 1
+
+    def _run(self):
+        while self._running:
+            now = time.monotonic()
+            sample, sample_no, due, next_wake, posted = self._due_channels(now)
+            if posted:
+                self._emit_posted(posted)
+            if due:
+                self._emit(sample, sample_no, due)
+
+            delay = next_wake - time.monotonic()
+            if delay > 0:
+                self.socketio.sleep(delay)
+            else:
+                # Fell behind: the next tick starts immediately, missed ticks are not replayed
+                self.late_ticks += 1
+                self.socketio.sleep(0)
+
+    def stats(self):
+        """Return a snapshot of the broadcaster counters."""
+        with self._lock:
+            return {
+                'emit_hz': round(1.0 / self.interval, 3),
+                'received': self.received,
+                'emitted': self.emitted,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'late_ticks': self.late_ticks,
+                'pending': self._fresh,
+                'posted': self.posted,
+                'channels': {
+                    channel.name: {
+                        'hz': round(1.0 / channel.interval, 3),
+                        'subscribers': len(channel.members),
+                        'emitted': channel.emitted,
+                    }
+                    for channel in self._channels.values()
+                },
+            }
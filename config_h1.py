@@ -60,6 +60,12 @@ TEMP_MIN = 30
 TEMP_MAX = 120
 TEMP_WARM_THRESHOLD = 45
 TEMP_HOT_THRESHOLD = 60
+TEMP_OVERHEAT_THRESHOLD = 90  # forecast target for time-to-overheat (thermal_model.py)
+
+# Server-side alerts (thermal_alerts.py)
+ALERT_HYSTERESIS = 3       # degC below a threshold before its alert clears
+ALERT_RISE_RATE = 3.0      # degC per minute
+ALERT_DIVERGENCE = 15      # winding - surface, degC (unused: H1 reports one sensor)
 
 # URDF configuration
 URDF_FILENAME = "h1.urdf"
@@ -4,21 +4,31 @@ import os
 import secrets
 import logging
 import argparse
-from threading import Lock
-from flask import Flask, render_template, jsonify, send_from_directory
+import numpy as np
+from flask import Flask, Blueprint, render_template, jsonify, request, Response, g
 from flask_socketio import SocketIO
 
 from unitree_sdk2py.core.channel import ChannelSubscriber, ChannelFactoryInitialize
 
-# Robot type will be set at runtime
-ROBOT_TYPE = None
-MOTOR_NAMES = None
-MOTOR_TO_MESH = None
-URDF_FILENAME = None
-URDF_PATH = None
+from broadcaster import MotorBroadcaster
+from motor_history import MotorHistory, DEFAULT_MAX_POINTS
+from motor_delta import MotorDeltaEncoder
+from static_assets import init_static_assets
+from kinematics import poses_payload
+from recording import Recorder, ReplaySource
+from telemetry_index import TelemetryIndex
+from robot_state import RobotState, load_assets
+from fleet import LowStateReader, RobotSpec, parse_fleet
+
+# Robots served by this process: id -> RobotState. With --robot there is one,
+# named DEFAULT_ROBOT; with --fleet each is served under /robot/<id>/. The
+# unprefixed routes (/, /api/...) answer for default_robot, the first one added.
+robots = {}
+default_robot = None
+DEFAULT_ROBOT = 'default'
+FLEET = False
 DEFAULT_PORT = None
 DEFAULT_HOST = None
-LowState_ = None
 
 app = Flask(__name__)
 # Use environment variable for secret key, fallback to random key for security
@@ -26,146 +36,71 @@ app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(16))
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 socketio = SocketIO(app, cors_allowed_origins="*", logger=False, engineio_logger=False)
 
+# /assets: content-hashed URLs (asset_url() in templates) and gzip/brotli variants
+init_static_assets(app)
+
 # Configure logging to suppress routine werkzeug messages
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
-# Global variable to store latest motor data
-motor_data = {
-    'temperatures': [],
-    'positions': [],
-    'timestamp': 0
+# Per-robot pages and API routes, registered at / and at /robot/<robot_id>/
+robot_api = Blueprint('robot', __name__)
+
+# Server the broadcasters emit through: Flask-SocketIO, or an AsgiSocketIO with --server asgi
+server = socketio
+
+# Motor update channels: name -> (event, content, rate in Hz or None for --emit-hz).
+# Each channel is a Socket.IO room (per robot in fleet mode); clients start on
+# 'json' and pick channels with the 'subscribe' event, e.g. ['temps@1Hz', 'positions@30Hz'].
+CHANNELS = {
+    'json': ('motor_update', 'full', None),
+    'binary': ('motor_update_bin', 'binary', None),
+    'delta': ('motor_delta', 'delta', None),
+    'temps@1Hz': ('motor_update', 'temps', 1.0),
+    'positions@30Hz': ('motor_update', 'positions', 30.0),
+    'full@100Hz': ('motor_update', 'full', 100.0),
 }
-data_lock = Lock()
-
-
-def load_robot_config(robot_type):
-    """Load configuration based on robot type."""
-    global ROBOT_TYPE, MOTOR_NAMES, MOTOR_TO_MESH, URDF_FILENAME, URDF_PATH, DEFAULT_PORT, DEFAULT_HOST, LowState_
-    
-    ROBOT_TYPE = robot_type.upper()
-    
-    if ROBOT_TYPE == 'G1':
-        from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowState_ as G1_LowState
-        from config_g1 import (
-            MOTOR_NAMES as G1_MOTOR_NAMES,
-            MOTOR_TO_MESH as G1_MOTOR_TO_MESH,
-            URDF_FILENAME as G1_URDF_FILENAME,
-            URDF_PATH as G1_URDF_PATH,
-            DEFAULT_PORT as G1_DEFAULT_PORT,
-            DEFAULT_HOST as G1_DEFAULT_HOST
-        )
-        LowState_ = G1_LowState
-        MOTOR_NAMES = G1_MOTOR_NAMES
-        MOTOR_TO_MESH = G1_MOTOR_TO_MESH
-        URDF_FILENAME = G1_URDF_FILENAME
-        URDF_PATH = G1_URDF_PATH
-        DEFAULT_PORT = G1_DEFAULT_PORT
-        DEFAULT_HOST = G1_DEFAULT_HOST
-        
-    elif ROBOT_TYPE == 'H1':
-        from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowState_ as H1_LowState
-        from config_h1 import (
-            MOTOR_NAMES as H1_MOTOR_NAMES,
-            MOTOR_TO_MESH as H1_MOTOR_TO_MESH,
-            URDF_FILENAME as H1_URDF_FILENAME,
-            URDF_PATH as H1_URDF_PATH,
-            DEFAULT_PORT as H1_DEFAULT_PORT,
-            DEFAULT_HOST as H1_DEFAULT_HOST
-        )
-        LowState_ = H1_LowState
-        MOTOR_NAMES = H1_MOTOR_NAMES
-        MOTOR_TO_MESH = H1_MOTOR_TO_MESH
-        URDF_FILENAME = H1_URDF_FILENAME
-        URDF_PATH = H1_URDF_PATH
-        DEFAULT_PORT = H1_DEFAULT_PORT
-        DEFAULT_HOST = H1_DEFAULT_HOST
-        
-    else:
-        raise ValueError(f"Unknown robot type: {robot_type}. Must be 'g1' or 'h1'")
+DEFAULT_CHANNEL = 'json'
+
+# Upper bound on points returned by history and recording queries
+MAX_HISTORY_POINTS = 10000
+
+# Socket.IO sid -> id of the robot the client connected for
+client_robots = {}
+
+
+def add_robot(robot_id, robot_type):
+    """Create and register a robot's state; robots of one type share its URDF model and meshes."""
+    global default_robot, DEFAULT_PORT, DEFAULT_HOST
+    robot = RobotState(robot_id, load_assets(robot_type))
+    robots[robot_id] = robot
+    if default_robot is None:
+        default_robot = robot
+        DEFAULT_PORT = robot.assets.default_port
+        DEFAULT_HOST = robot.assets.default_host
+    return robot
 
 
 def low_state_callback(msg):
-    """Callback function to process received LowState data and update dashboard."""
-    global motor_data
-    
-    if hasattr(msg, 'motor_state') and len(msg.motor_state) > 0:
-        temps = []
-        positions = []
-        for i, motor in enumerate(msg.motor_state):
-            # G1: Only process motors 0-28 (29 actual motors with DOF)
-            # H1: Process all motors we have mappings for
-            if ROBOT_TYPE == 'G1' and i >= 29:
-                continue
-            if ROBOT_TYPE == 'H1' and i >= len(MOTOR_NAMES):
-                continue
-                
-            motor_info = {
-                'motor_id': i,
-                'motor_name': MOTOR_NAMES.get(i, f'Motor {i}'),
-                'mesh_name': MOTOR_TO_MESH.get(i, ''),
-            }
-            
-            # Add temperature data - handle both G1 and H1 formats
-            if hasattr(motor, 'temperature'):
-                temp = motor.temperature
-                try:
-                    # Try array format (like G1 with [surface, winding])
-                    if hasattr(temp, '__len__') and len(temp) >= 2:
-                        motor_info['surface'] = int(temp[0])
-                        motor_info['winding'] = int(temp[1])
-                        motor_info['temp1'] = int(temp[0])
-                        motor_info['temp2'] = int(temp[1])
-                        motor_info['avg'] = (int(temp[0]) + int(temp[1])) / 2.0
-                    elif hasattr(temp, '__len__') and len(temp) == 1:
-                        # Single temperature value in array
-                        motor_info['surface'] = int(temp[0])
-                        motor_info['winding'] = int(temp[0])
-                        motor_info['temp1'] = int(temp[0])
-                        motor_info['temp2'] = int(temp[0])
-                        motor_info['avg'] = int(temp[0])
-                    else:
-                        # Single temperature value (not array) - H1 format
-                        motor_info['surface'] = int(temp)
-                        motor_info['winding'] = int(temp)
-                        motor_info['temp1'] = int(temp)
-                        motor_info['temp2'] = int(temp)
-                        motor_info['avg'] = int(temp)
-                except (TypeError, AttributeError):
-                    # Fallback: treat as single value
-                    motor_info['surface'] = int(temp)
-                    motor_info['winding'] = int(temp)
-                    motor_info['temp1'] = int(temp)
-                    motor_info['temp2'] = int(temp)
-                    motor_info['avg'] = int(temp)
-
-            # Add position data
-            if hasattr(motor, 'q'):
-                motor_info['position'] = float(motor.q)
-                positions.append({
-                    'motor_id': i,
-                    'position': float(motor.q),
-                    'link_name': MOTOR_TO_MESH.get(i, None),
-                })
-            
-            # Add velocity and torque for future use
-            if hasattr(motor, 'dq'):
-                motor_info['velocity'] = float(motor.dq)
-            if hasattr(motor, 'tau_est'):
-                motor_info['torque'] = float(motor.tau_est)
-            
-            temps.append(motor_info)
-        
-        with data_lock:
-            motor_data['temperatures'] = temps
-            motor_data['positions'] = positions
-            motor_data['timestamp'] = time.time()
-        
-        # Emit data to all connected clients
-        socketio.emit('motor_update', motor_data)
+    """Callback function to process received LowState data of the default robot."""
+    default_robot.on_low_state(msg)
 
 
-def init_robot_subscriber(network_interface=None):
+def create_broadcaster(robot, emit_hz, server=socketio):
+    """Create a robot's motor update broadcaster with one Socket.IO room per channel."""
+    motor_broadcaster = MotorBroadcaster(server, emit_hz=emit_hz, room=robot.robot_id if FLEET else None)
+    for name, (event, content, hz) in CHANNELS.items():
+        if content == 'binary':
+            encode = lambda snapshot, seq: snapshot.binary()
+        elif content == 'delta':
+            encode = MotorDeltaEncoder(robot.layout)
+        else:
+            encode = lambda snapshot, seq, content=content: snapshot.payload(content)
+        motor_broadcaster.add_channel(name, event, encode, hz)
+    return motor_broadcaster
+
+
+def init_robot_subscriber(robot, network_interface=None):
     """Initialize the robot data subscriber."""
     print("Initializing robot connection...")
     print(f"Network interface: {network_interface}")
@@ -183,110 +118,704 @@ def init_robot_subscriber(network_interface=None):
         print(f"Warning during ChannelFactoryInitialize: {e}")
     
     print("Creating subscriber for topic: rt/lowstate")
-    lowstate_subscriber = ChannelSubscriber("rt/lowstate", LowState_)
+    lowstate_subscriber = ChannelSubscriber("rt/lowstate", robot.assets.low_state_type)
     
     print("Initializing subscriber callback...")
-    lowstate_subscriber.Init(low_state_callback, 10)
+    lowstate_subscriber.Init(robot.on_low_state, 10)
     
     print("Robot subscriber initialized successfully!")
     print("Waiting for messages on rt/lowstate...")
 
 
-@app.route('/')
+def _client_robot(sid):
+    return robots.get(client_robots.get(sid))
+
+
+def handle_connect(sid, auth=None):
+    """Subscribe new clients to the default (JSON) motor updates of their robot."""
+    robot_id = auth.get('robot') if isinstance(auth, dict) else None
+    robot = robots.get(robot_id) if robot_id else default_robot
+    if robot is None:
+        return False  # unknown robot: refuse the connection
+    client_robots[sid] = robot.robot_id
+    if robot.broadcaster is not None:
+        robot.broadcaster.subscribe(sid, [DEFAULT_CHANNEL])
+
+
+def handle_disconnect(sid):
+    robot = _client_robot(sid)
+    client_robots.pop(sid, None)
+    if robot is not None and robot.broadcaster is not None:
+        robot.broadcaster.unsubscribe(sid)
+
+
+def handle_subscribe(sid, channels):
+    """Replace this client's motor update channels (see CHANNELS)."""
+    robot = _client_robot(sid)
+    if robot is None or robot.broadcaster is None:
+        return {'error': 'Broadcaster not running'}
+    if isinstance(channels, str):
+        channels = [channels]
+    try:
+        robot.broadcaster.subscribe(sid, channels)
+    except (TypeError, ValueError) as e:
+        return {'error': str(e)}
+    return {'channels': {name: CHANNELS[name][0] for name in channels}}
+
+
+# Socket.IO events -> handler(sid, *args). Registered on Flask-SocketIO below
+# and on the asyncio server in --server asgi mode.
+SOCKET_EVENTS = {
+    'connect': handle_connect,
+    'disconnect': handle_disconnect,
+    'subscribe': handle_subscribe,
+}
+
+
+def _register_socket_event(event, handler):
+    socketio.on_event(event, lambda *args: handler(request.sid, *args))
+
+
+for _event, _handler in SOCKET_EVENTS.items():
+    _register_socket_event(_event, _handler)
+
+
+@robot_api.url_value_preprocessor
+def _pull_robot_id(endpoint, values):
+    g.robot_id = values.pop('robot_id', None) if values else None
+
+
+@robot_api.before_request
+def _check_robot():
+    if g.robot_id is not None and g.robot_id not in robots:
+        return jsonify({'error': f'Unknown robot: {g.robot_id}'}), 404
+    if default_robot is None:
+        return jsonify({'error': 'No robot configured'}), 503
+
+
+def current_robot():
+    """RobotState the request is for: /robot/<id>/... or the default robot."""
+    return robots[g.robot_id] if g.robot_id is not None else default_robot
+
+
+@app.route('/api/robots')
+def get_robots():
+    """API endpoint listing the robots served by this process, with their status."""
+    return jsonify({
+        'fleet': FLEET,
+        'robots': [dict(robot.summary(), url=f'/robot/{robot.robot_id}/' if FLEET else '/')
+                   for robot in robots.values()],
+    })
+
+
+@robot_api.route('/')
 def index():
-    """Serve the main 3D dashboard page."""
-    if ROBOT_TYPE == 'G1':
-        return render_template('index_g1.html')
-    else:  # H1
-        return render_template('index_h1.html')
+    """Serve the main 3D dashboard page (the robot list at / in fleet mode)."""
+    if FLEET and g.robot_id is None:
+        return render_template('fleet.html', robots=[robot.summary() for robot in robots.values()])
+    robot = current_robot()
+    api_base = f'/robot/{robot.robot_id}' if g.robot_id is not None else ''
+    return render_template(robot.assets.template, api_base=api_base, robot_id=robot.robot_id)
 
 
-@app.route('/api/motors')
+@robot_api.route('/api/motors')
 def get_motors():
-    """API endpoint to get current motor data."""
-    with data_lock:
-        return jsonify(motor_data)
+    """
+    API endpoint to get current motor data.
+    Serves the snapshot's cached JSON with an ETag; pollers sending a matching
+    If-None-Match get 304 Not Modified until a new sample arrives.
+    """
+    robot = current_robot()
+    snapshot = robot.latest_snapshot  # read the reference once; the snapshot itself never changes
+    if snapshot is None:
+        return jsonify(robot.layout.to_payload(None))
+    
+    if request.if_none_match.contains(snapshot.etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.json(), mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['X-Motor-Seq'] = str(snapshot.seq)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@robot_api.route('/api/stats')
+def get_stats():
+    """API endpoint to get broadcaster counters (received/emitted/coalesced/dropped)."""
+    robot = current_robot()
+    if robot.broadcaster is None:
+        return jsonify({'error': 'Broadcaster not running'}), 503
+    stats = robot.broadcaster.stats()
+    if server is not socketio:
+        stats['asgi'] = server.stats()
+    if robot.replay is not None:
+        stats['replay'] = robot.replay.stats()
+    if robot.recorder is not None:
+        stats['recorder'] = robot.recorder.stats()
+    if robot.telemetry_index is not None:
+        stats['recording'] = robot.telemetry_index.stats()
+    if robot.alerts is not None:
+        stats['alerts'] = {'samples': robot.alerts.samples, 'active': len(robot.alerts.active())}
+    if robot.forecaster is not None:
+        stats['forecast'] = {'samples': robot.forecaster.samples, 'updates': robot.forecaster.updates}
+    if robot.reader is not None:
+        stats['dds'] = robot.reader.stats()
+    return jsonify(stats)
+
+
+@robot_api.route('/api/alerts')
+def get_alerts():
+    """
+    API endpoint to get thermal alerts (see thermal_alerts.py).
+    
+    Query parameters:
+        since_id: only return events with a larger id (poll with the last id seen)
+        limit: maximum events returned, newest kept (default: 100)
+    
+    Returns the alerts currently raised, the recent alert events (raised and
+    cleared, oldest first) and the thresholds in use. The same events are
+    pushed to Socket.IO clients as motor_alert.
+    """
+    robot = current_robot()
+    if robot.alerts is None:
+        return jsonify({'error': 'Alerts not running'}), 503
+    
+    try:
+        since_id = _number_arg('since_id', int, 0)
+        limit = max(1, min(_number_arg('limit', int, 100), 1000))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    events = robot.alerts.events(since_id, limit)
+    return jsonify({
+        'active': robot.alerts.active(),
+        'events': events,
+        'last_id': events[-1]['id'] if events else since_id,
+        'config': robot.alerts.config(),
+    })
+
+
+def _json_value(value, decimals=2):
+    """Round a float for JSON; NaN and infinity become null."""
+    return round(value, decimals) if np.isfinite(value) else None
+
+
+@robot_api.route('/api/forecast')
+def get_forecast():
+    """
+    API endpoint to get the time-to-overheat forecast of each motor (see thermal_model.py).
+    
+    Query parameters:
+        motor: comma-separated motor ids or mesh/motor names (default: all)
+        threshold: winding temperature to forecast (default: TEMP_OVERHEAT_THRESHOLD)
+    
+    minutes_to_threshold assumes the load of the last minute continues; it is
+    null while the model warms up (one minute) and when the motor settles below
+    the threshold (or would take more than 8 hours to reach it).
+    """
+    robot = current_robot()
+    if robot.forecaster is None:
+        return jsonify({'error': 'Forecast not running'}), 503
+    
+    try:
+        columns = _motor_columns(robot.layout)
+        threshold = _number_arg('threshold', float)
+        result = robot.forecaster.forecast(threshold)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result is None:
+        return jsonify({'error': 'No samples yet'}), 503
+    
+    motors = []
+    for k in columns:
+        motors.append({
+            'motor_id': robot.layout.motor_ids[k],
+            'motor_name': robot.layout.motor_names[k],
+            'mesh_name': robot.layout.mesh_names[k],
+            'temperature': _json_value(result['temperature'][k]),
+            'rms_torque': _json_value(result['rms_torque'][k]),
+            'rate': _json_value(result['rate'][k], 3),
+            'steady_state': _json_value(result['steady_state'][k], 1),
+            'time_constant': _json_value(result['time_constant'][k], 1),
+            'minutes_to_threshold': _json_value(result['minutes'][k], 1),
+        })
+    return jsonify({
+        'timestamp': result['timestamp'],
+        'threshold': result['threshold'],
+        'ready': result['ready'],
+        'motors': motors,
+    })
+
+
+def _json_series(values):
+    """Convert a float32 column to a JSON-safe list (NaN -> null)."""
+    values = np.round(values.astype(np.float64), 6)
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _number_arg(name, convert, default=None):
+    """Numeric query argument; ValueError (400) when present but not a number."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+
+
+def _max_points():
+    """max_points query argument, capped at MAX_HISTORY_POINTS."""
+    max_points = _number_arg('max_points', int, DEFAULT_MAX_POINTS)
+    if max_points <= 0:
+        raise ValueError("max_points must be positive")
+    return min(max_points, MAX_HISTORY_POINTS)
+
+
+def _time_window():
+    """since/until query arguments: unix timestamps, or negative seconds relative to now."""
+    now = time.time()
+    since = _number_arg('since', float, float('-inf'))
+    until = _number_arg('until', float, float('inf'))
+    if since < 0:
+        since = now + since
+    if until < 0:
+        until = now + until
+    return since, until
+
+
+def _motor_columns(layout):
+    """motor query argument (ids or mesh/motor names) as column indices, default all."""
+    motor_arg = request.args.get('motor', '')
+    columns = [layout.column(m) for m in motor_arg.split(',') if m.strip()]
+    return columns or list(range(layout.num_motors))
+
+
+def _motor_series(layout, columns, fields, result):
+    """Per-motor JSON series of a history or recording query result."""
+    motors = []
+    for j, k in enumerate(columns):
+        motor = {
+            'motor_id': layout.motor_ids[k],
+            'motor_name': layout.motor_names[k],
+            'mesh_name': layout.mesh_names[k],
+        }
+        for name in fields:
+            motor[name] = _json_series(result[name][:, j])
+            if result.get('source', 'raw') != 'raw':
+                motor[f'{name}_min'] = _json_series(result[f'{name}_min'][:, j])
+                motor[f'{name}_max'] = _json_series(result[f'{name}_max'][:, j])
+        motors.append(motor)
+    return motors
+
+
+@robot_api.route('/api/history')
+def get_history():
+    """
+    API endpoint to query the in-memory motor history.
+    
+    Query parameters:
+        motor: comma-separated motor ids or mesh/motor names (default: all)
+        since: start time as unix timestamp, or negative seconds relative to now
+        until: end time (same format as since, default: now)
+        fields: comma-separated subset of temp1,temp2,q,dq,tau (default: temp1,temp2)
+        max_points: maximum samples returned; larger windows are downsampled
+        resolution: raw, 1s, 10s, 1m or auto (default), which picks the finest
+            aggregate tier that fits max_points; tiers only hold temp1/temp2
+    """
+    robot = current_robot()
+    if robot.history is None:
+        return jsonify({'error': 'History is disabled'}), 503
+    
+    try:
+        since, until = _time_window()
+        columns = _motor_columns(robot.layout)
+        
+        fields = [f.strip() for f in request.args.get('fields', 'temp1,temp2').split(',') if f.strip()]
+        max_points = _max_points()
+        
+        resolution = request.args.get('resolution', 'auto')
+        result = robot.history.query(since, until, columns, fields, max_points, resolution)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'timestamps': result['timestamps'].tolist(),
+        'fields': fields,
+        'motors': _motor_series(robot.layout, columns, fields, result),
+        'source': result['source'],
+        'resolution': result['resolution'],
+        'total_samples': result['total_samples'],
+        'downsampled': result['stride'] != 1,
+    })
+
+
+@robot_api.route('/api/recording')
+def get_recording():
+    """
+    API endpoint to read recorded telemetry from disk (--record or --replay directory).
+    Same parameters and response as /api/history (raw samples only); only the
+    chunk files overlapping the window are opened.
+    """
+    robot = current_robot()
+    if robot.telemetry_index is None:
+        return jsonify({'error': 'No recording (start with --record or --replay)'}), 503
+    
+    try:
+        since, until = _time_window()
+        columns = _motor_columns(robot.layout)
+        fields = [f.strip() for f in request.args.get('fields', 'temp1,temp2').split(',') if f.strip()]
+        max_points = _max_points()
+        result = robot.telemetry_index.read(since, until, columns, fields, max_points)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'timestamps': result['timestamps'].tolist(),
+        'fields': fields,
+        'motors': _motor_series(robot.layout, columns, fields, result),
+        'total_samples': result['total_samples'],
+        'downsampled': result['stride'] != 1,
+        'chunks_read': result['chunks_read'],
+    })
+
+
+@robot_api.route('/api/recording/search')
+def search_recording():
+    """
+    API endpoint to find when recorded temperatures crossed a threshold.
+    
+    Query parameters:
+        motor, since, until: as for /api/history (default: all motors, whole recording)
+        field: temp1 (surface) or temp2 (winding, default)
+        above / below: match samples with field >= above and/or <= below
+        limit: maximum matches returned (default: 10)
+    
+    Returns time ranges in which any selected motor matched, oldest first,
+    with the peak value and which motor reached it. Chunks whose indexed
+    min/max rule out a match are never read.
+    """
+    robot = current_robot()
+    if robot.telemetry_index is None:
+        return jsonify({'error': 'No recording (start with --record or --replay)'}), 503
+    
+    try:
+        since, until = _time_window()
+        columns = _motor_columns(robot.layout)
+        field = request.args.get('field', 'temp2')
+        above = _number_arg('above', float)
+        below = _number_arg('below', float)
+        limit = max(1, min(_number_arg('limit', int, 10), 1000))
+        matches, considered, read = robot.telemetry_index.search(since, until, columns, field, above, below, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    for match in matches:
+        k = match.pop('column')
+        match['motor_id'] = robot.layout.motor_ids[k]
+        match['motor_name'] = robot.layout.motor_names[k]
+    return jsonify({
+        'matches': matches,
+        'chunks_total': len(robot.telemetry_index),
+        'chunks_considered': considered,
+        'chunks_read': read,
+    })
 
 
-@app.route('/api/motor_mapping')
+@robot_api.route('/api/kinematics')
+def get_kinematics():
+    """
+    API endpoint to get link poses from forward kinematics (relative to the root link).
+    
+    Query parameters:
+        links: comma-separated link names (default: all links)
+        since, until, max_points: as for /api/history; when since is given,
+            poses are computed for every returned history sample in one batch
+    
+    Poses are {'xyz': [x, y, z], 'quat': [x, y, z, w]} per link, or lists of
+    them (one per timestamp) for history queries.
+    """
+    robot = current_robot()
+    if robot.assets.kinematics is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    
+    links_arg = request.args.get('links', '')
+    links = [name.strip() for name in links_arg.split(',') if name.strip()] or None
+    
+    if not request.args.get('since'):
+        snapshot = robot.latest_snapshot
+        if snapshot is None or snapshot.frame is None:
+            return jsonify({'error': 'No motor data yet'}), 503
+        if request.if_none_match.contains(f'{snapshot.etag}-{links_arg}'):
+            response = Response(status=304)
+        else:
+            try:
+                names, xyz, quat = robot.assets.kinematics.frame_poses(snapshot.frame, links)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            response = jsonify({
+                'timestamp': snapshot.timestamp,
+                'seq': snapshot.seq,
+                'root': robot.assets.kinematics.root,
+                'links': poses_payload(names, xyz, quat),
+            })
+        response.set_etag(f'{snapshot.etag}-{links_arg}')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    if robot.history is None:
+        return jsonify({'error': 'History is disabled'}), 503
+    try:
+        since, until = _time_window()
+        max_points = _max_points()
+        result = robot.history.query(since, until, fields=['q'], max_points=max_points, resolution='raw')
+        names, xyz, quat = robot.assets.kinematics.poses(result['q'], links)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'timestamps': result['timestamps'].tolist(),
+        'root': robot.assets.kinematics.root,
+        'links': poses_payload(names, xyz, quat),
+        'total_samples': result['total_samples'],
+        'downsampled': result['stride'] != 1,
+    })
+
+
+@robot_api.route('/api/motor_mapping')
 def get_motor_mapping():
     """API endpoint to get motor-to-mesh mapping."""
+    robot = current_robot()
     return jsonify({
-        'motor_names': MOTOR_NAMES,
-        'motor_to_mesh': MOTOR_TO_MESH
+        'motor_names': robot.assets.motor_names,
+        'motor_to_mesh': robot.assets.motor_to_mesh,
+        'binary_format': robot.layout.binary_schema()
     })
 
 
-@app.route('/assets/<path:filename>')
-def serve_assets(filename):
-    """Serve STL files and other assets."""
-    import os
-    assets_path = os.path.join(os.path.dirname(__file__), 'assets')
-    return send_from_directory(assets_path, filename)
+@robot_api.route('/api/model.glb')
+def get_model_glb():
+    """
+    All robot meshes decimated and quantized into one GLB (see mesh_pack.py).
+    ?lod=0 (default, most detail) to 2 (coarsest). 503 while the model is being built.
+    """
+    robot = current_robot()
+    try:
+        packed = robot.assets.model_pack.get(_number_arg('lod', int, 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if packed is None:
+        return jsonify({'error': 'Packed model is still being built'}), 503
+    
+    glb, etag = packed
+    response = Response(glb, mimetype='model/gltf-binary')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
-@app.route('/api/urdf')
+@robot_api.route('/api/urdf')
 def get_urdf():
-    """Serve the URDF file for parsing."""
-    urdf_path = os.path.join(os.path.dirname(__file__), URDF_PATH, URDF_FILENAME)
-    try:
-        with open(urdf_path, 'r') as f:
-            return f.read(), 200, {'Content-Type': 'application/xml'}
-    except Exception as e:
-        return jsonify({'error': str(e)}), 404
+    """Serve the URDF file (read once at startup)."""
+    robot = current_robot()
+    if robot.assets.model is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    response = Response(robot.assets.model.urdf, mimetype='application/xml')
+    response.set_etag(robot.assets.model.urdf_etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 
+@robot_api.route('/api/model')
+def get_model():
+    """
+    Kinematic tree parsed from the URDF at startup: links (mesh, visual origin),
+    joints (type, parent, child, origin, axis, limits), root link and motor id -> joint.
+    """
+    robot = current_robot()
+    if robot.assets.model is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    response = Response(robot.assets.model.json, mimetype='application/json')
+    response.set_etag(robot.assets.model.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
-@app.route('/assets/js/<path:filename>')
-def serve_js(filename):
-    """Serve JavaScript files for offline support."""
-    js_path = os.path.join(os.path.dirname(__file__), 'assets', 'js')
-    return send_from_directory(js_path, filename)
 
+# The same routes for the default robot and for each robot of the fleet
+app.register_blueprint(robot_api)
+app.register_blueprint(robot_api, url_prefix='/robot/<robot_id>', name='fleet')
 
 
-def run_flask_app():
-    """Run the Flask application."""
-    socketio.run(app, host=DEFAULT_HOST, port=DEFAULT_PORT, debug=False)
+def create_asgi_server():
+    """Socket.IO server for --server asgi (uvicorn + asyncio), serving the same routes and events."""
+    from asgi_server import AsgiSocketIO
+    return AsgiSocketIO(app, SOCKET_EVENTS)
+
+
+def run_flask_app(server=socketio):
+    """Run the Flask application on the Werkzeug server (default) or an AsgiSocketIO."""
+    server.run(app, host=DEFAULT_HOST, port=DEFAULT_PORT, debug=False)
+
+
+def start_robot(robot, spec, args):
+    """Start one robot's broadcaster, history, recorder and replay; exits on bad options."""
+    label = f"{robot.robot_id}: " if FLEET else ""
+    try:
+        robot.broadcaster = create_broadcaster(robot, args.emit_hz, server)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    robot.broadcaster.start()
+    
+    # Pack the robot meshes in the background (once per robot type)
+    robot.assets.start()
+    
+    if args.history_seconds > 0:
+        capacity = int(args.history_seconds * args.history_rate)
+        robot.history = MotorHistory(robot.layout.num_motors, capacity)
+        print(f"{label}Keeping {capacity} history samples ({robot.history.nbytes / 1e6:.1f} MB)")
+    
+    if spec.record:
+        try:
+            robot.telemetry_index = TelemetryIndex(spec.record)
+            robot.recorder = Recorder(spec.record, robot.layout, index=robot.telemetry_index,
+                                      chunk_rows=max(1, int(args.record_chunk_seconds * args.history_rate)),
+                                      chunk_seconds=args.record_chunk_seconds,
+                                      max_bytes=args.record_max_gb * 1e9 or None,
+                                      max_age=args.record_max_days * 86400 or None)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot record to {spec.record}: {e}")
+            sys.exit(1)
+        robot.recorder.start()
+        print(f"{label}Recording telemetry to {spec.record} ({robot.recorder.bytes / 1e9:.2f} GB already there)")
+    
+    if spec.replay:
+        # Recorded samples go through the same callback as live DDS messages
+        try:
+            robot.replay = ReplaySource(spec.replay, robot.on_low_state, args.replay_speed,
+                                        args.replay_from, args.replay_to, args.replay_loop)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        robot.replay.start()
+        if robot.telemetry_index is None:
+            robot.telemetry_index = TelemetryIndex(spec.replay, writable=os.access(spec.replay, os.W_OK))
+        print(f"{label}Replaying {robot.replay.recording.count} samples from {spec.replay} "
+              f"at {'max' if not args.replay_speed else f'{args.replay_speed:g}x'} speed")
+    elif FLEET:
+        try:
+            robot.reader = LowStateReader(spec, robot.assets.low_state_type, robot.on_low_state)
+            print(f"{label}Subscribed to rt/lowstate on domain {spec.domain}, interface {spec.interface}")
+        except Exception as e:
+            print(f"Error subscribing to {robot.robot_id}: {e}")
+            print("Starting dashboard anyway (no live data will be available for it)")
+    else:
+        # Initialize robot subscriber
+        try:
+            init_robot_subscriber(robot, spec.interface)
+        except Exception as e:
+            print(f"Error initializing robot connection: {e}")
+            print("Starting dashboard anyway (no live data will be available)")
 
 
 def main():
+    global server, FLEET
+
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Unitree Robot 3D Motor Dashboard')
-    parser.add_argument('--robot', '-r', type=str, choices=['g1', 'h1'], required=True,
+    parser.add_argument('--robot', '-r', type=str, choices=['g1', 'h1'], default=None,
                         help='Robot type: g1 or h1')
+    parser.add_argument('--fleet', nargs='+', default=None, metavar='ID=TYPE[,OPTION=VALUE]',
+                        help='Serve several robots from one process, each under /robot/ID/. '
+                             'Options: interface=IF, domain=N (distinct per live robot), replay=DIR, record=DIR')
     parser.add_argument('--interface', '-i', type=str, default=None,
                         help='Network interface (e.g., en0, eth0, enp3s0)')
+    parser.add_argument('--emit-hz', type=float, default=20.0,
+                        help='Rate at which motor_update is pushed to clients (default: 20)')
+    parser.add_argument('--history-seconds', type=float, default=600.0,
+                        help='Seconds of full-rate motor history kept in memory, 0 to disable (default: 600)')
+    parser.add_argument('--history-rate', type=float, default=500.0,
+                        help='Expected LowState rate in Hz, used to size the history buffer (default: 500)')
+    parser.add_argument('--server', choices=['threading', 'asgi'], default='threading',
+                        help='threading: Werkzeug development server (default); '
+                             'asgi: uvicorn with asyncio Socket.IO, for many concurrent clients')
+    parser.add_argument('--record', type=str, default=None, metavar='DIR',
+                        help='Record full-rate motor telemetry to chunk files in DIR')
+    parser.add_argument('--record-max-gb', type=float, default=16.0,
+                        help='Delete the oldest chunks beyond this size, 0 for no limit (default: 16, '
+                             'about 19 h of G1 telemetry at 500 Hz; wins over --record-max-days)')
+    parser.add_argument('--record-max-days', type=float, default=7.0,
+                        help='Delete chunks older than this, 0 for no limit (default: 7)')
+    parser.add_argument('--record-chunk-seconds', type=float, default=10.0,
+                        help='Seconds of samples per chunk file (default: 10)')
+    parser.add_argument('--replay', type=str, default=None, metavar='DIR',
+                        help='Replay a telemetry recording instead of connecting to the robot')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay speed: 1 = real time, 10 = ten times faster, 0 = as fast as possible (default: 1)')
+    parser.add_argument('--replay-from', type=float, default=None,
+                        help='Start of the replayed window: unix time, or seconds from the start of the recording')
+    parser.add_argument('--replay-to', type=float, default=None,
+                        help='End of the replayed window (same format as --replay-from)')
+    parser.add_argument('--replay-loop', action='store_true',
+                        help='Restart the replay when it reaches the end')
     args = parser.parse_args()
+    if not args.robot and not args.fleet:
+        parser.error("give --robot (one robot) or --fleet (several)")
+    if args.fleet and (args.robot or args.interface or args.replay or args.record):
+        parser.error("with --fleet, give the type, interface, replay and record of each robot in its entry")
     
-    # Load robot configuration
+    # Load robot configuration (URDF and meshes once per robot type)
     try:
-        load_robot_config(args.robot)
-        print(f"Loaded configuration for {ROBOT_TYPE} robot")
+        if args.fleet:
+            FLEET = True
+            specs = parse_fleet(args.fleet)
+        else:
+            specs = [RobotSpec(DEFAULT_ROBOT, args.robot, args.interface, replay=args.replay, record=args.record)]
+        for spec in specs:
+            add_robot(spec.robot_id, spec.robot_type)
     except Exception as e:
         print(f"Error loading robot configuration: {e}")
         sys.exit(1)
+    for robot in robots.values():
+        print(f"Loaded configuration for {robot.robot_type} robot" + (f" {robot.robot_id}" if FLEET else ""))
     
-    print(f"Using network interface: {args.interface}")
+    if not FLEET:
+        print(f"Using network interface: {args.interface}")
     
-    # Initialize robot subscriber
-    try:
-        init_robot_subscriber(args.interface)
-    except Exception as e:
-        print(f"Error initializing robot connection: {e}")
-        print("Starting dashboard anyway (no live data will be available)")
+    if args.server == 'asgi':
+        try:
+            server = create_asgi_server()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print("Serving with uvicorn (ASGI)")
+    
+    # Start the broadcasters before samples arrive
+    for spec in specs:
+        start_robot(robots[spec.robot_id], spec, args)
+    print(f"Emitting motor_update at {args.emit_hz} Hz")
+    print(f"Alerting at {default_robot.alerts.warm:g}/{default_robot.alerts.hot:g} degC "
+          f"and {default_robot.alerts.rise_rate:g} degC/min rise")
     
     # Start Flask app
     print("\n" + "="*50)
-    print(f"{ROBOT_TYPE} 3D Motor Temperature Dashboard")
+    if FLEET:
+        print(f"Fleet Motor Temperature Dashboard ({len(robots)} robots)")
+    else:
+        print(f"{default_robot.robot_type} 3D Motor Temperature Dashboard")
     print("="*50)
     print(f"Dashboard available at: http://localhost:{DEFAULT_PORT}")
     print("Press Ctrl+C to exit")
     print("="*50 + "\n")
     
     try:
-        run_flask_app()
+        run_flask_app(server)
     except KeyboardInterrupt:
         print("\nShutting down dashboard...")
+    finally:
+        for robot in robots.values():
+            if robot.recorder is not None:
+                robot.recorder.close()
 
 
 if __name__ == "__main__":
@@ -3,8 +3,7 @@ import time
 import os
 import secrets
 import logging
-from threading import Lock
-from flask import Flask, render_template, jsonify, send_from_directory
+from flask import Flask, render_template, jsonify, request, Response
 from flask_socketio import SocketIO
 
 from unitree_sdk2py.core.channel import ChannelSubscriber, ChannelFactoryInitialize
@@ -13,103 +12,96 @@ from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowState_
 
 from config_h1 import MOTOR_NAMES, MOTOR_TO_MESH, URDF_FILENAME, URDF_PATH, DEFAULT_PORT, DEFAULT_HOST
 
+from broadcaster import MotorBroadcaster
+from motor_layout import MotorLayout, MotorSnapshot
+from motor_delta import MotorDeltaEncoder
+from static_assets import init_static_assets
+from mesh_pack import ModelPack
+from urdf_model import RobotModel
+from kinematics import ForwardKinematics, poses_payload
+
 app = Flask(__name__)
 # Use environment variable for secret key, fallback to random key for security
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(16))
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 socketio = SocketIO(app, cors_allowed_origins="*", logger=False, engineio_logger=False)
 
+# /assets: content-hashed URLs (asset_url() in templates) and gzip/brotli variants
+init_static_assets(app)
+
 # Configure logging to suppress routine werkzeug messages
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
-# Motor mappings imported from config_h1.py
+# Motor mappings imported from config_h1.py, compiled once for fast decoding
+MOTOR_LAYOUT = MotorLayout('H1', MOTOR_NAMES, MOTOR_TO_MESH)
+
+URDF_FILE = os.path.join(os.path.dirname(__file__), URDF_PATH, URDF_FILENAME)
+
+# URDF parsed once for /api/model and /api/urdf
+try:
+    ROBOT_MODEL = RobotModel('H1', URDF_FILE, MOTOR_TO_MESH)
+except Exception as e:
+    print(f"Warning: could not load URDF {URDF_FILE}: {e}")
+    ROBOT_MODEL = None
+KINEMATICS = ForwardKinematics(ROBOT_MODEL, MOTOR_LAYOUT.motor_ids) if ROBOT_MODEL else None
+
+# Decimated single-file meshes for /api/model.glb (built in main())
+MODEL_PACK = ModelPack(URDF_FILE)
 
-# Global variable to store latest motor data
-motor_data = {
-    'temperatures': [],
-    'positions': [],
-    'timestamp': 0
+# Latest published state (MotorSnapshot); its JSON/binary encodings are built
+# lazily and at most once, then shared by all channels and /api/motors pollers.
+# Snapshots are immutable and replaced by a single reference assignment (atomic
+# in CPython), so readers never take a lock the DDS callback could wait on.
+latest_snapshot = None
+snapshot_seq = 0
+SNAPSHOT_TAG = secrets.token_hex(4)  # ETag prefix, unique per process start
+
+# Rate-limited emitter for motor updates (created in main())
+broadcaster = None
+EMIT_HZ = 20.0
+
+# Motor update channels: name -> (event, content, rate in Hz or None for EMIT_HZ).
+# Each channel is a Socket.IO room; clients start on 'json' and pick channels
+# with the 'subscribe' event.
+CHANNELS = {
+    'json': ('motor_update', 'full', None),
+    'binary': ('motor_update_bin', 'binary', None),
+    'delta': ('motor_delta', 'delta', None),
 }
-data_lock = Lock()
+DEFAULT_CHANNEL = 'json'
 
 
 def low_state_callback(msg: LowState_):
     """Callback function to process received LowState data and update dashboard."""
-    global motor_data
-    
-    if hasattr(msg, 'motor_state') and len(msg.motor_state) > 0:
-        temps = []
-        positions = []
-        for i, motor in enumerate(msg.motor_state):
-            # H1 actually has 20 motors in the message (not 19)
-            # Process all motors we have mappings for
-            if i >= len(MOTOR_NAMES):
-                continue
-                
-            motor_info = {
-                'motor_id': i,
-                'motor_name': MOTOR_NAMES.get(i, f'Motor {i}'),
-                'mesh_name': MOTOR_TO_MESH.get(i, ''),
-            }
-            
-            # Add temperature data - Go series format may differ from HG series
-            if hasattr(motor, 'temperature'):
-                temp = motor.temperature
-                try:
-                    # Try array format (like HG series with [surface, winding])
-                    if hasattr(temp, '__len__') and len(temp) >= 2:
-                        motor_info['surface'] = int(temp[0])
-                        motor_info['winding'] = int(temp[1])
-                        motor_info['temp1'] = int(temp[0])
-                        motor_info['temp2'] = int(temp[1])
-                        motor_info['avg'] = (int(temp[0]) + int(temp[1])) / 2.0
-                    elif hasattr(temp, '__len__') and len(temp) == 1:
-                        # Single temperature value in array
-                        motor_info['surface'] = int(temp[0])
-                        motor_info['winding'] = int(temp[0])
-                        motor_info['temp1'] = int(temp[0])
-                        motor_info['temp2'] = int(temp[0])
-                        motor_info['avg'] = int(temp[0])
-                    else:
-                        # Single temperature value (not array)
-                        motor_info['surface'] = int(temp)
-                        motor_info['winding'] = int(temp)
-                        motor_info['temp1'] = int(temp)
-                        motor_info['temp2'] = int(temp)
-                        motor_info['avg'] = int(temp)
-                except (TypeError, AttributeError):
-                    # Fallback: treat as single value
-                    motor_info['surface'] = int(temp)
-                    motor_info['winding'] = int(temp)
-                    motor_info['temp1'] = int(temp)
-                    motor_info['temp2'] = int(temp)
-                    motor_info['avg'] = int(temp)
-
-            # Add position data
-            if hasattr(motor, 'q'):
-                motor_info['position'] = float(motor.q)
-                positions.append({
-                    'motor_id': i,
-                    'position': float(motor.q),
-                    'link_name': MOTOR_TO_MESH.get(i, None),
-                })
-            
-            # Add velocity and torque for future use
-            if hasattr(motor, 'dq'):
-                motor_info['velocity'] = float(motor.dq)
-            if hasattr(motor, 'tau_est'):
-                motor_info['torque'] = float(motor.tau_est)
-            
-            temps.append(motor_info)
-        
-        with data_lock:
-            motor_data['temperatures'] = temps
-            motor_data['positions'] = positions
-            motor_data['timestamp'] = time.time()
-        
-        # Emit data to all connected clients
-        socketio.emit('motor_update', motor_data)
+    global latest_snapshot, snapshot_seq
+    
+    # H1 actually has 20 motors in the message (not 19); process all we have mappings for
+    frame = MOTOR_LAYOUT.decode(msg, time.time())
+    if frame is None:
+        return
+    
+    snapshot_seq += 1
+    snapshot = MotorSnapshot(MOTOR_LAYOUT, frame, snapshot_seq, SNAPSHOT_TAG)
+    latest_snapshot = snapshot  # publish: readers see the old or the new snapshot, never a mix
+    
+    # Hand the snapshot to the broadcaster; it is encoded and emitted on the next tick
+    if broadcaster is not None:
+        broadcaster.publish(snapshot)
+
+
+def create_broadcaster(emit_hz):
+    """Create the motor update broadcaster with one Socket.IO room per channel."""
+    motor_broadcaster = MotorBroadcaster(socketio, emit_hz=emit_hz)
+    for name, (event, content, hz) in CHANNELS.items():
+        if content == 'binary':
+            encode = lambda snapshot, seq: snapshot.binary()
+        elif content == 'delta':
+            encode = MotorDeltaEncoder(MOTOR_LAYOUT)
+        else:
+            encode = lambda snapshot, seq, content=content: snapshot.payload(content)
+        motor_broadcaster.add_channel(name, event, encode, hz)
+    return motor_broadcaster
 
 
 def init_robot_subscriber(network_interface=None):
@@ -141,6 +133,33 @@ def init_robot_subscriber(network_interface=None):
     print("Waiting for messages on rt/lowstate...")
 
 
+@socketio.on('connect')
+def handle_connect():
+    """Subscribe new clients to the default (JSON) motor updates."""
+    if broadcaster is not None:
+        broadcaster.subscribe(request.sid, [DEFAULT_CHANNEL])
+
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    if broadcaster is not None:
+        broadcaster.unsubscribe(request.sid)
+
+
+@socketio.on('subscribe')
+def handle_subscribe(channels):
+    """Replace this client's motor update channels (see CHANNELS)."""
+    if broadcaster is None:
+        return {'error': 'Broadcaster not running'}
+    if isinstance(channels, str):
+        channels = [channels]
+    try:
+        broadcaster.subscribe(request.sid, channels)
+    except (TypeError, ValueError) as e:
+        return {'error': str(e)}
+    return {'channels': {name: CHANNELS[name][0] for name in channels}}
+
+
 @app.route('/')
 def index():
     """Serve the main 3D dashboard page."""
@@ -149,9 +168,55 @@ def index():
 
 @app.route('/api/motors')
 def get_motors():
-    """API endpoint to get current motor data."""
-    with data_lock:
-        return jsonify(motor_data)
+    """
+    API endpoint to get current motor data.
+    Serves the snapshot's cached JSON with an ETag; pollers sending a matching
+    If-None-Match get 304 Not Modified until a new sample arrives.
+    """
+    snapshot = latest_snapshot  # read the reference once; the snapshot itself never changes
+    if snapshot is None:
+        return jsonify(MOTOR_LAYOUT.to_payload(None))
+    
+    if request.if_none_match.contains(snapshot.etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.json(), mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['X-Motor-Seq'] = str(snapshot.seq)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/kinematics')
+def get_kinematics():
+    """
+    API endpoint to get current link poses from forward kinematics (relative to the root link).
+    ?links= comma-separated link names (default: all links).
+    """
+    if KINEMATICS is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    snapshot = latest_snapshot
+    if snapshot is None or snapshot.frame is None:
+        return jsonify({'error': 'No motor data yet'}), 503
+    
+    links_arg = request.args.get('links', '')
+    links = [name.strip() for name in links_arg.split(',') if name.strip()] or None
+    if request.if_none_match.contains(f'{snapshot.etag}-{links_arg}'):
+        response = Response(status=304)
+    else:
+        try:
+            names, xyz, quat = KINEMATICS.frame_poses(snapshot.frame, links)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = jsonify({
+            'timestamp': snapshot.timestamp,
+            'seq': snapshot.seq,
+            'root': KINEMATICS.root,
+            'links': poses_payload(names, xyz, quat),
+        })
+    response.set_etag(f'{snapshot.etag}-{links_arg}')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/api/motor_mapping')
@@ -159,35 +224,65 @@ def get_motor_mapping():
     """API endpoint to get motor-to-mesh mapping."""
     return jsonify({
         'motor_names': MOTOR_NAMES,
-        'motor_to_mesh': MOTOR_TO_MESH
+        'motor_to_mesh': MOTOR_TO_MESH,
+        'binary_format': MOTOR_LAYOUT.binary_schema()
     })
 
 
-@app.route('/assets/<path:filename>')
-def serve_assets(filename):
-    """Serve STL files and other assets."""
-    import os
-    assets_path = os.path.join(os.path.dirname(__file__), 'assets')
-    return send_from_directory(assets_path, filename)
+def _number_arg(name, convert, default=None):
+    """Numeric query argument; ValueError (400) when present but not a number."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
 
 
-@app.route('/api/urdf')
-def get_urdf():
-    """Serve the URDF file for parsing."""
-    urdf_path = os.path.join(os.path.dirname(__file__), URDF_PATH, URDF_FILENAME)
+@app.route('/api/model.glb')
+def get_model_glb():
+    """
+    All robot meshes decimated and quantized into one GLB (see mesh_pack.py).
+    ?lod=0 (default, most detail) to 2 (coarsest). 503 while the model is being built.
+    """
     try:
-        with open(urdf_path, 'r') as f:
-            return f.read(), 200, {'Content-Type': 'application/xml'}
-    except Exception as e:
-        return jsonify({'error': str(e)}), 404
+        packed = MODEL_PACK.get(_number_arg('lod', int, 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if packed is None:
+        return jsonify({'error': 'Packed model is still being built'}), 503
+    
+    glb, etag = packed
+    response = Response(glb, mimetype='model/gltf-binary')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
-@app.route('/assets/js/<path:filename>')
-def serve_js(filename):
-    """Serve JavaScript files for offline support."""
-    js_path = os.path.join(os.path.dirname(__file__), 'assets', 'js')
-    return send_from_directory(js_path, filename)
+@app.route('/api/urdf')
+def get_urdf():
+    """Serve the URDF file (read once at startup)."""
+    if ROBOT_MODEL is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    response = Response(ROBOT_MODEL.urdf, mimetype='application/xml')
+    response.set_etag(ROBOT_MODEL.urdf_etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 
+@app.route('/api/model')
+def get_model():
+    """
+    Kinematic tree parsed from the URDF at startup: links (mesh, visual origin),
+    joints (type, parent, child, origin, axis, limits), root link and motor id -> joint.
+    """
+    if ROBOT_MODEL is None:
+        return jsonify({'error': 'URDF not loaded'}), 404
+    response = Response(ROBOT_MODEL.json, mimetype='application/json')
+    response.set_etag(ROBOT_MODEL.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 def run_flask_app():
@@ -196,10 +291,19 @@ def run_flask_app():
 
 
 def main():
+    global broadcaster
+    
     # Get network interface from command line if provided
     network_interface = sys.argv[1] if len(sys.argv) > 1 else None
     print(f"Using network interface: {network_interface}")
     
+    # Start the broadcaster before samples arrive
+    broadcaster = create_broadcaster(EMIT_HZ)
+    broadcaster.start()
+    
+    # Pack the robot meshes in the background (cached in .asset_cache/ after the first run)
+    MODEL_PACK.start()
+    
     # Initialize robot subscriber
     try:
         init_robot_subscriber(network_interface)
@@ -0,0 +1,128 @@
+"""
+Fleet mode: one dashboard process serving several robots (--fleet).
+Each robot is given as ID=TYPE[,interface=IF][,domain=N][,replay=DIR][,record=DIR]
+and served under /robot/ID/. Robots of the same type share the parsed URDF,
+kinematics and packed meshes (robot_state.RobotAssets); the Flask app,
+static assets and Socket.IO server are shared by all of them.
+
+unitree_sdk2py's ChannelFactory is a process-wide singleton bound to one DDS
+domain, so live robots are read with cyclonedds (which the SDK is built on)
+directly: one DomainParticipant per robot, each with its own domain ID and
+network interface. CycloneDDS accepts one configuration per domain ID in a
+process, so every live robot needs a distinct domain ID.
+"""
+
+import re
+
+LOWSTATE_TOPIC = 'rt/lowstate'
+SPEC_KEYS = ('interface', 'domain', 'replay', 'record')
+ROBOT_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Same network settings unitree_sdk2py's ChannelFactoryInitialize applies
+CYCLONE_CONFIG = '''<?xml version="1.0" encoding="UTF-8" ?>
+<CycloneDDS>
+    <Domain Id="any">
+        <General>
+            <Interfaces>
+                {interface}
+            </Interfaces>
+        </General>
+    </Domain>
+</CycloneDDS>'''
+
+
+class RobotSpec:
+    """One --fleet entry."""
+
+    __slots__ = ('robot_id', 'robot_type', 'interface', 'domain', 'replay', 'record')
+
+    def __init__(self, robot_id, robot_type, interface=None, domain=0, replay=None, record=None):
+        self.robot_id = robot_id
+        self.robot_type = robot_type
+        self.interface = interface
+        self.domain = domain
+        self.replay = replay
+        self.record = record
+
+    def __repr__(self):
+        source = f'replay {self.replay}' if self.replay else f'domain {self.domain}, interface {self.interface}'
+        return f'{self.robot_id} ({self.robot_type.upper()}, {source})'
+
+
+def parse_robot_spec(text):
+    """Parse 'ID=TYPE[,key=value...]' into a RobotSpec; raises ValueError."""
+    head, _, rest = text.partition(',')
+    robot_id, _, robot_type = head.partition('=')
+    robot_id, robot_type = robot_id.strip(), robot_type.strip().lower()
+    if not ROBOT_ID.match(robot_id):
+        raise ValueError(f"Invalid robot id in {text!r}: use letters, digits, '-' and '_'")
+    if robot_type not in ('g1', 'h1'):
+        raise ValueError(f"Invalid robot type in {text!r}: must be g1 or h1")
+    options = {}
+    for item in filter(None, rest.split(',')):
+        key, sep, value = item.partition('=')
+        key = key.strip()
+        if not sep or key not in SPEC_KEYS:
+            raise ValueError(f"Invalid option {item!r} in {text!r}: expected one of {', '.join(SPEC_KEYS)}")
+        options[key] = value.strip()
+    if 'domain' in options:
+        try:
+            options['domain'] = int(options['domain'])
+        except ValueError:
+            raise ValueError(f"Invalid domain in {text!r}: must be an integer") from None
+    return RobotSpec(robot_id, robot_type, **options)
+
+
+def parse_fleet(texts):
+    """Parse all --fleet entries and check ids and live domains are unique."""
+    specs = [parse_robot_spec(text) for text in texts]
+    ids = [spec.robot_id for spec in specs]
+    duplicates = sorted({robot_id for robot_id in ids if ids.count(robot_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate robot id: {', '.join(duplicates)}")
+    domains = [spec.domain for spec in specs if not spec.replay]
+    shared = sorted({domain for domain in domains if domains.count(domain) > 1})
+    if shared:
+        raise ValueError(f"Live robots need distinct DDS domain IDs (shared: {', '.join(map(str, shared))})")
+    return specs
+
+
+class LowStateReader:
+    """rt/lowstate subscription of one robot on its own DDS domain."""
+
+    def __init__(self, spec, low_state_type, callback):
+        try:
+            from cyclonedds.core import Listener
+            from cyclonedds.domain import Domain, DomainParticipant
+            from cyclonedds.sub import DataReader
+            from cyclonedds.topic import Topic
+        except ImportError as e:
+            raise RuntimeError(f"Fleet mode needs cyclonedds (installed with unitree_sdk2py): {e}") from None
+
+        if spec.interface:
+            interface = f'<NetworkInterface name="{spec.interface}" priority="default" multicast="default"/>'
+        else:
+            interface = '<NetworkInterface autodetermine="true" priority="default" multicast="default"/>'
+        self.spec = spec
+        self.callback = callback
+        self.received = 0
+        self.errors = 0
+        self._domain = Domain(spec.domain, CYCLONE_CONFIG.format(interface=interface))
+        self._participant = DomainParticipant(spec.domain)
+        self._topic = Topic(self._participant, LOWSTATE_TOPIC, low_state_type)
+        self._reader = DataReader(self._participant, self._topic,
+                                  listener=Listener(on_data_available=self._on_data_available))
+
+    def _on_data_available(self, reader):
+        # Runs on the domain's receive thread; the callback only decodes and hands over
+        for msg in reader.take(N=64):
+            self.received += 1
+            try:
+                self.callback(msg)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error handling LowState from {self.spec.robot_id}: {e}")
+
+    def stats(self):
+        return {'domain': self.spec.domain, 'interface': self.spec.interface,
+                'received': self.received, 'errors': self.errors}
@@ -0,0 +1,210 @@
+"""
+Vectorized forward kinematics.
+Link world poses are computed from the kinematic tree parsed by urdf_model
+and joint angles (q) from LowState. Joints are grouped by depth in the tree,
+so one pass costs one batched matrix product per tree level (about ten for
+G1/H1), not one per joint, and the same pass runs over many timesteps at once
+for history replay.
+
+Poses are relative to the root link (pelvis); the floating base is not
+estimated.
+"""
+
+import numpy as np
+
+from motor_layout import Q
+
+REVOLUTE = ('revolute', 'continuous')
+PRISMATIC = ('prismatic',)
+
+
+def rpy_matrix(rpy):
+    """Rotation matrix of URDF roll/pitch/yaw (fixed X, then Y, then Z)."""
+    r, p, y = rpy
+    cr, sr, cp, sp, cy, sy = np.cos(r), np.sin(r), np.cos(p), np.sin(p), np.cos(y), np.sin(y)
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr],
+    ])
+
+
+def _quaternion_robust(m):
+    """(n, 3, 3) -> (n, 4) via the largest of the four quaternion components."""
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    candidates = np.stack([
+        np.stack([1 + 2 * m[:, 0, 0] - trace, m[:, 0, 1] + m[:, 1, 0],
+                  m[:, 0, 2] + m[:, 2, 0], m[:, 2, 1] - m[:, 1, 2]], -1),
+        np.stack([m[:, 0, 1] + m[:, 1, 0], 1 + 2 * m[:, 1, 1] - trace,
+                  m[:, 1, 2] + m[:, 2, 1], m[:, 0, 2] - m[:, 2, 0]], -1),
+        np.stack([m[:, 0, 2] + m[:, 2, 0], m[:, 1, 2] + m[:, 2, 1],
+                  1 + 2 * m[:, 2, 2] - trace, m[:, 1, 0] - m[:, 0, 1]], -1),
+        np.stack([m[:, 2, 1] - m[:, 1, 2], m[:, 0, 2] - m[:, 2, 0],
+                  m[:, 1, 0] - m[:, 0, 1], 1 + trace], -1),
+    ], 1)
+    best = np.argmax(np.stack([m[:, 0, 0], m[:, 1, 1], m[:, 2, 2], trace], -1), axis=-1)
+    quat = candidates[np.arange(len(m)), best]
+    return quat * np.where(quat[:, 3:] < 0, -1.0, 1.0)
+
+
+def matrix_to_quaternion(rotations):
+    """(..., 3, 3) rotation matrices -> (..., 4) unit quaternions as (x, y, z, w), w >= 0."""
+    m00, m01, m02 = rotations[..., 0, 0], rotations[..., 0, 1], rotations[..., 0, 2]
+    m10, m11, m12 = rotations[..., 1, 0], rotations[..., 1, 1], rotations[..., 1, 2]
+    m20, m21, m22 = rotations[..., 2, 0], rotations[..., 2, 1], rotations[..., 2, 2]
+    quat = np.empty(rotations.shape[:-2] + (4,))
+    # Magnitudes from the diagonal, signs from the off-diagonal differences
+    quat[..., 3] = np.sqrt(np.maximum(0.0, 1 + m00 + m11 + m22)) / 2
+    quat[..., 0] = np.copysign(np.sqrt(np.maximum(0.0, 1 + m00 - m11 - m22)) / 2, m21 - m12)
+    quat[..., 1] = np.copysign(np.sqrt(np.maximum(0.0, 1 - m00 + m11 - m22)) / 2, m02 - m20)
+    quat[..., 2] = np.copysign(np.sqrt(np.maximum(0.0, 1 - m00 - m11 + m22)) / 2, m10 - m01)
+    # Near half turns the differences carry no sign information; redo those exactly
+    flat = quat.reshape(-1, 4)
+    near = np.flatnonzero(flat[:, 3] < 0.1)
+    if len(near):
+        flat[near] = _quaternion_robust(rotations.reshape(-1, 3, 3)[near])
+    flat /= np.linalg.norm(flat, axis=-1, keepdims=True)
+    return quat
+
+
+class ForwardKinematics:
+    """
+    Batched forward kinematics of one robot.
+
+    model is a urdf_model.RobotModel; motor_ids lists the motor id of each q
+    column (MotorLayout.motor_ids), so MotorFrame.values[Q] can be passed as is.
+    Joints without a motor stay at their zero position.
+    """
+
+    def __init__(self, model, motor_ids):
+        self.model = model
+        self.root = model.root
+
+        # Links in breadth-first order from the root; joints grouped by depth
+        children = {}
+        for name, joint in model.joints.items():
+            children.setdefault(joint['parent'], []).append(name)
+        self.link_names = [self.root]
+        joint_names, depths = [], []
+        frontier, depth = [self.root], 0
+        while frontier:
+            next_frontier = []
+            for link in frontier:
+                for name in children.get(link, []):
+                    joint_names.append(name)
+                    depths.append(depth)
+                    self.link_names.append(model.joints[name]['child'])
+                    next_frontier.append(model.joints[name]['child'])
+            frontier, depth = next_frontier, depth + 1
+        self.joint_names = joint_names
+        self.link_index = {name: i for i, name in enumerate(self.link_names)}
+        self.num_links = len(self.link_names)
+        self.num_joints = len(joint_names)
+
+        joints = [model.joints[name] for name in joint_names]
+        self._parent = np.array([self.link_index[j['parent']] for j in joints], dtype=np.intp)
+        self._child = np.array([self.link_index[j['child']] for j in joints], dtype=np.intp)
+        depths = np.array(depths, dtype=np.intp)
+        self._levels = [np.flatnonzero(depths == d) for d in range(depth)]
+        self.num_levels = len(self._levels)
+
+        # Static joint origins and unit axes
+        self._origin_r = np.array([rpy_matrix(j['rpy']) for j in joints]).reshape(-1, 3, 3)
+        self._origin_t = np.array([j['xyz'] for j in joints], dtype=np.float64).reshape(-1, 3)
+        axes = np.array([j['axis'] for j in joints], dtype=np.float64).reshape(-1, 3)
+        axes /= np.where(np.linalg.norm(axes, axis=1) > 0, np.linalg.norm(axes, axis=1), 1.0)[:, None]
+        self._revolute = np.flatnonzero([j['type'] in REVOLUTE for j in joints])
+        self._prismatic = np.flatnonzero([j['type'] in PRISMATIC for j in joints])
+        # Rodrigues terms of each revolute axis premultiplied by the origin rotation:
+        # origin_R @ R(q) = O + sin(q) O K + (1 - cos(q)) O K^2, with K the axis cross matrix
+        k = np.zeros((len(self._revolute), 3, 3))
+        a = axes[self._revolute]
+        k[:, 0, 1], k[:, 0, 2], k[:, 1, 2] = -a[:, 2], a[:, 1], -a[:, 0]
+        k = k - k.transpose(0, 2, 1)
+        origin = self._origin_r[self._revolute]
+        self._ok = (origin @ k)[:, None]
+        self._ok2 = (origin @ k @ k)[:, None]
+        # Prismatic axes in the parent frame: translation = origin_t + q * (origin_R @ axis)
+        self._slide = np.einsum('jab,jb->ja', self._origin_r[self._prismatic], axes[self._prismatic])
+
+        # q column -> joint index
+        joint_index = {name: i for i, name in enumerate(joint_names)}
+        self.motor_ids = list(motor_ids)
+        columns, targets = [], []
+        for column, motor_id in enumerate(self.motor_ids):
+            name = model.motor_joints.get(motor_id)
+            if name in joint_index:
+                columns.append(column)
+                targets.append(joint_index[name])
+        self._q_columns = np.array(columns, dtype=np.intp)
+        self._q_joints = np.array(targets, dtype=np.intp)
+
+    def joint_positions(self, q):
+        """(T, num_motors) q columns -> (T, num_joints) joint positions; missing or NaN q -> 0."""
+        positions = np.zeros((q.shape[0], self.num_joints))
+        positions[:, self._q_joints] = q[:, self._q_columns]
+        return np.nan_to_num(positions, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def transforms(self, q):
+        """
+        Link world transforms for q of shape (num_motors,) or (T, num_motors).
+        Returns rotations (..., num_links, 3, 3) and translations (..., num_links, 3),
+        links in link_names order.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        single = q.ndim == 1
+        positions = self.joint_positions(q[None] if single else q).T   # (joints, T)
+        steps = positions.shape[1]
+
+        # Local joint transforms, joint-major so each tree level is a contiguous block.
+        # Revolute: origin_R @ R(q) = O + sin(q) OK + (1 - cos(q)) OK^2
+        local_r = np.broadcast_to(self._origin_r[:, None], (self.num_joints, steps, 3, 3)).copy()
+        local_t = np.broadcast_to(self._origin_t[:, None], (self.num_joints, steps, 3)).copy()
+        if len(self._revolute):
+            angle = positions[self._revolute, :, None, None]
+            local_r[self._revolute] += np.sin(angle) * self._ok + (1 - np.cos(angle)) * self._ok2
+        if len(self._prismatic):
+            local_t[self._prismatic] += positions[self._prismatic, :, None] * self._slide[:, None]
+
+        # Chain from the root one tree level at a time
+        world_r = np.empty((self.num_links, steps, 3, 3))
+        world_t = np.empty((self.num_links, steps, 3))
+        world_r[0] = np.eye(3)
+        world_t[0] = 0.0
+        for level in self._levels:
+            parent_r = world_r[self._parent[level]]
+            world_r[self._child[level]] = parent_r @ local_r[level]
+            world_t[self._child[level]] = (parent_r @ local_t[level][..., None])[..., 0] + world_t[self._parent[level]]
+        if single:
+            return world_r[:, 0], world_t[:, 0]
+        return world_r.swapaxes(0, 1), world_t.swapaxes(0, 1)
+
+    def poses(self, q, links=None):
+        """
+        Link positions and orientations for q of shape (num_motors,) or (T, num_motors).
+        Returns (names, xyz (..., n, 3), quat (..., n, 4) as x, y, z, w) for the
+        given link names (default: all links).
+        """
+        rotations, translations = self.transforms(q)
+        names = list(links) if links is not None else self.link_names
+        if links is not None:
+            unknown = [name for name in names if name not in self.link_index]
+            if unknown:
+                raise ValueError(f"Unknown link: {', '.join(unknown)}")
+            index = [self.link_index[name] for name in names]
+            rotations, translations = rotations[..., index, :, :], translations[..., index, :]
+        return names, translations, matrix_to_quaternion(rotations)
+
+    def frame_poses(self, frame, links=None):
+        """poses() of one decoded MotorFrame."""
+        return self.poses(frame.values[Q], links)
+
+
+def poses_payload(names, xyz, quat, decimals=6):
+    """
+    JSON-ready {link: {'xyz': ..., 'quat': ...}} from poses(); for a batch of
+    timesteps each value is a list with one entry per timestep.
+    """
+    xyz = np.round(xyz, decimals).swapaxes(0, -2).tolist()
+    quat = np.round(quat, decimals).swapaxes(0, -2).tolist()
+    return {name: {'xyz': xyz[i], 'quat': quat[i]} for i, name in enumerate(names)}
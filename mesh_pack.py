@@ -0,0 +1,329 @@
+"""
+Packed robot model: every URDF visual mesh decimated to a per-mesh triangle
+budget at several levels of detail, quantized to 16-bit positions and written
+into one binary glTF (GLB) file, so the dashboard loads the whole robot with
+a single request instead of 60+ STL files.
+
+GLB layout (glTF 2.0 + KHR_mesh_quantization):
+    one mesh and one node per (link, LOD); positions are normalized uint16
+    (stride 8) dequantized by the node's translation/scale, indices are
+    uint16 or uint32. Node extras hold {link, lod, mesh}; the URDF visual
+    origin is not applied (clients apply it as for STL files).
+
+Build and inspect offline:
+    python mesh_pack.py assets/g1/g1_29dof_rev_1_0.urdf -o g1.glb --budgets 8000 2000 500
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from static_assets import CACHE_DIR
+from urdf_model import parse_urdf
+
+FORMAT_VERSION = 1
+DEFAULT_LOD_BUDGETS = (8000, 2000, 500)   # max triangles per mesh for LOD 0, 1, 2
+
+GLB_MAGIC = 0x46546C67   # 'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+UNSIGNED_SHORT, UNSIGNED_INT = 5123, 5125
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+
+def read_stl(path):
+    """Triangles of a binary or ASCII STL file as a (n, 3, 3) float32 array."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) >= 84:
+        count = struct.unpack_from('<I', data, 80)[0]
+        if 84 + 50 * count == len(data):
+            records = np.frombuffer(data, dtype=np.dtype([('normal', '<f4', 3), ('v', '<f4', (3, 3)),
+                                                          ('attr', '<u2')]), count=count, offset=84)
+            return records['v'].copy()
+    # ASCII: every 'vertex x y z' line, three per facet
+    values = [line.split()[1:4] for line in data.decode('ascii', 'replace').splitlines()
+              if line.strip().startswith('vertex')]
+    return np.array(values, dtype=np.float32).reshape(-1, 3, 3)
+
+
+def _unique_rows(keys):
+    """(first index, inverse) of the unique rows of an (n, 3) int64 array."""
+    keys = keys - keys.min(axis=0)
+    span = keys.max(axis=0) + 1
+    if float(span[0]) * float(span[1]) * float(span[2]) < 2.0 ** 62:
+        # One packed int64 per row: a 1-D sort instead of a lexicographic one
+        packed = (keys[:, 0] * span[1] + keys[:, 1]) * span[2] + keys[:, 2]
+        _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    else:
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def weld(triangles, tolerance=1e-6):
+    """Merge coincident corners: (vertices (m, 3), faces (n, 3)) without degenerate faces."""
+    corners = triangles.reshape(-1, 3).astype(np.float64)
+    first, inverse = _unique_rows(np.round(corners / tolerance).astype(np.int64))
+    return corners[first], _drop_degenerate(inverse.reshape(-1, 3))
+
+
+def _drop_degenerate(faces):
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    return faces[keep]
+
+
+def _cluster(vertices, faces, cell):
+    """Vertex clustering on a grid of the given cell size (mean position per occupied cell)."""
+    keys = np.floor((vertices - vertices.min(axis=0)) / cell).astype(np.int64)
+    _, cluster = _unique_rows(keys)
+    counts = np.bincount(cluster)
+    centers = np.stack([np.bincount(cluster, weights=vertices[:, k]) for k in range(3)], axis=1)
+    centers /= counts[:, None]
+
+    merged = _drop_degenerate(cluster[faces])
+    # Faces collapsed onto the same three clusters are drawn once
+    first, _ = _unique_rows(np.sort(merged, axis=1))
+    merged = merged[np.sort(first)]
+    used, remap = np.unique(merged, return_inverse=True)
+    return centers[used], remap.reshape(-1, 3)
+
+
+def decimate(vertices, faces, budget):
+    """Reduce a welded mesh to at most `budget` triangles (grid vertex clustering)."""
+    if len(faces) <= budget:
+        return vertices, faces
+    extent = float(np.max(vertices.max(axis=0) - vertices.min(axis=0)))
+    best = None
+    # Binary search the cell size on a log scale for the finest grid within budget
+    lo, hi = np.log(extent * 1e-4), np.log(extent)
+    for _ in range(16):
+        mid = (lo + hi) / 2
+        candidate = _cluster(vertices, faces, np.exp(mid))
+        if len(candidate[1]) <= budget:
+            best, hi = candidate, mid
+        else:
+            lo = mid
+    return best if best is not None else _cluster(vertices, faces, extent)
+
+
+def quantize(vertices):
+    """uint16 positions plus the (offset, scale) that restores them: v = offset + scale * q / 65535."""
+    offset = vertices.min(axis=0)
+    scale = vertices.max(axis=0) - offset
+    scale[scale == 0] = 1.0
+    q = np.round((vertices - offset) / scale * 65535).astype(np.uint16)
+    return q, offset, scale
+
+
+def urdf_visual_meshes(urdf_path):
+    """{link name: mesh file path} for every link with a visual mesh."""
+    base = os.path.dirname(urdf_path)
+    with open(urdf_path, 'rb') as f:
+        links, _ = parse_urdf(f.read())
+    meshes = {}
+    for name, link in links.items():
+        filename = link['visual']
+        if not filename:
+            continue
+        # 'meshes/x.STL' or 'package://<pkg>/meshes/x.STL' -> <urdf dir>/meshes/x.STL
+        if filename.startswith('package://'):
+            filename = filename.split('/', 3)[-1]
+        meshes[name] = os.path.join(base, filename)
+    return meshes
+
+
+class PackedModel:
+    """Decimated, quantized LODs of all visual meshes of one URDF."""
+
+    def __init__(self, urdf_path, budgets=DEFAULT_LOD_BUDGETS):
+        self.urdf_path = urdf_path
+        self.budgets = tuple(int(b) for b in budgets)
+        self.links = urdf_visual_meshes(urdf_path)
+        self.source_triangles = 0
+        self.lod_triangles = [0] * len(self.budgets)
+        # mesh path -> list per LOD of (q, offset, scale, faces)
+        self.meshes = {}
+        for path in sorted(set(self.links.values())):
+            if not os.path.exists(path):
+                print(f"Warning: mesh not found: {path}")
+                continue
+            triangles = read_stl(path)
+            self.source_triangles += len(triangles)
+            vertices, faces = weld(triangles)
+            levels = []
+            for k, budget in enumerate(self.budgets):
+                vertices, faces = decimate(vertices, faces, budget)
+                q, offset, scale = quantize(vertices)
+                levels.append((q, offset, scale, faces))
+                self.lod_triangles[k] += len(faces)
+            self.meshes[path] = levels
+
+    def to_glb(self, lods=None):
+        """GLB bytes holding the given LOD levels (default: all)."""
+        lods = list(range(len(self.budgets))) if lods is None else list(lods)
+        gltf = {
+            'asset': {'version': '2.0', 'generator': 'mesh_pack.py'},
+            'extensionsUsed': ['KHR_mesh_quantization'],
+            'extensionsRequired': ['KHR_mesh_quantization'],
+            'buffers': [], 'bufferViews': [], 'accessors': [], 'meshes': [], 'nodes': [],
+            'scenes': [{'nodes': []}], 'scene': 0,
+            'extras': {'format': FORMAT_VERSION, 'lods': lods,
+                       'budgets': [self.budgets[k] for k in lods]},
+        }
+        binary = bytearray()
+
+        def add_view(data, target, stride=None):
+            binary.extend(b'\0' * (-len(binary) % 4))
+            view = {'buffer': 0, 'byteOffset': len(binary), 'byteLength': len(data), 'target': target}
+            if stride:
+                view['byteStride'] = stride
+            binary.extend(data)
+            gltf['bufferViews'].append(view)
+            return len(gltf['bufferViews']) - 1
+
+        mesh_index = {}   # (path, lod) -> glTF mesh index
+        for path, levels in self.meshes.items():
+            for lod in lods:
+                q, offset, scale, faces = levels[lod]
+                padded = np.zeros((len(q), 4), dtype='<u2')   # vertex stride must be a multiple of 4
+                padded[:, :3] = q
+                positions = {
+                    'bufferView': add_view(padded.tobytes(), ARRAY_BUFFER, stride=8),
+                    'componentType': UNSIGNED_SHORT, 'normalized': True, 'count': len(q), 'type': 'VEC3',
+                    'min': q.min(axis=0).tolist(), 'max': q.max(axis=0).tolist(),
+                }
+                wide = len(q) > 0xFFFF
+                indices = {
+                    'bufferView': add_view(faces.astype('<u4' if wide else '<u2').tobytes(), ELEMENT_ARRAY_BUFFER),
+                    'componentType': UNSIGNED_INT if wide else UNSIGNED_SHORT,
+                    'count': faces.size, 'type': 'SCALAR',
+                }
+                gltf['accessors'] += [positions, indices]
+                n = len(gltf['accessors'])
+                gltf['meshes'].append({'primitives': [{'attributes': {'POSITION': n - 2}, 'indices': n - 1}]})
+                mesh_index[(path, lod)] = (len(gltf['meshes']) - 1, offset, scale)
+
+        for link, path in self.links.items():
+            for lod in lods:
+                if (path, lod) not in mesh_index:
+                    continue
+                mesh, offset, scale = mesh_index[(path, lod)]
+                gltf['nodes'].append({
+                    'name': link, 'mesh': mesh,
+                    'translation': offset.tolist(), 'scale': scale.tolist(),
+                    'extras': {'link': link, 'lod': lod, 'mesh': os.path.basename(path)},
+                })
+                if lod == lods[0]:
+                    gltf['scenes'][0]['nodes'].append(len(gltf['nodes']) - 1)
+
+        binary.extend(b'\0' * (-len(binary) % 4))
+        gltf['buffers'].append({'byteLength': len(binary)})
+        chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+        chunk += b' ' * (-len(chunk) % 4)
+        total = 12 + 8 + len(chunk) + 8 + len(binary)
+        return b''.join([struct.pack('<III', GLB_MAGIC, 2, total),
+                         struct.pack('<II', len(chunk), CHUNK_JSON), chunk,
+                         struct.pack('<II', len(binary), CHUNK_BIN), bytes(binary)])
+
+
+class ModelPack:
+    """
+    GLB files of one robot, one per LOD, built in the background and cached in
+    .asset_cache/ keyed by the URDF, its meshes and the budgets.
+    """
+
+    def __init__(self, urdf_path, budgets=DEFAULT_LOD_BUDGETS, cache_dir=CACHE_DIR):
+        self.urdf_path = urdf_path
+        self.budgets = tuple(budgets)
+        self.cache_dir = cache_dir
+        self._files = None   # lod -> (bytes, etag), set once built
+        self._lock = threading.Lock()
+
+    @property
+    def num_lods(self):
+        return len(self.budgets)
+
+    def _cache_key(self):
+        sha = hashlib.sha256(f'{FORMAT_VERSION}:{self.budgets}'.encode())
+        for path in [self.urdf_path] + sorted(set(urdf_visual_meshes(self.urdf_path).values())):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    sha.update(f.read())
+        return sha.hexdigest()[:16]
+
+    def build(self):
+        """Load the GLBs from the cache dir, or build and store them."""
+        with self._lock:
+            if self._files is not None:
+                return
+            key = self._cache_key()
+            paths = [os.path.join(self.cache_dir, f'model-{key}-lod{lod}.glb') for lod in range(self.num_lods)]
+            if all(os.path.exists(path) for path in paths):
+                blobs = []
+                for path in paths:
+                    with open(path, 'rb') as f:
+                        blobs.append(f.read())
+            else:
+                start = time.perf_counter()
+                model = PackedModel(self.urdf_path, self.budgets)
+                blobs = [model.to_glb([lod]) for lod in range(self.num_lods)]
+                os.makedirs(self.cache_dir, exist_ok=True)
+                for path, blob in zip(paths, blobs):
+                    with open(path + '.tmp', 'wb') as f:
+                        f.write(blob)
+                    os.replace(path + '.tmp', path)
+                print(f"Packed model built in {time.perf_counter() - start:.1f}s: "
+                      f"{model.source_triangles} triangles -> {model.lod_triangles} per LOD")
+            self._files = {lod: (blob, hashlib.sha256(blob).hexdigest()[:16]) for lod, blob in enumerate(blobs)}
+
+    def start(self):
+        """Build in a daemon thread so startup is not delayed."""
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print(f"Error building packed model: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, lod):
+        """(GLB bytes, etag) for a LOD, or None while the model is still being built."""
+        # Checked first so a bad lod is a client error even before the build finishes
+        if not 0 <= lod < self.num_lods:
+            raise ValueError(f"lod must be between 0 and {self.num_lods - 1}")
+        files = self._files
+        if files is None:
+            return None
+        return files[lod]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack URDF visual meshes into a decimated, quantized GLB')
+    parser.add_argument('urdf', help='URDF file, e.g. assets/g1/g1_29dof_rev_1_0.urdf')
+    parser.add_argument('-o', '--output', required=True, help='Output .glb file')
+    parser.add_argument('--budgets', type=int, nargs='+', default=list(DEFAULT_LOD_BUDGETS),
+                        help='Max triangles per mesh for each LOD (default: %(default)s)')
+    parser.add_argument('--lod', type=int, nargs='*', default=None,
+                        help='LOD levels to include (default: all)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = PackedModel(args.urdf, args.budgets)
+    glb = model.to_glb(args.lod)
+    with open(args.output, 'wb') as f:
+        f.write(glb)
+    mesh_bytes = sum(os.path.getsize(path) for path in model.meshes)
+    print(f"{len(model.links)} links, {len(model.meshes)} meshes, {model.source_triangles} triangles "
+          f"({mesh_bytes / 1e6:.1f} MB STL)")
+    for k, (budget, triangles) in enumerate(zip(model.budgets, model.lod_triangles)):
+        print(f"  LOD {k}: <= {budget} per mesh -> {triangles} triangles")
+    print(f"Wrote {args.output}: {len(glb) / 1e6:.2f} MB in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Delta encoding for motor updates.
+Tracks the last values sent to a Socket.IO room and emits only the motors
+whose fields moved beyond a per-field deadband, with periodic keyframes.
+"""
+
+import time
+
+import numpy as np
+
+from motor_layout import FIELD_NAMES, TEMP1, TEMP2, Q, DQ, TAU, TEMP_PAIR
+
+# Minimum change (per field) before a motor is resent
+DEFAULT_DEADBANDS = {
+    'temp1': 1.0,     # degC
+    'temp2': 1.0,     # degC
+    'q': 0.002,       # rad
+    'dq': 0.05,       # rad/s
+    'tau': 0.1,       # Nm
+}
+DEFAULT_KEYFRAME_INTERVAL = 5.0  # seconds
+
+
+class MotorDeltaEncoder:
+    """Encoder for one room: full keyframes, then only changed motors and fields."""
+
+    def __init__(self, layout, deadbands=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.layout = layout
+        bands = dict(DEFAULT_DEADBANDS, **(deadbands or {}))
+        self._deadbands = np.array([bands[name] for name in FIELD_NAMES])[:, None]
+        self.keyframe_interval = keyframe_interval
+        self._last_sent = None
+        self._last_keyframe = 0.0
+        self._force_keyframe = True
+
+    def request_keyframe(self):
+        """Send a full frame on the next tick (e.g. when a client joins the room)."""
+        self._force_keyframe = True
+
+    def __call__(self, snapshot, seq):
+        """Return the payload for a MotorSnapshot, or None when nothing moved past its deadband."""
+        now = time.monotonic()
+        frame = snapshot.frame
+        values = frame.values
+        if (self._force_keyframe or self._last_sent is None or
+                self._last_sent.shape != values.shape or
+                now - self._last_keyframe >= self.keyframe_interval):
+            self._force_keyframe = False
+            self._last_keyframe = now
+            self._last_sent = values.copy()
+            return dict(snapshot.payload(), keyframe=True, seq=seq)
+
+        # NaN (field not present) never compares as changed
+        changed = np.abs(values - self._last_sent) >= self._deadbands
+        if not changed.any():
+            return None
+        # Temperatures are sent as a pair so the client can recompute avg
+        changed[TEMP1] |= changed[TEMP2]
+        changed[TEMP2] = changed[TEMP1]
+        self._last_sent[changed] = values[changed]
+
+        return {
+            'keyframe': False,
+            'seq': seq,
+            'timestamp': frame.timestamp,
+            'changes': self._changes(values, changed),
+        }
+
+    def _changes(self, values, changed):
+        layout = self.layout
+        pair = layout.temp_format == TEMP_PAIR
+        rows = values.tolist()
+        changes = []
+        for k in np.flatnonzero(changed.any(axis=0)).tolist():
+            motor = {'motor_id': layout.motor_ids[k]}
+            if changed[TEMP1, k] and layout.has_temp:
+                surface = int(rows[TEMP1][k])
+                winding = int(rows[TEMP2][k])
+                motor['surface'] = motor['temp1'] = surface
+                motor['winding'] = motor['temp2'] = winding
+                motor['avg'] = (surface + winding) / 2.0 if pair else surface
+            if changed[Q, k] and layout.has_q:
+                motor['position'] = rows[Q][k]
+            if changed[DQ, k] and layout.has_dq:
+                motor['velocity'] = rows[DQ][k]
+            if changed[TAU, k] and layout.has_tau:
+                motor['torque'] = rows[TAU][k]
+            changes.append(motor)
+        return changes
+
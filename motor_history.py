@@ -0,0 +1,292 @@
+"""
+Fixed-memory history of decoded motor samples.
+Samples are kept in a preallocated structured NumPy ring buffer; queries
+binary-search the time window and copy only the rows they return.
+
+Temperatures are also aggregated into cascading min/max/mean tiers
+(1 s -> 10 s -> 1 min) so long trend queries read a few thousand buckets
+instead of millions of raw samples.
+"""
+
+import math
+from threading import Lock
+
+import numpy as np
+
+from motor_layout import FIELD_NAMES, TEMP1, TEMP2
+
+DEFAULT_MAX_POINTS = 1000
+
+# Fields aggregated into tiers: surface (temp1) and winding (temp2) temperature
+TIER_FIELDS = ('temp1', 'temp2')
+_TIER_ROWS = slice(TEMP1, TEMP2 + 1)
+
+# (name, bucket seconds, bucket count): 2 h at 1 s, 24 h at 10 s, 7 days at 1 min
+DEFAULT_TIERS = (
+    ('1s', 1.0, 7200),
+    ('10s', 10.0, 8640),
+    ('1m', 60.0, 10080),
+)
+
+
+def history_dtype(num_motors):
+    """Row layout: one timestamp plus one float32 column per field per motor."""
+    return np.dtype([('timestamp', 'f8')] + [(name, 'f4', (num_motors,)) for name in FIELD_NAMES])
+
+
+def tier_dtype(num_motors):
+    """Bucket layout: start time, sample count and min/max/sum per tier field per motor."""
+    columns = [('timestamp', 'f8'), ('count', 'u4')]
+    for name in TIER_FIELDS:
+        columns += [(f'{name}_min', 'f4', (num_motors,)),
+                    (f'{name}_max', 'f4', (num_motors,)),
+                    (f'{name}_sum', 'f8', (num_motors,))]
+    return np.dtype(columns)
+
+
+class _TimeRing:
+    """Circular buffer of structured rows ordered by their 'timestamp' column."""
+
+    def __init__(self, dtype, capacity):
+        if capacity <= 0:
+            raise ValueError(f"History capacity must be positive, got {capacity}")
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._head = 0    # next physical row to write
+        self._count = 0   # number of valid rows
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def _next_row(self):
+        """Claim the next row for writing, overwriting the oldest when full."""
+        row = self._data[self._head]
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        return row
+
+    def _oldest(self):
+        """Physical row index of the oldest row."""
+        return self._head if self._count == self.capacity else 0
+
+    def oldest_timestamp(self):
+        return float(self._data['timestamp'][self._oldest()]) if self._count else None
+
+    def newest_timestamp(self):
+        return float(self._data['timestamp'][(self._head - 1) % self.capacity]) if self._count else None
+
+    def _segments(self):
+        """Timestamp views of the stored rows in chronological order (no copies)."""
+        ts = self._data['timestamp']
+        if self._count < self.capacity:
+            return (ts[:self._count],)
+        return (ts[self._head:], ts[:self._head])
+
+    def count_between(self, since, until):
+        lo, hi = self._logical_range(since, until)
+        return hi - lo
+
+    def _logical_range(self, since, until):
+        """Logical [lo, hi) indices (0 = oldest) of rows with since <= t <= until."""
+        lo = hi = 0
+        for seg in self._segments():
+            lo += int(np.searchsorted(seg, since, side='left'))
+            hi += int(np.searchsorted(seg, until, side='right'))
+        return lo, hi
+
+    def select(self, since, until, max_points):
+        """Copy out at most max_points evenly spaced rows from [since, until]."""
+        lo, hi = self._logical_range(since, until)
+        total = hi - lo
+        if total > max_points:
+            logical = lo + (np.arange(max_points, dtype=np.int64) * total) // max_points
+            logical[-1] = hi - 1
+            stride = total / max_points
+        else:
+            logical = np.arange(lo, hi, dtype=np.int64)
+            stride = 1
+        return self._data[(self._oldest() + logical) % self.capacity], total, stride
+
+
+class AggregateTier(_TimeRing):
+    """Fixed-width time buckets holding min/max/sum of the tier fields."""
+
+    def __init__(self, name, resolution, capacity, num_motors):
+        super().__init__(tier_dtype(num_motors), capacity)
+        self.name = name
+        self.resolution = float(resolution)
+        self.num_motors = num_motors
+        self._bucket = None   # start time of the bucket being accumulated
+        self._acc_count = 0
+        self._acc_min = np.empty((len(TIER_FIELDS), num_motors))
+        self._acc_max = np.empty((len(TIER_FIELDS), num_motors))
+        self._acc_sum = np.empty((len(TIER_FIELDS), num_motors))
+
+    def add(self, timestamp, count, vmin, vmax, vsum):
+        """
+        Accumulate `count` samples at `timestamp` summarised by per-field (min, max, sum).
+        Returns the completed bucket as (start, count, min, max, sum) when the
+        sample falls into a new bucket, otherwise None.
+        """
+        bucket = math.floor(timestamp / self.resolution) * self.resolution
+        completed = None
+        if bucket != self._bucket:
+            if self._bucket is not None:
+                completed = self._flush()
+            self._bucket = bucket
+            self._acc_count = count
+            self._acc_min[:] = vmin
+            self._acc_max[:] = vmax
+            self._acc_sum[:] = vsum
+            return completed
+
+        self._acc_count += count
+        np.fmin(self._acc_min, vmin, out=self._acc_min)
+        np.fmax(self._acc_max, vmax, out=self._acc_max)
+        self._acc_sum += vsum
+        return None
+
+    def _flush(self):
+        row = self._next_row()
+        row['timestamp'] = self._bucket
+        row['count'] = self._acc_count
+        for k, name in enumerate(TIER_FIELDS):
+            row[f'{name}_min'] = self._acc_min[k]
+            row[f'{name}_max'] = self._acc_max[k]
+            row[f'{name}_sum'] = self._acc_sum[k]
+        return (self._bucket, self._acc_count,
+                self._acc_min.copy(), self._acc_max.copy(), self._acc_sum.copy())
+
+
+class MotorHistory(_TimeRing):
+    """Ring buffer of the last `capacity` MotorFrames plus cascading aggregate tiers."""
+
+    def __init__(self, num_motors, capacity, tiers=DEFAULT_TIERS):
+        super().__init__(history_dtype(num_motors), capacity)
+        self.num_motors = num_motors
+        self.tiers = [AggregateTier(name, resolution, size, num_motors)
+                      for name, resolution, size in tiers]
+        self._lock = Lock()
+        self._tier_values = np.empty((len(TIER_FIELDS), num_motors))
+        # Plain views of the structured rows so append is two array writes
+        self._timestamps = self._data['timestamp']
+        self._values = (self._data.view(np.uint8)
+                        .reshape(self.capacity, self._data.itemsize)[:, 8:]
+                        .view(np.float32)
+                        .reshape(self.capacity, len(FIELD_NAMES), num_motors))
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + sum(tier.nbytes for tier in self.tiers)
+
+    def append(self, frame):
+        """Store one MotorFrame and fold it into the aggregate tiers."""
+        values = frame.values
+        n = values.shape[1]
+        with self._lock:
+            head = self._head
+            self._next_row()
+            self._timestamps[head] = frame.timestamp
+            self._values[head, :, :n] = values
+            if n < self.num_motors:
+                self._values[head, :, n:] = np.nan
+
+            if not self.tiers:
+                return
+            tier_values = self._tier_values
+            tier_values[:, :n] = values[_TIER_ROWS]
+            if n < self.num_motors:
+                tier_values[:, n:] = np.nan
+            # Each completed bucket cascades into the next coarser tier
+            update = (frame.timestamp, 1, tier_values, tier_values, tier_values)
+            for tier in self.tiers:
+                update = tier.add(*update)
+                if update is None:
+                    break
+
+    def time_range(self):
+        """(oldest, newest) timestamps of the raw samples, or None when empty."""
+        with self._lock:
+            if self._count == 0:
+                return None
+            return self.oldest_timestamp(), self.newest_timestamp()
+
+    def _pick_source(self, since, until, fields, max_points):
+        """
+        Choose the finest source (raw ring or tier) that covers the window and
+        fits it in max_points; fall back to the coarsest covering source.
+        """
+        if any(name not in TIER_FIELDS for name in fields):
+            return None
+        candidates = [self] + [tier for tier in self.tiers if len(tier)]
+        oldest = [source.oldest_timestamp() for source in candidates]
+        # Buckets start on a multiple of their width, before the first sample they hold
+        start = max(since, min(first + getattr(source, 'resolution', 0.0)
+                               for source, first in zip(candidates, oldest)))
+        covering = [source for source, first in zip(candidates, oldest)
+                    if first <= start + getattr(source, 'resolution', 0.0)]
+        if not covering:
+            return None
+        for source in covering:
+            if source.count_between(since, until) <= max_points:
+                return None if source is self else source
+        source = covering[-1]
+        return None if source is self else source
+
+    def query(self, since=float('-inf'), until=float('inf'), motors=None, fields=None,
+              max_points=DEFAULT_MAX_POINTS, resolution='auto'):
+        """
+        Return samples in [since, until] for the given motor indices and fields.
+
+        resolution is 'raw', a tier name ('1s', '10s', '1m') or 'auto', which
+        picks the finest source able to answer within max_points. Windows that
+        still hold more than max_points rows are decimated to evenly spaced
+        rows, so cost is proportional to the points returned.
+
+        Result: dict with 'timestamps' (n,), field -> (n, len(motors)) arrays,
+        'source', 'resolution', 'total_samples' and 'stride'. Tier results
+        hold the bucket mean per field plus '<field>_min' and '<field>_max'.
+        """
+        fields = list(fields or FIELD_NAMES)
+        for name in fields:
+            if name not in FIELD_NAMES:
+                raise ValueError(f"Unknown field: {name}")
+        motors = np.arange(self.num_motors) if motors is None else np.asarray(motors, dtype=np.intp)
+        max_points = max(1, int(max_points))
+
+        with self._lock:
+            if resolution == 'auto':
+                source = self._pick_source(since, until, fields, max_points) if self._count else None
+            elif resolution == 'raw':
+                source = None
+            else:
+                source = next((tier for tier in self.tiers if tier.name == resolution), None)
+                if source is None:
+                    raise ValueError(f"Unknown resolution: {resolution}")
+                if any(name not in TIER_FIELDS for name in fields):
+                    raise ValueError(f"Resolution {resolution} only supports fields: {', '.join(TIER_FIELDS)}")
+            # A tier with no flushed bucket yet is empty (falsy), not absent: it answers with no rows
+            rows, total, stride = (self if source is None else source).select(since, until, max_points)
+
+        result = {
+            'timestamps': rows['timestamp'],
+            'source': 'raw' if source is None else source.name,
+            'resolution': None if source is None else source.resolution,
+            'total_samples': total,
+            'stride': stride,
+        }
+        if source is None:
+            for name in fields:
+                result[name] = rows[name][:, motors]
+        else:
+            counts = np.maximum(rows['count'], 1)[:, None]
+            for name in fields:
+                result[name] = (rows[f'{name}_sum'][:, motors] / counts).astype(np.float32)
+                result[f'{name}_min'] = rows[f'{name}_min'][:, motors]
+                result[f'{name}_max'] = rows[f'{name}_max'][:, motors]
+        return result
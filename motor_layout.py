@@ -0,0 +1,270 @@
+"""
+Compiled per-robot motor layout and fast LowState decoding.
+The layout is built once from the robot config; each LowState message is
+decoded into a preallocated NumPy buffer instead of per-motor dicts.
+"""
+
+import json
+import math
+import struct
+from threading import Lock
+
+import numpy as np
+
+# Row indices into MotorFrame.values
+TEMP1, TEMP2, Q, DQ, TAU = range(5)
+FIELD_NAMES = ('temp1', 'temp2', 'q', 'dq', 'tau')
+NUM_FIELDS = len(FIELD_NAMES)
+
+# Temperature encodings seen in LowState messages
+TEMP_PAIR = 'pair'        # [surface, winding] array (G1, unitree_hg)
+TEMP_SINGLE = 'single'    # one-element array
+TEMP_SCALAR = 'scalar'    # plain integer (H1, unitree_go)
+
+# Binary motor frame (little-endian), see MotorLayout.to_binary:
+#   header: version u8, flags u8, motor count u16, sequence u32, timestamp f64
+#   body:   temp1 i16[n], temp2 i16[n], q f32[n], dq f32[n], tau f32[n]
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<BBHId')
+FLAG_TEMP, FLAG_Q, FLAG_DQ, FLAG_TAU, FLAG_TEMP_PAIR = 1, 2, 4, 8, 16
+
+
+def detect_temperature_format(temp):
+    """Classify a motor temperature field as pair, single-element array or scalar."""
+    try:
+        if hasattr(temp, '__len__'):
+            if len(temp) >= 2:
+                return TEMP_PAIR
+            if len(temp) == 1:
+                return TEMP_SINGLE
+    except TypeError:
+        pass
+    return TEMP_SCALAR
+
+
+class MotorFrame:
+    """One decoded LowState sample: a (NUM_FIELDS, num_motors) array plus timestamp."""
+
+    __slots__ = ('timestamp', 'values')
+
+    def __init__(self, timestamp, values):
+        self.timestamp = timestamp
+        self.values = values
+
+
+class MotorSnapshot:
+    """
+    Published motor state: one frame plus its encodings, each computed lazily
+    and at most once no matter how many channels or HTTP pollers read it.
+    Treat as immutable once published.
+    """
+
+    __slots__ = ('layout', 'frame', 'seq', 'etag', 'forecast', '_cache', '_lock')
+
+    def __init__(self, layout, frame, seq, tag='', forecast=None):
+        self.layout = layout
+        self.frame = frame
+        self.seq = seq
+        self.forecast = forecast   # minutes to overheat per motor (thermal_model.py), or None
+        self.etag = f'{tag}-{seq}' if tag else str(seq)
+        self._cache = {}
+        self._lock = Lock()
+
+    @property
+    def timestamp(self):
+        return self.frame.timestamp if self.frame is not None else 0
+
+    def _cached(self, key, build):
+        value = self._cache.get(key)
+        if value is None:
+            with self._lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = build()
+                    self._cache[key] = value
+        return value
+
+    def payload(self, content='full'):
+        """motor_update structure (shared; do not mutate)."""
+        return self._cached(('payload', content),
+                            lambda: self.layout.to_payload(self.frame, content, self.forecast))
+
+    def json(self, content='full'):
+        """UTF-8 JSON bytes of payload(content)."""
+        payload = self.payload(content)
+        return self._cached(('json', content), lambda: json.dumps(
+            payload, separators=(',', ':')).encode('utf-8'))
+
+    def binary(self):
+        """Packed binary frame (see MotorLayout.to_binary)."""
+        return self._cached('binary', lambda: self.layout.to_binary(self.frame, self.seq))
+
+
+class MotorLayout:
+    """Static motor schema for one robot type, compiled once in load_robot_config."""
+
+    def __init__(self, robot_type, motor_names, motor_to_mesh):
+        self.robot_type = robot_type
+        self.motor_ids = sorted(motor_names)
+        self.motor_names = [motor_names.get(i, f'Motor {i}') for i in self.motor_ids]
+        self.mesh_names = [motor_to_mesh.get(i, '') for i in self.motor_ids]
+        self.link_names = [motor_to_mesh.get(i, None) for i in self.motor_ids]
+        self.num_motors = len(self.motor_ids)
+        # Query keys (motor id, mesh name or motor name) -> column index
+        self._columns = {}
+        for k, motor_id in enumerate(self.motor_ids):
+            self._columns[str(motor_id)] = k
+            self._columns[self.motor_names[k].lower()] = k
+            if self.mesh_names[k]:
+                self._columns.setdefault(self.mesh_names[k].lower(), k)
+
+        # Message traits, detected from the first message received
+        self.temp_format = None
+        self.has_q = self.has_dq = self.has_tau = self.has_temp = False
+        self._count = 0
+        self._msg_len = 0
+        self._buffer = np.zeros((NUM_FIELDS, self.num_motors), dtype=np.float64)
+
+    @property
+    def message_length(self):
+        """Length of motor_state in the messages being decoded (0 before the first one)."""
+        return self._msg_len
+
+    def column(self, key):
+        """Map a motor id, mesh name or motor name to its column index."""
+        try:
+            return self._columns[str(key).strip().lower()]
+        except KeyError:
+            raise ValueError(f"Unknown motor: {key}") from None
+
+    def _bind(self, motor_state):
+        """Detect the message format and how many of our motors it carries."""
+        self._msg_len = len(motor_state)
+        count = 0
+        for motor_id in self.motor_ids:
+            if motor_id >= len(motor_state):
+                break
+            count += 1
+        self._count = count
+        if count == 0:
+            return
+        first = motor_state[self.motor_ids[0]]
+        self.has_temp = hasattr(first, 'temperature')
+        self.temp_format = detect_temperature_format(first.temperature) if self.has_temp else None
+        self.has_q = hasattr(first, 'q')
+        self.has_dq = hasattr(first, 'dq')
+        self.has_tau = hasattr(first, 'tau_est')
+        self._buffer[:] = np.nan
+
+    def decode(self, msg, timestamp):
+        """Decode a LowState message into a MotorFrame, or None if it has no motor data."""
+        motor_state = getattr(msg, 'motor_state', None)
+        if not motor_state:
+            return None
+        if len(motor_state) != self._msg_len:
+            self._bind(motor_state)
+        if self._count == 0:
+            return None
+
+        motors = [motor_state[i] for i in self.motor_ids[:self._count]]
+        buf = self._buffer
+        n = self._count
+
+        if self.has_temp:
+            fmt = self.temp_format
+            if fmt == TEMP_PAIR:
+                temps = [m.temperature for m in motors]
+                buf[TEMP1, :n] = [t[0] for t in temps]
+                buf[TEMP2, :n] = [t[1] for t in temps]
+            elif fmt == TEMP_SINGLE:
+                buf[TEMP1, :n] = [m.temperature[0] for m in motors]
+                buf[TEMP2, :n] = buf[TEMP1, :n]
+            else:
+                buf[TEMP1, :n] = [m.temperature for m in motors]
+                buf[TEMP2, :n] = buf[TEMP1, :n]
+        if self.has_q:
+            buf[Q, :n] = [m.q for m in motors]
+        if self.has_dq:
+            buf[DQ, :n] = [m.dq for m in motors]
+        if self.has_tau:
+            buf[TAU, :n] = [m.tau_est for m in motors]
+
+        return MotorFrame(timestamp, buf[:, :n].copy())
+
+    def binary_schema(self):
+        """Static description of the binary frame layout, served once to clients."""
+        return {
+            'version': BINARY_VERSION,
+            'motor_ids': self.motor_ids,
+            'header_bytes': BINARY_HEADER.size,
+            'sections': [['temp1', 'int16'], ['temp2', 'int16'],
+                         ['q', 'float32'], ['dq', 'float32'], ['tau', 'float32']],
+        }
+
+    def to_binary(self, frame, seq=0):
+        """Pack a frame into the compact binary format (~16 bytes per motor)."""
+        values = frame.values
+        n = values.shape[1]
+        flags = ((FLAG_TEMP if self.has_temp else 0) | (FLAG_Q if self.has_q else 0) |
+                 (FLAG_DQ if self.has_dq else 0) | (FLAG_TAU if self.has_tau else 0) |
+                 (FLAG_TEMP_PAIR if self.temp_format == TEMP_PAIR else 0))
+        header = BINARY_HEADER.pack(BINARY_VERSION, flags, n, seq & 0xFFFFFFFF, frame.timestamp)
+        temps = np.nan_to_num(values[TEMP1:TEMP2 + 1]).astype('<i2')
+        motion = np.nan_to_num(values[Q:TAU + 1]).astype('<f4')
+        return header + temps.tobytes() + motion.tobytes()
+
+    def to_payload(self, frame, content='full', forecast=None):
+        """
+        Build the motor_update / /api/motors JSON structure for a frame.
+        content: 'full', 'temps' (temperatures only) or 'positions' (joint positions only).
+        forecast: optional minutes to overheat per motor, added to temperature entries
+        as minutes_to_overheat (null while unknown or if the motor is not heading there).
+        """
+        if frame is None:
+            return {'temperatures': [], 'positions': [], 'timestamp': 0}
+
+        n = frame.values.shape[1]
+        t1, t2, q, dq, tau = frame.values.tolist()
+        temps = []
+        positions = []
+        pair = self.temp_format == TEMP_PAIR
+        with_temps = content != 'positions'
+        with_motion = content == 'full'
+        with_positions = content != 'temps' and self.has_q
+        if forecast is not None and with_temps:
+            forecast = [None if not math.isfinite(m) else round(m, 1) for m in forecast.tolist()]
+        for k in range(n):
+            motor_id = self.motor_ids[k]
+            if with_positions:
+                positions.append({
+                    'motor_id': motor_id,
+                    'position': q[k],
+                    'link_name': self.link_names[k],
+                })
+            if not with_temps:
+                continue
+            motor_info = {
+                'motor_id': motor_id,
+                'motor_name': self.motor_names[k],
+                'mesh_name': self.mesh_names[k],
+            }
+            if self.has_temp:
+                surface = int(t1[k])
+                winding = int(t2[k])
+                motor_info['surface'] = surface
+                motor_info['winding'] = winding
+                motor_info['temp1'] = surface
+                motor_info['temp2'] = winding
+                motor_info['avg'] = (surface + winding) / 2.0 if pair else surface
+            if forecast is not None:
+                motor_info['minutes_to_overheat'] = forecast[k]
+            if with_motion:
+                if self.has_q:
+                    motor_info['position'] = q[k]
+                if self.has_dq:
+                    motor_info['velocity'] = dq[k]
+                if self.has_tau:
+                    motor_info['torque'] = tau[k]
+            temps.append(motor_info)
+
+        return {'temperatures': temps, 'positions': positions, 'timestamp': frame.timestamp}
@@ -0,0 +1,607 @@
+"""
+Recorded motor telemetry and replay.
+A recording is a directory of chunk files. Each chunk holds a batch of
+decoded samples stored column by column (timestamps, then temp1 and temp2
+as int16 and q, dq and tau as float32 [samples, motors] arrays) behind a
+small JSON header, so readers memory-map the columns they need instead of
+parsing rows.
+
+Recorder appends decoded frames from the DDS callback into preallocated
+buffers; a writer thread turns each full buffer into a chunk file and
+deletes the oldest chunks beyond the size and age limits.
+
+ReplaySource reads a recording chunk by chunk and feeds LowState-like
+messages to low_state_callback at 1x, Nx or maximum speed, so multi-hour
+logs replay without being loaded into memory.
+
+Usage:
+    python recording.py info <dir>
+    python recording.py synth <dir> [--robot g1] [--seconds 600] [--rate 500]
+"""
+
+import argparse
+import collections
+import glob
+import importlib
+import json
+import math
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from motor_layout import FIELD_NAMES, NUM_FIELDS, TEMP1, TEMP2, Q, DQ, TAU, TEMP_PAIR, TEMP_SINGLE, TEMP_SCALAR
+
+# Chunk file: magic, version u16, reserved u16, header length u32, JSON header,
+# then each column 64-byte aligned at the offset recorded in the header.
+MAGIC = b'MTRC'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sHHI')
+ALIGN = 64
+CHUNK_SUFFIX = '.mtr'
+DEFAULT_CHUNK_ROWS = 5000   # 10 s at 500 Hz, ~2.4 MB for G1
+# Temperatures are whole degrees; everything else is float32
+COLUMN_DTYPES = {'temp1': '<i2', 'temp2': '<i2'}
+# Columns with per-motor min/max in each chunk header (see telemetry_index.py)
+INDEXED_FIELDS = ('temp1', 'temp2')
+
+# LowState fields present in a recording: header flag -> motor_state attribute
+MESSAGE_FIELDS = (('has_q', 'q', Q), ('has_dq', 'dq', DQ), ('has_tau', 'tau_est', TAU))
+
+
+def chunk_filename(start):
+    """File name of a chunk starting at unix time `start` (sorts chronologically)."""
+    return f'chunk-{int(start * 1e6):016d}{CHUNK_SUFFIX}'
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def column_stats(columns):
+    """Per-motor min and max of each temperature column, for the chunk index."""
+    stats = {}
+    for name in INDEXED_FIELDS:
+        stats[f'{name}_min'] = columns[name].min(axis=0).tolist()
+        stats[f'{name}_max'] = columns[name].max(axis=0).tolist()
+    return stats
+
+
+def write_chunk(path, info, timestamps, values, fsync=False):
+    """
+    Write one chunk atomically (temporary file, then rename), with fsync
+    before the rename when fsync is set.
+
+    info: recording traits (robot, motor_ids, temp_format, has_temp/has_q/has_dq/has_tau);
+    timestamps: (n,) float64; values: (NUM_FIELDS, n, motors) float32.
+    Returns the header written.
+    """
+    count = len(timestamps)
+    columns = [('timestamp', np.ascontiguousarray(timestamps, dtype='<f8'))]
+    for i, name in enumerate(FIELD_NAMES):
+        dtype = COLUMN_DTYPES.get(name, '<f4')
+        column = values[i]
+        if dtype != '<f4':
+            column = np.nan_to_num(column).round()
+        columns.append((name, np.ascontiguousarray(column, dtype=dtype)))
+
+    header = dict(info, version=VERSION, count=count,
+                  start=float(timestamps[0]) if count else None,
+                  end=float(timestamps[-1]) if count else None,
+                  stats=column_stats(dict(columns)) if count else {},
+                  columns={})
+    # Column offsets depend on the header length, which depends on the offsets:
+    # reserve room for them by sizing the header with placeholder offsets first
+    for name, array in columns:
+        header['columns'][name] = [0, array.dtype.str, list(array.shape)]
+    size = len(json.dumps(header)) + 16 * len(columns)
+    offset = _aligned(PREAMBLE.size + size)
+    for name, array in columns:
+        header['columns'][name][0] = offset
+        offset = _aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode('utf-8').ljust(size)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(encoded)))
+        f.write(encoded)
+        for name, array in columns:
+            f.seek(header['columns'][name][0])
+            f.write(array.tobytes())
+        f.truncate(offset)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+class Chunk:
+    """One chunk file: its header, and its columns memory-mapped on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, _, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: not a telemetry chunk")
+            if version > VERSION:
+                raise ValueError(f"{path}: unsupported chunk version {version}")
+            self.header = json.loads(f.read(length))
+        self.count = self.header['count']
+        self.start = self.header['start']
+        self.end = self.header['end']
+        self._columns = {}
+
+    def column(self, name):
+        """Memory-mapped column: 'timestamp' (n,) or a field (n, motors)."""
+        array = self._columns.get(name)
+        if array is None:
+            offset, dtype, shape = self.header['columns'][name]
+            array = np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+            self._columns[name] = array
+        return array
+
+    def close(self):
+        self._columns = {}
+
+
+class Recording:
+    """A directory of chunks in time order."""
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            raise ValueError(f"Recording not found: {path}")
+        self.path = path
+        self.chunks = []
+        for file in sorted(glob.glob(os.path.join(path, '*' + CHUNK_SUFFIX))):
+            try:
+                chunk = Chunk(file)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {file}: {e}")
+                continue
+            if chunk.count:
+                self.chunks.append(chunk)
+        if not self.chunks:
+            raise ValueError(f"No telemetry chunks in {path}")
+        self.info = self.chunks[0].header
+
+    @property
+    def start(self):
+        return self.chunks[0].start
+
+    @property
+    def end(self):
+        return self.chunks[-1].end
+
+    @property
+    def count(self):
+        return sum(chunk.count for chunk in self.chunks)
+
+    def blocks(self, since=float('-inf'), until=float('inf'), rows=1024):
+        """
+        Yield (timestamps (n,), values (NUM_FIELDS, n, motors)) blocks in [since, until],
+        reading at most `rows` samples at a time from the memory-mapped chunks.
+        """
+        for chunk in self.chunks:
+            if chunk.end < since or chunk.start > until:
+                continue
+            timestamps = chunk.column('timestamp')
+            first = int(np.searchsorted(timestamps, since, side='left'))
+            last = int(np.searchsorted(timestamps, until, side='right'))
+            columns = [chunk.column(name) for name in FIELD_NAMES]
+            for begin in range(first, last, rows):
+                stop = min(begin + rows, last)
+                yield (np.array(timestamps[begin:stop]),
+                       np.stack([column[begin:stop] for column in columns]).astype(np.float32))
+            chunk.close()   # unmap before moving on; nothing stays resident
+
+
+class Recorder:
+    """
+    Background recorder of decoded motor frames.
+
+    append() runs on the DDS callback thread and only copies the frame into
+    the current buffer. A buffer is handed to the writer thread when it holds
+    chunk_rows samples or spans chunk_seconds; the writer writes it as one
+    chunk (a single sequential write, fsynced) and then enforces the limits:
+    the oldest chunks are deleted while the recording exceeds max_bytes or
+    holds data older than max_age seconds; whichever limit is hit first wins,
+    and the first deletion forced by max_bytes before max_age is logged. If
+    the writer falls so far behind
+    that no buffer is free, new samples are dropped and counted, never waited for.
+
+    index, a telemetry_index.TelemetryIndex of the same directory, is kept up
+    to date with every chunk written and deleted.
+    """
+
+    def __init__(self, path, layout, chunk_rows=DEFAULT_CHUNK_ROWS, chunk_seconds=10.0,
+                 max_bytes=None, max_age=None, buffers=4, fsync=True, index=None):
+        if chunk_rows <= 0 or chunk_seconds <= 0:
+            raise ValueError("chunk_rows and chunk_seconds must be positive")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.layout = layout
+        self.chunk_rows = chunk_rows
+        self.chunk_seconds = chunk_seconds
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync = fsync
+        self.index = index
+        shape = (NUM_FIELDS, chunk_rows, layout.num_motors)
+        self._free = queue.Queue()
+        for _ in range(max(2, buffers)):
+            self._free.put((np.empty(chunk_rows), np.empty(shape, dtype=np.float32)))
+        self._full = queue.Queue()
+        self._current = None
+        self._rows = 0
+        self._thread = None
+        self._closed = False
+        # Chunks on disk, oldest first: [path, size, end]
+        self._chunks = collections.deque()
+        for file in sorted(glob.glob(os.path.join(path, '*' + CHUNK_SUFFIX))):
+            try:
+                self._chunks.append([file, os.path.getsize(file), Chunk(file).end])
+            except (OSError, ValueError):
+                continue
+        self.bytes = sum(size for _, size, _ in self._chunks)
+        # Counters (read via stats())
+        self.recorded = 0    # samples copied into buffers
+        self.dropped = 0     # samples lost because every buffer was waiting to be written
+        self.written = 0     # chunks written
+        self.deleted = 0     # chunks removed by the retention limits
+        self.deleted_for_size = 0   # of which removed by max_bytes while younger than max_age
+        self.errors = 0      # chunks that failed to write
+        self.write_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def append(self, frame):
+        """Copy one MotorFrame into the current buffer (DDS callback thread)."""
+        if self._closed:
+            return
+        if self._current is None:
+            try:
+                self._current = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+            self._rows = 0
+        timestamps, values = self._current
+        row = self._rows
+        n = frame.values.shape[1]
+        timestamps[row] = frame.timestamp
+        values[:, row, :n] = frame.values
+        if n < self.layout.num_motors:
+            values[:, row, n:] = np.nan
+        self._rows = row + 1
+        self.recorded += 1
+        if self._rows == self.chunk_rows or frame.timestamp - timestamps[0] >= self.chunk_seconds:
+            self._hand_over()
+
+    def _hand_over(self):
+        self._full.put((self._current, self._rows, self._info()))
+        self._current = None
+
+    def _info(self):
+        layout = self.layout
+        return {
+            'robot': layout.robot_type, 'motor_ids': layout.motor_ids,
+            'message_motors': layout.message_length, 'temp_format': layout.temp_format,
+            'has_temp': layout.has_temp, 'has_q': layout.has_q,
+            'has_dq': layout.has_dq, 'has_tau': layout.has_tau,
+        }
+
+    def _run(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                # Never let the writer thread die: nothing else would drain _full
+                print(f"Recorder: error after writing a chunk: {e}")
+                self.errors += 1
+
+    def _write(self, buffer, rows, info):
+        timestamps, values = buffer
+        file = os.path.join(self.path, chunk_filename(timestamps[0]))
+        end = float(timestamps[rows - 1])
+        start = time.perf_counter()
+        try:
+            header = write_chunk(file, info, timestamps[:rows], values[:, :rows], fsync=self.fsync)
+            size = os.path.getsize(file)
+            self._chunks.append([file, size, end])
+            self.bytes += size
+            self.written += 1
+            if self.index is not None:
+                self.index.add(file, header)
+        except Exception as e:
+            print(f"Recorder: error writing {file}: {e}")
+            self.errors += 1
+        finally:
+            self._free.put(buffer)
+        self.write_seconds += time.perf_counter() - start
+        self._enforce_limits(end)
+
+    def _enforce_limits(self, now):
+        while len(self._chunks) > 1:
+            file, size, end = self._chunks[0]
+            too_big = self.max_bytes is not None and self.bytes > self.max_bytes
+            too_old = self.max_age is not None and end < now - self.max_age
+            if not (too_big or too_old):
+                break
+            if not too_old:
+                if not self.deleted_for_size:
+                    kept = (now - self._chunks[0][2]) / 3600
+                    print(f"Recorder: size limit of {self.max_bytes / 1e9:g} GB reached after {kept:.1f} h; "
+                          f"deleting the oldest chunks before their age limit")
+                self.deleted_for_size += 1
+            self._chunks.popleft()
+            self.bytes -= size
+            if self.index is not None:
+                self.index.remove(file)
+            try:
+                os.remove(file)
+                self.deleted += 1
+            except OSError as e:
+                print(f"Recorder: error deleting {file}: {e}")
+
+    def close(self):
+        """Write the partly filled buffer and stop the writer thread."""
+        self._closed = True
+        current, rows = self._current, self._rows
+        if current is not None and rows:
+            self._current = None
+            self._full.put((current, rows, self._info()))
+        self._full.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'chunks': len(self._chunks),
+            'bytes': self.bytes,
+            'written': self.written,
+            'deleted': self.deleted,
+            'deleted_for_size': self.deleted_for_size,
+            'errors': self.errors,
+            'pending': self._full.qsize(),
+            'write_seconds': round(self.write_seconds, 3),
+        }
+
+
+class _MotorState:
+    """Replayed unitree MotorState (only the fields the dashboard reads)."""
+
+    __slots__ = ('temperature', 'q', 'dq', 'tau_est')
+
+
+class _LowState:
+    __slots__ = ('motor_state',)
+
+    def __init__(self, motor_state):
+        self.motor_state = motor_state
+
+
+class MessageBuilder:
+    """Turns recorded samples back into LowState-like messages for low_state_callback."""
+
+    def __init__(self, info):
+        self.motor_ids = info['motor_ids']
+        self.temp_format = info.get('temp_format') if info.get('has_temp', True) else None
+        self.fields = [(attribute, row) for flag, attribute, row in MESSAGE_FIELDS if info.get(flag, True)]
+        # Same length as the recorded messages, so motor ids index motor_state directly
+        self.length = max(info.get('message_motors', 0), max(self.motor_ids) + 1)
+        self.unrecorded = sorted(set(range(self.length)) - set(self.motor_ids))
+
+    def messages(self, values):
+        """Yield one message per sample of a (NUM_FIELDS, n, motors) block."""
+        temp1 = np.nan_to_num(values[TEMP1]).round().astype(int).tolist()
+        temp2 = np.nan_to_num(values[TEMP2]).round().astype(int).tolist()
+        fields = [(attribute, np.nan_to_num(values[row]).tolist()) for attribute, row in self.fields]
+        fmt = self.temp_format
+        for i in range(values.shape[1]):
+            motor_state = [_MotorState() for _ in range(self.length)]
+            for k, motor_id in enumerate(self.motor_ids):
+                motor = motor_state[motor_id]
+                if fmt == TEMP_PAIR:
+                    motor.temperature = [temp1[i][k], temp2[i][k]]
+                elif fmt == TEMP_SINGLE:
+                    motor.temperature = [temp1[i][k]]
+                elif fmt == TEMP_SCALAR:
+                    motor.temperature = temp1[i][k]
+                for attribute, column in fields:
+                    setattr(motor, attribute, column[i][k])
+            # Slots of unrecorded motors carry zeros, like an idle motor
+            for motor_id in self.unrecorded:
+                motor = motor_state[motor_id]
+                motor.temperature = [0, 0] if fmt == TEMP_PAIR else [0] if fmt == TEMP_SINGLE else 0
+                motor.q = motor.dq = motor.tau_est = 0.0
+            yield _LowState(motor_state)
+
+
+class ReplaySource:
+    """
+    Feeds a recording to callback(msg) from a background thread.
+
+    speed: 1.0 replays in real time, 10.0 ten times faster, 0 as fast as the
+    callback allows. since/until select a window (unix times, or seconds from
+    the start of the recording when below 1e9); loop restarts at the end.
+    """
+
+    def __init__(self, path, callback, speed=1.0, since=None, until=None, loop=False):
+        if speed < 0:
+            raise ValueError(f"speed must be >= 0, got {speed}")
+        self.recording = Recording(path)
+        self.callback = callback
+        self.speed = speed
+        self.since = self._absolute(since, float('-inf'))
+        self.until = self._absolute(until, float('inf'))
+        self.loop = loop
+        self._builder = MessageBuilder(self.recording.info)
+        self._stop = threading.Event()
+        self._thread = None
+        # Counters (read via stats())
+        self.replayed = 0      # messages handed to the callback
+        self.position = None   # recorded timestamp of the last message
+        self.lag = 0.0         # seconds the replay ran behind schedule at the last message
+        self.passes = 0        # completed passes over the window
+
+    def _absolute(self, value, default):
+        if value is None:
+            return default
+        return value if value >= 1e9 else self.recording.start + value
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self, timeout=None):
+        """Block until a non-looping replay has finished."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._replay_once()
+            self.passes += 1
+            if not self.loop:
+                break
+
+    def _replay_once(self):
+        first = None
+        wall_start = time.perf_counter()
+        for timestamps, values in self.recording.blocks(self.since, self.until):
+            if first is None:
+                first = timestamps[0]
+            for timestamp, msg in zip(timestamps.tolist(), self._builder.messages(values)):
+                if self._stop.is_set():
+                    return
+                if self.speed:
+                    delay = wall_start + (timestamp - first) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self.lag = max(0.0, -delay)
+                try:
+                    self.callback(msg)
+                except Exception as e:
+                    print(f"Replay callback error: {e}")
+                self.replayed += 1
+                self.position = timestamp
+
+    def stats(self):
+        return {
+            'path': self.recording.path,
+            'speed': self.speed,
+            'replayed': self.replayed,
+            'position': self.position,
+            'start': max(self.since, self.recording.start),
+            'end': min(self.until, self.recording.end),
+            'lag': round(self.lag, 6),
+            'passes': self.passes,
+        }
+
+
+def synthesize(path, robot='g1', seconds=600.0, rate=500.0, start=None, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0):
+    """
+    Write a synthetic recording: joints swing through smooth trajectories and
+    each motor's winding heats with |tau| and cools toward ambient (first-order
+    thermal model), with the surface lagging behind. Returns the chunk count.
+    """
+    config = importlib.import_module(f'config_{robot}')
+    motor_ids = sorted(config.MOTOR_NAMES)
+    motors = len(motor_ids)
+    info = {
+        'robot': robot.upper(), 'motor_ids': motor_ids, 'message_motors': 35 if robot == 'g1' else 20,
+        'temp_format': TEMP_PAIR if robot == 'g1' else TEMP_SCALAR,
+        'has_temp': True, 'has_q': True, 'has_dq': True, 'has_tau': True,
+    }
+    rng = np.random.default_rng(seed)
+    start = time.time() - seconds if start is None else start
+    total = int(seconds * rate)
+    period = rng.uniform(2.0, 8.0, motors)
+    amplitude = rng.uniform(0.2, 0.8, motors)
+    phase = rng.uniform(0, 2 * math.pi, motors)
+    heating = rng.uniform(0.0005, 0.0015, motors)  # degC/s per N^2*m^2
+    cooling = rng.uniform(1 / 900, 1 / 300, motors)  # 1/s toward ambient
+    winding = np.full(motors, 35.0)
+    surface = np.full(motors, 33.0)
+    ambient = 30.0
+
+    os.makedirs(path, exist_ok=True)
+    chunks = 0
+    for begin in range(0, total, chunk_rows):
+        n = min(chunk_rows, total - begin)
+        t = (begin + np.arange(n)) / rate
+        angle = 2 * math.pi * t[:, None] / period + phase
+        # Load comes in bursts of a few minutes, so temperatures rise and fall
+        load = 1.0 + 2.0 * (np.sin(2 * math.pi * t[:, None] / (600 + 60 * np.arange(motors))) > 0.3)
+        values = np.empty((NUM_FIELDS, n, motors), dtype=np.float32)
+        values[Q] = amplitude * np.sin(angle)
+        values[DQ] = amplitude * 2 * math.pi / period * np.cos(angle)
+        values[TAU] = load * (5 * np.sin(angle + 0.5) + rng.normal(0, 0.3, (n, motors)))
+        # Integrate the thermal model at 1 Hz resolution; temperatures change slowly
+        step = max(1, int(rate))
+        for s in range(0, n, step):
+            torque2 = np.mean(values[TAU, s:s + step].astype(np.float64) ** 2, axis=0)
+            dt = min(step, n - s) / rate
+            winding += dt * (heating * torque2 - cooling * (winding - ambient))
+            surface += dt * (winding - surface) / 60.0
+            values[TEMP2, s:s + step] = winding
+            values[TEMP1, s:s + step] = surface
+        values[TEMP1:TEMP2 + 1] = np.round(values[TEMP1:TEMP2 + 1])
+        timestamps = start + t
+        write_chunk(os.path.join(path, chunk_filename(timestamps[0])), info, timestamps, values)
+        chunks += 1
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motor telemetry recordings')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('info', help='Summarize a recording')
+    p.add_argument('path')
+
+    p = sub.add_parser('synth', help='Write a synthetic recording for replay tests and benchmarks')
+    p.add_argument('path')
+    p.add_argument('--robot', choices=['g1', 'h1'], default='g1')
+    p.add_argument('--seconds', type=float, default=600.0, help='Recording length (default: 600)')
+    p.add_argument('--rate', type=float, default=500.0, help='Samples per second (default: 500)')
+    p.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                   help=f'Samples per chunk file (default: {DEFAULT_CHUNK_ROWS})')
+    args = parser.parse_args()
+
+    if args.command == 'synth':
+        chunks = synthesize(args.path, args.robot, args.seconds, args.rate, chunk_rows=args.chunk_rows)
+        print(f"Wrote {chunks} chunks to {args.path}")
+
+    recording = Recording(args.path)
+    size = sum(os.path.getsize(chunk.path) for chunk in recording.chunks)
+    duration = recording.end - recording.start
+    print(f"{recording.info['robot']}: {len(recording.info['motor_ids'])} motors, "
+          f"{recording.count} samples in {len(recording.chunks)} chunks, {size / 1e6:.1f} MB")
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.start))} - "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.end))} "
+          f"({duration:.0f} s, {recording.count / max(duration, 1e-9):.0f} Hz)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Per-robot state of the dashboard.
+RobotAssets holds everything derived from a robot type's config and URDF
+(parsed model, kinematics, packed meshes); it is loaded once per type and
+shared by every robot of that type. RobotState holds what each connected
+robot owns: its decoder, latest snapshot, history, recorder, alerts,
+forecast and broadcaster, and the LowState callback that feeds them.
+"""
+
+import importlib
+import os
+import secrets
+import time
+
+import numpy as np
+
+from kinematics import ForwardKinematics
+from mesh_pack import ModelPack
+from motor_layout import TEMP1, TEMP2, MotorLayout, MotorSnapshot
+from thermal_alerts import AlertEngine
+from thermal_model import ThermalForecaster
+from urdf_model import RobotModel
+
+ROBOT_TYPES = ('g1', 'h1')
+ALERT_EVENT = 'motor_alert'
+
+_assets = {}   # robot type -> RobotAssets
+
+
+def load_robot_model(robot_type, urdf_path, motor_to_mesh):
+    """Parse the robot's URDF, or return None (with a warning) if it cannot be read."""
+    try:
+        return RobotModel(robot_type, urdf_path, motor_to_mesh)
+    except Exception as e:
+        print(f"Warning: could not load URDF {urdf_path}: {e}")
+        return None
+
+
+def low_state_type(robot_type):
+    """LowState_ IDL type of a robot: unitree_hg for G1, unitree_go for H1."""
+    if robot_type == 'G1':
+        from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowState_
+    else:
+        from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowState_
+    return LowState_
+
+
+class RobotAssets:
+    """Config, URDF model, kinematics and mesh pack of one robot type (shared, read-only)."""
+
+    def __init__(self, robot_type):
+        if robot_type.lower() not in ROBOT_TYPES:
+            raise ValueError(f"Unknown robot type: {robot_type}. Must be 'g1' or 'h1'")
+        config = importlib.import_module(f'config_{robot_type.lower()}')
+        self.robot_type = robot_type.upper()
+        self.motor_names = config.MOTOR_NAMES
+        self.motor_to_mesh = config.MOTOR_TO_MESH
+        self.default_port = config.DEFAULT_PORT
+        self.default_host = config.DEFAULT_HOST
+        self.alert_config = dict(warm=config.TEMP_WARM_THRESHOLD, hot=config.TEMP_HOT_THRESHOLD,
+                                 hysteresis=config.ALERT_HYSTERESIS, rise_rate=config.ALERT_RISE_RATE,
+                                 divergence=config.ALERT_DIVERGENCE)
+        self.overheat_threshold = config.TEMP_OVERHEAT_THRESHOLD
+        self.low_state_type = low_state_type(self.robot_type)
+        self.template = f'index_{robot_type.lower()}.html'
+
+        # Parse the URDF once for /api/model and /api/urdf
+        self.urdf_path = os.path.join(os.path.dirname(__file__), config.URDF_PATH, config.URDF_FILENAME)
+        self.model = load_robot_model(self.robot_type, self.urdf_path, self.motor_to_mesh)
+        motor_ids = sorted(self.motor_names)
+        self.kinematics = ForwardKinematics(self.model, motor_ids) if self.model else None
+
+        # Decimated single-file meshes for /api/model.glb (built by start())
+        self.model_pack = ModelPack(self.urdf_path)
+        self._started = False
+
+    def start(self):
+        """Pack the meshes in the background (cached in .asset_cache/ after the first run)."""
+        if not self._started:
+            self._started = True
+            self.model_pack.start()
+
+    def new_layout(self):
+        # Each robot decodes into its own buffers; only the static tables are alike
+        return MotorLayout(self.robot_type, self.motor_names, self.motor_to_mesh)
+
+
+def load_assets(robot_type):
+    """Shared RobotAssets of a robot type, loaded on first use."""
+    key = robot_type.lower()
+    if key not in _assets:
+        _assets[key] = RobotAssets(key)
+    return _assets[key]
+
+
+class RobotState:
+    """Everything one robot feeds: decoded snapshots and the consumers of each sample."""
+
+    def __init__(self, robot_id, assets):
+        self.robot_id = robot_id
+        self.assets = assets
+        self.layout = assets.new_layout()
+        self.tag = secrets.token_hex(4)   # ETag prefix, unique per robot and process start
+        # Latest published MotorSnapshot; replaced by a single reference assignment
+        # (atomic in CPython), so readers never take a lock the callback could wait on
+        self.latest_snapshot = None
+        self.snapshot_seq = 0
+        # Optional consumers, set up by the dashboard's main()
+        self.broadcaster = None
+        self.history = None
+        self.recorder = None
+        self.telemetry_index = None
+        self.replay = None
+        self.reader = None           # fleet.LowStateReader of a live fleet robot
+        self.alerts = AlertEngine(self.layout, **assets.alert_config)
+        self.forecaster = ThermalForecaster(self.layout.num_motors, assets.overheat_threshold)
+
+    @property
+    def robot_type(self):
+        return self.assets.robot_type
+
+    def on_low_state(self, msg):
+        """LowState callback: decode once, then hand the frame to every consumer."""
+        # G1: motors 0-28 (29 actual motors with DOF); H1: all motors we have mappings for
+        frame = self.layout.decode(msg, time.time())
+        if frame is None:
+            return
+
+        forecast = None
+        if self.forecaster is not None:
+            self.forecaster.update(frame)
+            if self.forecaster.state is not None:
+                forecast = self.forecaster.state.minutes
+
+        self.snapshot_seq += 1
+        snapshot = MotorSnapshot(self.layout, frame, self.snapshot_seq, self.tag, forecast)
+        self.latest_snapshot = snapshot  # publish: readers see the old or the new snapshot, never a mix
+
+        if self.history is not None:
+            self.history.append(frame)
+
+        if self.recorder is not None:
+            self.recorder.append(frame)
+
+        if self.alerts is not None:
+            events = self.alerts.update(frame)
+            if events and self.broadcaster is not None:
+                self.broadcaster.post(ALERT_EVENT, {'alerts': events})
+
+        # Hand the snapshot to the broadcaster; it is encoded and emitted on the next tick
+        if self.broadcaster is not None:
+            self.broadcaster.publish(snapshot)
+
+    def summary(self):
+        """Short status for the fleet overview (/api/robots)."""
+        snapshot = self.latest_snapshot
+        active = self.alerts.active() if self.alerts is not None else []
+        hottest = None
+        if snapshot is not None and self.layout.has_temp:
+            hottest = float(np.nanmax(snapshot.frame.values[TEMP1:TEMP2 + 1]))
+        return {
+            'id': self.robot_id,
+            'robot_type': self.robot_type,
+            'samples': self.snapshot_seq,
+            'timestamp': snapshot.timestamp if snapshot is not None else None,
+            'alerts': len(active),
+            'hottest': hottest,
+        }
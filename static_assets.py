@@ -0,0 +1,238 @@
+"""
+Precompressed, content-hashed static assets.
+Every file under assets/ is hashed on the first request; templates link to URLs with
+the hash in the file name (three.min.<hash>.js), which are served with an
+immutable Cache-Control so browsers never ask for them again. Compressible
+files (STL meshes, JS, CSS, fonts) get gzip and, when the brotli package is
+installed, brotli variants built once into .asset_cache/ and keyed by
+content hash. Requests are answered with the best variant the client's
+Accept-Encoding allows, straight from disk with no recompression.
+
+Build the variants ahead of time with:
+    python static_assets.py [--brotli-quality 11]
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.asset_cache')
+
+COMPRESSIBLE = {'.stl', '.js', '.css', '.urdf', '.xml', '.ttf', '.otf', '.svg', '.json', '.txt', '.obj', '.dae'}
+MIN_SAVING = 0.1     # keep a variant only if it is at least 10% smaller
+HASH_LEN = 12
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+mimetypes.add_type('model/stl', '.stl')
+mimetypes.add_type('application/xml', '.urdf')
+
+
+class _Asset:
+    """One file under the assets directory and its precompressed variants."""
+
+    __slots__ = ('path', 'file', 'digest', 'size', 'mimetype', 'url_path', 'variants')
+
+    def __init__(self, path, file, digest, size):
+        self.path = path          # relative to the assets dir, '/'-separated
+        self.file = file
+        self.digest = digest
+        self.size = size
+        self.mimetype = mimetypes.guess_type(path.lower())[0] or 'application/octet-stream'
+        base, ext = os.path.splitext(path)
+        self.url_path = f'{base}.{digest}{ext}'
+        self.variants = {}        # encoding ('br', 'gzip') -> (file, size); replaced, never mutated
+
+
+def _file_digest(file):
+    sha = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()[:HASH_LEN]
+
+
+class StaticAssets:
+    """Manifest of the assets directory with content-hashed URLs and precompressed variants."""
+
+    def __init__(self, root=ASSETS_DIR, cache_dir=CACHE_DIR, url_prefix='/assets',
+                 brotli_quality=9, gzip_level=9, scan=True):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.brotli_quality = brotli_quality
+        self.gzip_level = gzip_level
+        self._assets = {}    # path -> _Asset
+        self._by_url = {}    # hashed url path -> _Asset
+        self.scanned = False
+        if scan:
+            self.scan()
+
+    def scan(self):
+        """Hash every file under root (rebuilds the manifest)."""
+        assets = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                file = os.path.join(dirpath, name)
+                path = os.path.relpath(file, self.root).replace(os.sep, '/')
+                assets[path] = _Asset(path, file, _file_digest(file), os.path.getsize(file))
+        self._assets = assets
+        self._by_url = {asset.url_path: asset for asset in assets.values()}
+        for asset in assets.values():
+            self._attach_variants(asset)
+        self.scanned = True
+
+    def _variant_files(self, asset):
+        base = os.path.join(self.cache_dir, asset.digest)
+        files = [('gzip', base + '.gz')]
+        if brotli is not None:
+            files.insert(0, ('br', base + '.br'))
+        return files
+
+    def _attach_variants(self, asset):
+        variants = {}
+        for encoding, file in self._variant_files(asset):
+            if os.path.exists(file):
+                variants[encoding] = (file, os.path.getsize(file))
+        asset.variants = variants
+
+    def compress(self, verbose=False):
+        """Write missing gzip/brotli variants of compressible assets into the cache dir."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        built = 0
+        for asset in list(self._assets.values()):
+            if os.path.splitext(asset.path)[1].lower() not in COMPRESSIBLE:
+                continue
+            missing = [(encoding, file) for encoding, file in self._variant_files(asset)
+                       if encoding not in asset.variants and not os.path.exists(file + '.skip')]
+            if not missing:
+                continue
+            with open(asset.file, 'rb') as f:
+                data = f.read()
+            for encoding, file in missing:
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=self.brotli_quality)
+                else:
+                    compressed = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+                if len(compressed) > len(data) * (1 - MIN_SAVING):
+                    # Not worth it; remember so the next startup does not retry
+                    open(file + '.skip', 'w').close()
+                    continue
+                tmp = f'{file}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp, file)
+                built += 1
+            self._attach_variants(asset)
+            if verbose:
+                sizes = ', '.join(f'{enc} {size}' for enc, (_, size) in asset.variants.items())
+                print(f"{asset.path}: {asset.size} -> {sizes or 'not compressed'}")
+        return built
+
+    def compress_in_background(self):
+        """Build missing variants without delaying startup; identity is served meanwhile."""
+        thread = threading.Thread(target=self.compress, daemon=True)
+        thread.start()
+        return thread
+
+    def url(self, path):
+        """Content-hashed URL of an asset (plain URL if the file is unknown)."""
+        asset = self._assets.get(path)
+        return f'{self.url_prefix}/{asset.url_path if asset else path}'
+
+    def urls(self, prefix):
+        """{path: hashed URL} for every asset whose path starts with prefix (e.g. 'g1/meshes/')."""
+        return {path: self.url(path) for path in sorted(self._assets) if path.startswith(prefix)}
+
+    def serve(self, filename):
+        """Flask view: serve an asset (hashed or plain URL) with the best precompressed variant."""
+        asset = self._by_url.get(filename)
+        immutable = asset is not None
+        if asset is None:
+            asset = self._assets.get(filename)
+            if asset is None:
+                abort(404)
+
+        file, encoding = asset.file, None
+        variants = asset.variants
+        for candidate in ('br', 'gzip'):
+            if candidate in variants and request.accept_encodings[candidate]:
+                file, encoding = variants[candidate][0], candidate
+                break
+
+        etag = f'{asset.digest}-{encoding}' if encoding else asset.digest
+        response = send_file(file, mimetype=asset.mimetype, conditional=True, etag=etag)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        # Hashed URLs never change content; plain URLs must be revalidated (cheap 304)
+        response.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+        return response
+
+    def stats(self):
+        """Asset count and total bytes, raw and best-compressed."""
+        raw = sum(asset.size for asset in self._assets.values())
+        best = sum(min([asset.size] + [size for _, size in asset.variants.values()])
+                   for asset in self._assets.values())
+        return {'files': len(self._assets), 'bytes': raw, 'compressed_bytes': best,
+                'brotli': brotli is not None}
+
+
+def init_static_assets(app, root=ASSETS_DIR, url_prefix='/assets', compress=True):
+    """
+    Serve root at url_prefix with content-hashed URLs and precompressed variants,
+    and expose asset_url(path) / asset_urls(prefix) to templates. Files are
+    hashed and compression starts on the first request, so importing a module
+    that calls this reads and writes nothing.
+    """
+    assets = StaticAssets(root, url_prefix=url_prefix, scan=False)
+    app.add_url_rule(f'{assets.url_prefix}/<path:filename>', 'serve_assets', assets.serve)
+    app.add_template_global(assets.url, 'asset_url')
+    app.add_template_global(assets.urls, 'asset_urls')
+    lock = threading.Lock()
+
+    @app.before_request
+    def scan_assets():
+        if assets.scanned:
+            return
+        with lock:
+            if not assets.scanned:
+                assets.scan()
+                if compress:
+                    assets.compress_in_background()
+
+    return assets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompress dashboard assets (gzip, brotli)')
+    parser.add_argument('--assets', default=ASSETS_DIR, help='Assets directory (default: ./assets)')
+    parser.add_argument('--brotli-quality', type=int, default=11,
+                        help='Brotli quality 0-11 (default: 11, slow but smallest)')
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli is not installed, building gzip only (pip install brotli)")
+    assets = StaticAssets(args.assets, brotli_quality=args.brotli_quality)
+    built = assets.compress(verbose=True)
+    stats = assets.stats()
+    print(f"\n{built} variants built; {stats['files']} files, "
+          f"{stats['bytes'] / 1e6:.1f} MB -> {stats['compressed_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+Sparse index over recorded telemetry.
+One entry per chunk file: time range, sample count and per-motor min/max of
+each temperature column. Entries are appended to index.jsonl in the
+recording directory by the recorder as it writes chunks, and rebuilt from
+chunk headers for any chunk the file does not cover.
+
+Queries prune chunks on the index alone (time window, then temperature
+predicate) and memory-map only the columns of the chunks that remain, so
+"when did motor 3 first reach 90 degC" reads a handful of chunks out of a
+day of recording.
+"""
+
+import json
+import math
+import os
+from threading import Lock
+
+import numpy as np
+
+from motor_layout import FIELD_NAMES
+from recording import CHUNK_SUFFIX, INDEXED_FIELDS, Chunk, column_stats
+
+INDEX_FILENAME = 'index.jsonl'
+MAX_GAP = 1.0   # seconds between samples still treated as one continuous match
+
+
+class _Entries:
+    """Immutable array view of the index, swapped in whole when entries change."""
+
+    def __init__(self, entries, num_motors):
+        self.files = [entry['file'] for entry in entries]
+        self.start = np.array([entry['start'] for entry in entries], dtype=np.float64)
+        self.end = np.array([entry['end'] for entry in entries], dtype=np.float64)
+        self.count = np.array([entry['count'] for entry in entries], dtype=np.int64)
+        shape = (len(entries), num_motors)
+        self.minimum = {name: np.array([entry[f'{name}_min'] for entry in entries]).reshape(shape)
+                        for name in INDEXED_FIELDS}
+        self.maximum = {name: np.array([entry[f'{name}_max'] for entry in entries]).reshape(shape)
+                        for name in INDEXED_FIELDS}
+
+
+class TelemetryIndex:
+    """Chunk index of one recording directory (see recording.py)."""
+
+    def __init__(self, path, writable=True):
+        self.path = path
+        self.writable = writable
+        self.index_file = os.path.join(path, INDEX_FILENAME)
+        self.motor_ids = []
+        self._lock = Lock()
+        self._entries = {}   # file name -> entry, in time order
+        self._stale = 0      # index.jsonl lines for chunks deleted since the last rewrite
+        self._view = None
+        self.load()
+
+    def load(self):
+        """Read index.jsonl, drop entries of deleted chunks and index chunks it lacks."""
+        files = set()
+        if os.path.isdir(self.path):
+            files = {name for name in os.listdir(self.path) if name.endswith(CHUNK_SUFFIX)}
+        entries, lines = {}, 0
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line after a crash
+                    if entry.get('file') in files:
+                        entries[entry['file']] = entry
+
+        missing = sorted(files - set(entries))
+        added = []
+        for name in missing:
+            try:
+                chunk = Chunk(os.path.join(self.path, name))
+            except (OSError, ValueError) as e:
+                print(f"Index: skipping {name}: {e}")
+                continue
+            if chunk.count:
+                entry = self._entry(name, chunk.header, chunk)
+                entries[name] = entry
+                added.append(entry)
+            chunk.close()
+
+        with self._lock:
+            self._entries = dict(sorted(entries.items(), key=lambda item: item[1]['start']))
+            self._stale = lines - (len(entries) - len(added))
+            self._view = None
+            if self._entries:
+                self.motor_ids = next(iter(self._entries.values()))['motor_ids']
+        if self.writable:
+            if self._stale:
+                self._rewrite()
+            elif added:
+                self._append(added)
+
+    @staticmethod
+    def _entry(name, header, chunk=None):
+        stats = header.get('stats')
+        if not stats:
+            # Chunk written before headers carried statistics: compute them once
+            stats = column_stats({field: np.asarray(chunk.column(field)) for field in INDEXED_FIELDS})
+        entry = {'file': name, 'start': header['start'], 'end': header['end'],
+                 'count': header['count'], 'motor_ids': header['motor_ids']}
+        entry.update(stats)
+        return entry
+
+    def _append(self, entries):
+        with open(self.index_file, 'a') as f:
+            f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+
+    def _rewrite(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._stale = 0
+        tmp = f'{self.index_file}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+        os.replace(tmp, self.index_file)
+
+    def add(self, file, header):
+        """Index a chunk that was just written (called by the recorder)."""
+        entry = self._entry(os.path.basename(file), header)
+        with self._lock:
+            self._entries[entry['file']] = entry
+            self._view = None
+            self.motor_ids = entry['motor_ids']
+        if self.writable:
+            self._append([entry])
+
+    def remove(self, file):
+        """Forget a chunk that is being deleted; index.jsonl is compacted now and then."""
+        with self._lock:
+            if self._entries.pop(os.path.basename(file), None) is None:
+                return
+            self._view = None
+            self._stale += 1
+            compact = self._stale > max(100, len(self._entries))
+        if compact and self.writable:
+            self._rewrite()
+
+    def _snapshot(self):
+        with self._lock:
+            if self._view is None:
+                self._view = _Entries(list(self._entries.values()), len(self.motor_ids))
+            return self._view
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        view = self._snapshot()
+        return {
+            'chunks': len(view.files),
+            'samples': int(view.count.sum()),
+            'start': float(view.start[0]) if len(view.files) else None,
+            'end': float(view.end[-1]) if len(view.files) else None,
+        }
+
+    def candidates(self, since=-math.inf, until=math.inf, motors=None, field='temp2',
+                   above=None, below=None):
+        """Indices of chunks that may hold samples matching the window and predicate."""
+        view = self._snapshot()
+        if not view.files:
+            return view, np.empty(0, dtype=np.intp)
+        keep = (view.end >= since) & (view.start <= until)
+        if above is not None or below is not None:
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"Temperature predicates only apply to: {', '.join(INDEXED_FIELDS)}")
+            columns = slice(None) if motors is None else motors
+            # Per motor: one motor must be able to satisfy both bounds
+            possible = np.ones(view.maximum[field][:, columns].shape, dtype=bool)
+            if above is not None:
+                possible &= view.maximum[field][:, columns] >= above
+            if below is not None:
+                possible &= view.minimum[field][:, columns] <= below
+            keep &= possible.any(axis=1)
+        return view, np.flatnonzero(keep)
+
+    def _open(self, view, c):
+        return Chunk(os.path.join(self.path, view.files[c]))
+
+    def search(self, since=-math.inf, until=math.inf, motors=None, field='temp2',
+               above=None, below=None, limit=10):
+        """
+        Time ranges in which any of the given motors satisfies above <= field <= below.
+
+        Returns (matches, chunks considered, chunks read); each match is a dict
+        with start, end, samples, peak (most extreme value) and the motor column that reached it.
+        """
+        if above is None and below is None:
+            raise ValueError("Give a threshold: above and/or below")
+        motors = np.arange(len(self.motor_ids)) if motors is None else np.asarray(motors, dtype=np.intp)
+        view, chunks = self.candidates(since, until, motors, field, above, below)
+        matches = []
+        read = 0
+        for c in chunks:
+            chunk = self._open(view, c)
+            try:
+                timestamps = chunk.column('timestamp')
+                first = int(np.searchsorted(timestamps, since, side='left'))
+                last = int(np.searchsorted(timestamps, until, side='right'))
+                values = np.asarray(chunk.column(field)[first:last])[:, motors]
+                times = np.asarray(timestamps[first:last])
+            finally:
+                chunk.close()
+            read += 1
+            # Per element, so that one motor satisfies both bounds
+            mask = np.ones(values.shape, dtype=bool)
+            if above is not None:
+                mask &= values >= above
+            if below is not None:
+                mask &= values <= below
+            hit = mask.any(axis=1)
+            if not hit.any():
+                continue
+            # Runs of consecutive matching rows
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], hit.view(np.int8), [0]))))
+            for begin, stop in zip(edges[::2], edges[1::2]):
+                run = values[begin:stop]
+                in_range = mask[begin:stop]
+                # Peak over the matching values only
+                matching = run[in_range]
+                extreme = matching.max() if above is not None else matching.min()
+                row, column = np.argwhere(in_range & (run == extreme))[0]
+                match = {'start': float(times[begin]), 'end': float(times[stop - 1]),
+                         'samples': int(stop - begin), 'peak': float(extreme),
+                         'peak_time': float(times[begin + row]), 'column': int(motors[column])}
+                previous = matches[-1] if matches else None
+                if previous and match['start'] - previous['end'] <= MAX_GAP:
+                    # Continues a run that crossed a chunk boundary
+                    previous['end'] = match['end']
+                    previous['samples'] += match['samples']
+                    higher = match['peak'] > previous['peak']
+                    if higher if above is not None else match['peak'] < previous['peak']:
+                        previous.update(peak=match['peak'], peak_time=match['peak_time'], column=match['column'])
+                else:
+                    matches.append(match)
+            # Done once `limit` runs are closed (a run ending at the last row may continue)
+            if len(matches) > limit or (len(matches) == limit and not hit[-1]):
+                break
+        return matches[:limit], len(chunks), read
+
+    def read(self, since=-math.inf, until=math.inf, motors=None, fields=None, max_points=1000):
+        """
+        Samples in [since, until] from the chunks overlapping the window,
+        decimated to at most max_points evenly spaced rows.
+
+        Result: dict with 'timestamps' (n,), field -> (n, len(motors)) arrays,
+        'total_samples', 'stride' and 'chunks_read'.
+        """
+        fields = list(fields or INDEXED_FIELDS)
+        for name in fields:
+            if name not in FIELD_NAMES:
+                raise ValueError(f"Unknown field: {name}")
+        motors = np.arange(len(self.motor_ids)) if motors is None else np.asarray(motors, dtype=np.intp)
+        view, chunks = self.candidates(since, until)
+
+        # Exact row ranges from each chunk's timestamps, then one global stride
+        ranges = []
+        for c in chunks:
+            chunk = self._open(view, c)
+            timestamps = chunk.column('timestamp')
+            first = int(np.searchsorted(timestamps, since, side='left'))
+            last = int(np.searchsorted(timestamps, until, side='right'))
+            if last > first:
+                ranges.append((chunk, first, last))
+            else:
+                chunk.close()
+        total = sum(last - first for _, first, last in ranges)
+        stride = max(1, math.ceil(total / max(1, int(max_points))))
+
+        parts = {name: [] for name in ['timestamp'] + fields}
+        offset = 0   # position of the chunk's first row in the whole window
+        for chunk, first, last in ranges:
+            begin = first + (-offset) % stride
+            rows = slice(begin, last, stride)
+            parts['timestamp'].append(np.asarray(chunk.column('timestamp')[rows]))
+            for name in fields:
+                parts[name].append(np.asarray(chunk.column(name)[rows])[:, motors].astype(np.float32))
+            offset += last - first
+            chunk.close()
+
+        result = {
+            'timestamps': np.concatenate(parts['timestamp']) if ranges else np.empty(0),
+            'total_samples': total,
+            'stride': stride,
+            'chunks_read': len(ranges),
+        }
+        for name in fields:
+            result[name] = (np.concatenate(parts[name]) if ranges
+                            else np.empty((0, len(motors)), dtype=np.float32))
+        return result
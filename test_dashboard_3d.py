@@ -10,12 +10,13 @@ import random
 import os
 import secrets
 from threading import Thread
-from flask import Flask, render_template, jsonify, send_from_directory
+from flask import Flask, render_template, jsonify
 from flask_socketio import SocketIO
 
 from config_g1 import MOTOR_NAMES, MOTOR_TO_MESH, URDF_FILENAME, URDF_PATH, DEFAULT_PORT, DEFAULT_HOST
 
 from visual import init_visual
+from static_assets import init_static_assets
 
 app = Flask(__name__)
 # Use environment variable for secret key, fallback to random key for security
@@ -23,6 +24,7 @@ app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(16))
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 init_visual(app)
+init_static_assets(app)
 
 # Motor mappings imported from config.py
 motor_data = {'temperatures': [], 'timestamp': 0}
@@ -67,12 +69,6 @@ def get_motors():
 def get_motor_mapping():
     return jsonify({'motor_names': MOTOR_NAMES, 'motor_to_mesh': MOTOR_TO_MESH})
 
-@app.route('/assets/<path:filename>')
-def serve_assets(filename):
-    import os
-    assets_path = os.path.join(os.path.dirname(__file__), 'assets')
-    return send_from_directory(assets_path, filename)
-
 @app.route('/api/urdf')
 def get_urdf():
     """Serve the URDF file for parsing."""
@@ -84,13 +80,6 @@ def get_urdf():
         return jsonify({'error': str(e)}), 404
 
 
-@app.route('/assets/js/<path:filename>')
-def serve_js(filename):
-    """Serve JavaScript files for offline support."""
-    js_path = os.path.join(os.path.dirname(__file__), 'assets', 'js')
-    return send_from_directory(js_path, filename)
-
-
 if __name__ == "__main__":
     print("\n" + "="*60)
     print("G1 3D Temperature Dashboard - TEST MODE")
@@ -0,0 +1,129 @@
+"""Channel rates, coalescing and rooms of MotorBroadcaster."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broadcaster import MotorBroadcaster     # noqa: E402
+
+
+class FakeServer:
+    def __init__(self):
+        self.rooms = {}
+
+    def enter_room(self, sid, room, namespace='/'):
+        self.rooms.setdefault(sid, set()).add(room)
+
+    def leave_room(self, sid, room, namespace='/'):
+        self.rooms.get(sid, set()).discard(room)
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.server = FakeServer()
+        self.emitted = []   # (event, data, room)
+
+    def emit(self, event, data, to=None, namespace='/'):
+        self.emitted.append((event, data, to))
+
+
+def tick(broadcaster, now):
+    """One iteration of the emit loop at a given monotonic time."""
+    sample, sample_no, due, _, posted = broadcaster._due_channels(now)
+    broadcaster._emit_posted(posted)
+    if due:
+        broadcaster._emit(sample, sample_no, due)
+
+
+def make_broadcaster(room=None):
+    socketio = FakeSocketIO()
+    broadcaster = MotorBroadcaster(socketio, emit_hz=20, room=room)
+    broadcaster.add_channel('full', 'motor_update', lambda sample, n: {'sample': sample})
+    broadcaster.add_channel('temps@1Hz', 'motor_temps', lambda sample, n: {'sample': sample}, hz=1)
+    return socketio, broadcaster
+
+
+def test_channels_emit_at_their_own_rate():
+    socketio, broadcaster = make_broadcaster()
+    broadcaster.subscribe('a', ['full'])
+    broadcaster.subscribe('b', ['temps@1Hz'])
+    for step in range(41):   # 2 s at 20 Hz, a new sample every tick
+        broadcaster.publish(step)
+        tick(broadcaster, 100.0 + step * 0.05)
+    counts = broadcaster.stats()['channels']
+    assert counts['full']['emitted'] == 41
+    assert counts['temps@1Hz']['emitted'] == 3   # t = 0, 1 and 2 s
+    assert {room for _, _, room in socketio.emitted} == {'full', 'temps@1Hz'}
+
+
+def test_samples_between_ticks_are_coalesced():
+    socketio, broadcaster = make_broadcaster()
+    broadcaster.subscribe('a', ['full'])
+    for sample in range(5):
+        broadcaster.publish(sample)
+    tick(broadcaster, 100.0)
+    assert socketio.emitted == [('motor_update', {'sample': 4}, 'full')]
+    assert broadcaster.stats()['coalesced'] == 4
+    # No new sample: the channel is not sent again
+    tick(broadcaster, 100.1)
+    assert len(socketio.emitted) == 1
+
+
+def test_channels_without_subscribers_cost_nothing():
+    calls = []
+    socketio = FakeSocketIO()
+    broadcaster = MotorBroadcaster(socketio, emit_hz=20)
+    broadcaster.add_channel('full', 'motor_update', lambda sample, n: calls.append(n))
+    broadcaster.publish(1)
+    tick(broadcaster, 100.0)
+    assert calls == [] and socketio.emitted == []
+    broadcaster.subscribe('a', ['full'])
+    broadcaster.unsubscribe('a')
+    broadcaster.publish(2)
+    tick(broadcaster, 101.0)
+    assert calls == []
+
+
+def test_subscribe_validates_and_uses_robot_rooms():
+    socketio, broadcaster = make_broadcaster(room='left')
+    with pytest.raises(ValueError):
+        broadcaster.subscribe('a', ['nope'])
+    with pytest.raises(ValueError):
+        broadcaster.add_channel('x', 'x', lambda sample, n: None, hz=0)
+    broadcaster.subscribe('a', ['full'])
+    assert socketio.server.rooms['a'] == {'left', 'left/full'}
+    broadcaster.post('motor_alert', {'motor_id': 3})
+    broadcaster.publish(1)
+    tick(broadcaster, 100.0)
+    assert ('motor_alert', {'motor_id': 3}, 'left') in socketio.emitted
+    assert ('motor_update', {'sample': 1}, 'left/full') in socketio.emitted
+    broadcaster.unsubscribe('a')
+    assert socketio.server.rooms['a'] == set()
+
+
+def test_resubscribing_to_delta_requests_a_keyframe():
+    class Encoder:
+        def __init__(self):
+            self.keyframes = 0
+
+        def request_keyframe(self):
+            self.keyframes += 1
+
+        def __call__(self, sample, n):
+            return {'sample': sample}
+
+    socketio = FakeSocketIO()
+    broadcaster = MotorBroadcaster(socketio)
+    encoder = Encoder()
+    broadcaster.add_channel('delta', 'motor_delta', encoder)
+    broadcaster.subscribe('a', ['delta'])
+    broadcaster.publish(1)
+    tick(broadcaster, 100.0)
+    # A newcomer gets the current sample again, as a keyframe
+    broadcaster.subscribe('b', ['delta'])
+    tick(broadcaster, 101.0)
+    assert encoder.keyframes == 2
+    assert len(socketio.emitted) == 2
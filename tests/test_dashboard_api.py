@@ -0,0 +1,112 @@
+"""HTTP API of dashboard_3d.py (needs unitree_sdk2py, like the dashboard)."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('unitree_sdk2py')
+
+import dashboard_3d as dashboard   # noqa: E402
+
+
+def low_state(num_motors, temperature):
+    motors = [SimpleNamespace(temperature=[temperature, temperature + 10], q=0.0, dq=0.0, tau_est=0.0)
+              for _ in range(num_motors)]
+    return SimpleNamespace(motor_state=motors)
+
+
+@pytest.fixture
+def client():
+    saved = dashboard.robots.copy(), dashboard.default_robot, dashboard.FLEET
+    dashboard.robots.clear()
+    dashboard.default_robot = None
+    dashboard.add_robot('left', 'g1')
+    yield dashboard.app.test_client()
+    dashboard.robots.clear()
+    dashboard.robots.update(saved[0])
+    dashboard.default_robot, dashboard.FLEET = saved[1], saved[2]
+
+
+def test_motors_etag_and_not_modified(client):
+    robot = dashboard.robots['left']
+    robot.on_low_state(low_state(35, 40))
+    first = client.get('/api/motors')
+    assert first.status_code == 200
+    etag = first.headers['ETag'].strip('"')
+    assert etag == f'{robot.tag}-1' and first.headers['X-Motor-Seq'] == '1'
+    assert first.data == robot.latest_snapshot.json()
+    again = client.get('/api/motors', headers={'If-None-Match': f'"{etag}"'})
+    assert again.status_code == 304 and again.data == b''
+    robot.on_low_state(low_state(35, 41))
+    changed = client.get('/api/motors', headers={'If-None-Match': f'"{etag}"'})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'].strip('"') == f'{robot.tag}-2'
+
+
+@pytest.fixture
+def history_client(client):
+    robot = dashboard.robots['left']
+    robot.history = dashboard.MotorHistory(robot.layout.num_motors, 100)
+    return client
+
+
+def test_history_disabled(client):
+    assert client.get('/api/history').status_code == 503
+
+
+def test_history_query(history_client):
+    client = history_client
+    robot = dashboard.robots['left']
+    for temperature in (40, 41, 42):
+        robot.on_low_state(low_state(35, temperature))
+    response = client.get('/api/history?motor=0,1&fields=temp2&resolution=raw')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['source'] == 'raw' and data['total_samples'] == 3
+    assert [motor['motor_id'] for motor in data['motors']] == [0, 1]
+    assert data['motors'][0]['temp2'] == [50.0, 51.0, 52.0]
+
+
+@pytest.mark.parametrize('query', ['max_points=0', 'max_points=abc', 'since=abc', 'motor=nope',
+                                   'fields=voltage', 'resolution=5s'])
+def test_history_rejects_bad_parameters(history_client, query):
+    client = history_client
+    dashboard.robots['left'].on_low_state(low_state(35, 40))
+    response = client.get(f'/api/history?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('lod, status', [('abc', 400), ('1.5', 400), ('-1', 400), ('9', 400), ('0', 503)])
+def test_model_lod_argument(client, lod, status):
+    # The pack is never built here: valid levels answer 503, invalid ones 400
+    response = client.get(f'/api/model.glb?lod={lod}')
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+
+
+@pytest.fixture
+def fleet_client(client):
+    dashboard.FLEET = True
+    dashboard.add_robot('tall', 'h1')
+    return client
+
+
+def test_fleet_routes_each_robot_separately(fleet_client):
+    dashboard.robots['left'].on_low_state(low_state(35, 40))
+    dashboard.robots['tall'].on_low_state(low_state(20, 70))
+    left = fleet_client.get('/robot/left/api/motors').get_json()
+    tall = fleet_client.get('/robot/tall/api/motors').get_json()
+    assert len(left['temperatures']) == 29 and left['temperatures'][0]['surface'] == 40
+    assert tall['temperatures'][0]['surface'] == 70
+    # Unprefixed routes answer for the first robot
+    assert fleet_client.get('/api/motors').get_json() == left
+    assert fleet_client.get('/robot/nope/api/motors').status_code == 404
+    listing = fleet_client.get('/api/robots').get_json()
+    assert listing['fleet'] is True
+    assert [(robot['id'], robot['url'], robot['hottest']) for robot in listing['robots']] == [
+        ('left', '/robot/left/', 50.0), ('tall', '/robot/tall/', 80.0)]
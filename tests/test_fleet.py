@@ -0,0 +1,34 @@
+"""--fleet robot specs."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import parse_fleet, parse_robot_spec     # noqa: E402
+
+
+def test_parse_robot_spec():
+    spec = parse_robot_spec('left=G1,interface=eth0,domain=3,record=/data/left')
+    assert (spec.robot_id, spec.robot_type, spec.interface, spec.domain) == ('left', 'g1', 'eth0', 3)
+    assert spec.record == '/data/left' and spec.replay is None
+    replay = parse_robot_spec('tall=h1,replay=/data/tall')
+    assert replay.replay == '/data/tall' and replay.domain == 0
+
+
+@pytest.mark.parametrize('text', ['bad id=g1', 'left=go2', 'left=g1,speed=2', 'left=g1,interface',
+                                  'left=g1,domain=x'])
+def test_invalid_specs(text):
+    with pytest.raises(ValueError):
+        parse_robot_spec(text)
+
+
+def test_ids_and_live_domains_must_be_unique():
+    with pytest.raises(ValueError, match='Duplicate robot id'):
+        parse_fleet(['a=g1,domain=1', 'a=h1,domain=2'])
+    with pytest.raises(ValueError, match='distinct DDS domain'):
+        parse_fleet(['a=g1', 'b=g1'])
+    # Replayed robots do not open a DDS domain
+    assert len(parse_fleet(['a=g1', 'b=g1,replay=/data/b', 'c=h1,domain=1'])) == 3
@@ -0,0 +1,121 @@
+"""Packed GLB model: decimation, quantization and the GLB container."""
+
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mesh_pack import (CHUNK_BIN, CHUNK_JSON, GLB_MAGIC, UNSIGNED_SHORT,   # noqa: E402
+                       ModelPack, PackedModel)
+
+BUDGETS = (1000, 300, 80)
+
+
+def sphere_triangles(rings=40, segments=60, radius=0.1):
+    """Closed UV sphere as (n, 3, 3) triangles (about 2 * rings * segments)."""
+    theta = np.linspace(0, np.pi, rings + 1)
+    phi = np.linspace(0, 2 * np.pi, segments + 1)
+    grid = np.stack([np.sin(theta)[:, None] * np.cos(phi), np.sin(theta)[:, None] * np.sin(phi),
+                     np.cos(theta)[:, None] * np.ones_like(phi)], axis=-1) * radius
+    a, b = grid[:-1, :-1], grid[:-1, 1:]
+    c, d = grid[1:, :-1], grid[1:, 1:]
+    triangles = np.concatenate([np.stack([a, c, b], axis=2), np.stack([b, c, d], axis=2)])
+    return triangles.reshape(-1, 3, 3).astype(np.float32)
+
+
+def write_stl(path, triangles):
+    records = np.zeros(len(triangles), dtype=np.dtype([('normal', '<f4', 3), ('v', '<f4', (3, 3)),
+                                                       ('attr', '<u2')]))
+    records['v'] = triangles
+    with open(path, 'wb') as f:
+        f.write(b'\0' * 80 + struct.pack('<I', len(triangles)) + records.tobytes())
+
+
+@pytest.fixture
+def urdf(tmp_path):
+    os.makedirs(tmp_path / 'meshes')
+    write_stl(tmp_path / 'meshes' / 'ball.STL', sphere_triangles())
+    path = tmp_path / 'robot.urdf'
+    path.write_text('<robot name="r">'
+                    '<link name="base"><visual><geometry><mesh filename="meshes/ball.STL"/></geometry></visual></link>'
+                    '<link name="hand"><visual><geometry><mesh filename="meshes/ball.STL"/></geometry></visual></link>'
+                    '<link name="empty"/></robot>')
+    return str(path)
+
+
+def parse_glb(glb):
+    magic, version, total = struct.unpack_from('<III', glb, 0)
+    assert (magic, version, total) == (GLB_MAGIC, 2, len(glb))
+    json_length, json_type = struct.unpack_from('<II', glb, 12)
+    assert json_type == CHUNK_JSON and json_length % 4 == 0
+    gltf = json.loads(glb[20:20 + json_length])
+    bin_length, bin_type = struct.unpack_from('<II', glb, 20 + json_length)
+    assert bin_type == CHUNK_BIN and bin_length % 4 == 0
+    assert 28 + json_length + bin_length == len(glb)
+    assert gltf['buffers'] == [{'byteLength': bin_length}]
+    return gltf, glb[28 + json_length:]
+
+
+def test_lod_triangles_monotonic_and_within_budget(urdf):
+    model = PackedModel(urdf, BUDGETS)
+    assert model.source_triangles == 2 * 40 * 60
+    assert model.lod_triangles[0] > model.lod_triangles[1] > model.lod_triangles[2] > 0
+    for levels in model.meshes.values():
+        for (q, offset, scale, faces), budget in zip(levels, BUDGETS):
+            assert 0 < len(faces) <= budget
+            assert faces.max() < len(q)
+
+
+def test_glb_container_and_quantized_accessors(urdf):
+    model = PackedModel(urdf, BUDGETS)
+    gltf, binary = parse_glb(model.to_glb())
+    assert 'KHR_mesh_quantization' in gltf['extensionsRequired']
+    assert gltf['extras']['lods'] == [0, 1, 2]
+    # One mesh per (mesh file, LOD), one node per (link, LOD); only LOD 0 is in the scene
+    assert len(gltf['meshes']) == 3 and len(gltf['nodes']) == 6
+    assert len(gltf['scenes'][0]['nodes']) == 2
+    for mesh in gltf['meshes']:
+        primitive = mesh['primitives'][0]
+        positions = gltf['accessors'][primitive['attributes']['POSITION']]
+        assert positions['componentType'] == UNSIGNED_SHORT and positions['normalized']
+        assert positions['type'] == 'VEC3'
+        view = gltf['bufferViews'][positions['bufferView']]
+        assert view['byteStride'] == 8 and view['byteOffset'] % 4 == 0
+        assert view['byteOffset'] + view['byteLength'] <= len(binary)
+        assert view['byteLength'] == positions['count'] * 8
+        indices = gltf['accessors'][primitive['indices']]
+        assert indices['count'] % 3 == 0
+    node = gltf['nodes'][0]
+    # translation + scale * q / 65535 restores the original positions (radius 0.1 sphere)
+    assert np.allclose(node['translation'], -0.1, atol=1e-3)
+    assert np.allclose(node['scale'], 0.2, atol=2e-3)
+
+
+def test_single_lod_file(urdf):
+    gltf, _ = parse_glb(PackedModel(urdf, BUDGETS).to_glb([2]))
+    assert gltf['extras'] == {'format': 1, 'lods': [2], 'budgets': [80]}
+    assert {node['extras']['lod'] for node in gltf['nodes']} == {2}
+
+
+def test_model_pack_get(urdf, tmp_path):
+    pack = ModelPack(urdf, BUDGETS, cache_dir=str(tmp_path / 'cache'))
+    assert pack.get(0) is None   # not built yet
+    with pytest.raises(ValueError):
+        pack.get(7)
+    pack.build()
+    glb, etag = pack.get(1)
+    gltf, _ = parse_glb(glb)
+    assert gltf['extras']['lods'] == [1]
+    with pytest.raises(ValueError):
+        pack.get(3)
+    with pytest.raises(ValueError):
+        pack.get(-1)
+    # A second pack loads the same files from the cache
+    again = ModelPack(urdf, BUDGETS, cache_dir=str(tmp_path / 'cache'))
+    again.build()
+    assert again.get(1) == (glb, etag)
@@ -0,0 +1,79 @@
+"""Delta-encoded motor updates."""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_delta import MotorDeltaEncoder                                    # noqa: E402
+from motor_layout import NUM_FIELDS, Q, TEMP1, TEMP2, MotorFrame, MotorLayout, MotorSnapshot   # noqa: E402
+
+
+def make_layout():
+    layout = MotorLayout('G1', {0: 'hip', 1: 'knee', 2: 'ankle'}, {})
+    layout.has_temp = layout.has_q = layout.has_dq = layout.has_tau = True
+    layout.temp_format = 'pair'
+    return layout
+
+
+def snapshot(layout, values, seq):
+    return MotorSnapshot(layout, MotorFrame(1000.0 + seq, values.copy()), seq)
+
+
+def base_values():
+    values = np.zeros((NUM_FIELDS, 3))
+    values[TEMP1], values[TEMP2] = 40, 50
+    return values
+
+
+def test_keyframe_then_only_changed_motors():
+    layout = make_layout()
+    encoder = MotorDeltaEncoder(layout)
+    values = base_values()
+    first = encoder(snapshot(layout, values, 1), 1)
+    assert first['keyframe'] and len(first['temperatures']) == 3
+    # Below every deadband: nothing to send
+    values[Q, 0] += 0.001
+    values[TEMP1, 1] += 0.5
+    assert encoder(snapshot(layout, values, 2), 2) is None
+    # Knee winding temperature moves: its pair is resent, nothing else
+    values[TEMP2, 1] += 2
+    delta = encoder(snapshot(layout, values, 3), 3)
+    assert delta['keyframe'] is False and delta['seq'] == 3
+    assert delta['changes'] == [{'motor_id': 1, 'surface': 40, 'temp1': 40, 'winding': 52,
+                                 'temp2': 52, 'avg': 46.0}]
+
+
+def test_small_changes_accumulate_against_last_sent_value():
+    layout = make_layout()
+    encoder = MotorDeltaEncoder(layout)
+    values = base_values()
+    encoder(snapshot(layout, values, 1), 1)
+    for seq in range(2, 5):
+        values[Q, 2] += 0.0008   # 0.8 mrad per step, deadband 2 mrad
+        delta = encoder(snapshot(layout, values, seq), seq)
+    assert delta['changes'] == [{'motor_id': 2, 'position': values[Q, 2]}]
+
+
+def test_keyframes_on_request_and_interval():
+    layout = make_layout()
+    encoder = MotorDeltaEncoder(layout, keyframe_interval=3600)
+    values = base_values()
+    encoder(snapshot(layout, values, 1), 1)
+    assert encoder(snapshot(layout, values, 2), 2) is None
+    encoder.request_keyframe()
+    assert encoder(snapshot(layout, values, 3), 3)['keyframe']
+    periodic = MotorDeltaEncoder(layout, keyframe_interval=0)
+    periodic(snapshot(layout, values, 1), 1)
+    assert periodic(snapshot(layout, values, 2), 2)['keyframe']
+
+
+def test_custom_deadband():
+    layout = make_layout()
+    encoder = MotorDeltaEncoder(layout, deadbands={'temp2': 5.0})
+    values = base_values()
+    encoder(snapshot(layout, values, 1), 1)
+    values[TEMP2, 0] += 3
+    assert encoder(snapshot(layout, values, 2), 2) is None
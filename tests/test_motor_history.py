@@ -0,0 +1,110 @@
+"""MotorHistory ring buffer and aggregate tiers."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_history import MotorHistory                     # noqa: E402
+from motor_layout import NUM_FIELDS, TEMP1, TEMP2, MotorFrame   # noqa: E402
+
+
+def frame(timestamp, temp2=40.0, num_motors=2):
+    values = np.zeros((NUM_FIELDS, num_motors), dtype=np.float32)
+    values[TEMP1] = 30.0
+    values[TEMP2] = temp2
+    return MotorFrame(timestamp, values)
+
+
+@pytest.mark.parametrize('resolution', ['1s', '10s', '1m'])
+def test_tier_query_before_first_flush(resolution):
+    history = MotorHistory(2, 100)
+    for i in range(5):
+        history.append(frame(1000.0 + i * 0.1))
+    result = history.query(resolution=resolution, fields=['temp2'])
+    assert result['source'] == resolution
+    assert result['total_samples'] == 0
+    assert result['temp2'].shape == (0, 2)
+    assert result['temp2_max'].shape == (0, 2)
+
+
+def test_tiers_cascade_min_max_mean():
+    history = MotorHistory(2, 10000)
+    # 25 s at 10 Hz: winding temperature rises 1 degree per second
+    for i in range(250):
+        history.append(frame(1000.0 + i * 0.1, temp2=40.0 + i * 0.1))
+    one_second = history.query(resolution='1s', fields=['temp2'])
+    assert len(one_second['timestamps']) == 24   # the 25th bucket is still open
+    assert one_second['temp2_min'][0, 0] == pytest.approx(40.0)
+    assert one_second['temp2_max'][0, 0] == pytest.approx(40.9)
+    assert one_second['temp2'][0, 0] == pytest.approx(40.45, abs=1e-4)
+    ten_seconds = history.query(resolution='10s', fields=['temp2'])
+    assert list(ten_seconds['timestamps']) == [1000.0, 1010.0]
+    assert ten_seconds['temp2_max'][1, 1] == pytest.approx(59.9)
+
+
+
+def test_auto_picks_finest_source_that_fits():
+    history = MotorHistory(2, 10000)
+    for i in range(3000):
+        history.append(frame(1000.0 + i * 0.1))
+    # The open-ended window must not start at the 1 min bucket boundary before the first sample
+    assert history.query(fields=['temp2'], max_points=5000)['source'] == 'raw'
+    assert history.query(fields=['temp2'], max_points=500)['source'] == '1s'
+    assert history.query(fields=['temp2'], max_points=50)['source'] == '10s'
+    # Non-tier fields can only come from the raw ring
+    assert history.query(fields=['q'], max_points=500)['source'] == 'raw'
+
+
+def test_auto_uses_tier_once_raw_ring_wrapped():
+    history = MotorHistory(2, 100)
+    for i in range(3000):
+        history.append(frame(1000.0 + i * 0.1))
+    assert history.query(fields=['temp2'], max_points=5000)['source'] == '1s'
+    assert history.query(since=1290.0, fields=['temp2'], max_points=5000)['source'] == 'raw'
+
+
+def test_ring_keeps_newest_samples_in_order():
+    history = MotorHistory(2, 100, tiers=())
+    for i in range(250):
+        history.append(frame(1000.0 + i, temp2=float(i)))
+    assert len(history) == 100
+    assert history.time_range() == (1150.0, 1249.0)
+    result = history.query(fields=['temp2'], max_points=1000)
+    assert result['source'] == 'raw' and result['total_samples'] == 100
+    assert list(result['temp2'][:, 0]) == list(range(150, 250))
+
+
+def test_window_and_motor_selection():
+    history = MotorHistory(3, 100, tiers=())
+    for i in range(50):
+        values = np.arange(NUM_FIELDS * 3, dtype=np.float32).reshape(NUM_FIELDS, 3) + i
+        history.append(MotorFrame(1000.0 + i, values))
+    result = history.query(since=1010.0, until=1019.0, motors=[2], fields=['temp1', 'q'])
+    assert list(result['timestamps']) == [1010.0 + i for i in range(10)]
+    assert result['temp1'].shape == (10, 1) and result['q'].shape == (10, 1)
+    assert result['temp1'][0, 0] == TEMP1 * 3 + 2 + 10
+    with pytest.raises(ValueError):
+        history.query(fields=['voltage'])
+
+
+def test_decimation_is_evenly_spaced_and_keeps_the_newest_sample():
+    history = MotorHistory(2, 10000, tiers=())
+    for i in range(1000):
+        history.append(frame(1000.0 + i))
+    result = history.query(fields=['temp2'], max_points=10)
+    assert len(result['timestamps']) == 10
+    assert result['total_samples'] == 1000 and result['stride'] == 100
+    assert result['timestamps'][0] == 1000.0 and result['timestamps'][-1] == 1999.0
+    assert np.all(np.diff(result['timestamps']) > 0)
+
+
+def test_shorter_frames_pad_with_nan():
+    history = MotorHistory(3, 10, tiers=())
+    history.append(frame(1000.0, num_motors=2))
+    result = history.query(fields=['temp2'])
+    assert result['temp2'][0, 1] == 40.0
+    assert np.isnan(result['temp2'][0, 2])
@@ -0,0 +1,71 @@
+"""LowState decoding and the binary motor frame."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_g1 import MOTOR_NAMES, MOTOR_TO_MESH      # noqa: E402
+from motor_layout import (BINARY_HEADER, BINARY_VERSION, FLAG_Q, FLAG_TAU,   # noqa: E402
+                          FLAG_TEMP, FLAG_TEMP_PAIR, Q, TEMP1, TEMP2, MotorLayout)
+
+
+def low_state(num_motors, temperature=lambda i: [30 + i, 40 + i]):
+    motors = [SimpleNamespace(temperature=temperature(i), q=0.1 * i, dq=0.0, tau_est=-float(i))
+              for i in range(num_motors)]
+    return SimpleNamespace(motor_state=motors)
+
+
+def g1_layout():
+    return MotorLayout('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+
+
+def test_decode_temperature_pair():
+    layout = g1_layout()
+    frame = layout.decode(low_state(35), 1000.0)
+    assert frame.values.shape == (5, layout.num_motors)
+    assert layout.temp_format == 'pair'
+    k = layout.column(3)
+    assert frame.values[TEMP1, k] == 33 and frame.values[TEMP2, k] == 43
+    assert frame.values[Q, k] == np.float64(0.1 * 3)
+
+
+def test_decode_scalar_temperature_and_short_message():
+    layout = MotorLayout('H1', {0: 'a', 1: 'b', 2: 'c'}, {})
+    frame = layout.decode(low_state(2, temperature=lambda i: 50 + i), 1000.0)
+    assert layout.temp_format == 'scalar'
+    # Only the motors the message carries; both temperatures are the scalar
+    assert frame.values.shape == (5, 2)
+    assert list(frame.values[TEMP2]) == [50, 51]
+    assert layout.decode(SimpleNamespace(motor_state=[]), 1000.0) is None
+
+
+def test_binary_frame_round_trip():
+    layout = g1_layout()
+    frame = layout.decode(low_state(35), 1234.5)
+    data = layout.to_binary(frame, seq=7)
+    n = layout.num_motors
+    assert len(data) == BINARY_HEADER.size + n * (2 * 2 + 3 * 4)
+    version, flags, count, seq, timestamp = BINARY_HEADER.unpack_from(data)
+    assert (version, count, seq, timestamp) == (BINARY_VERSION, n, 7, 1234.5)
+    assert flags & FLAG_TEMP and flags & FLAG_TEMP_PAIR and flags & FLAG_Q and flags & FLAG_TAU
+    body = data[BINARY_HEADER.size:]
+    temps = np.frombuffer(body, dtype='<i2', count=2 * n).reshape(2, n)
+    motion = np.frombuffer(body, dtype='<f4', offset=4 * n).reshape(3, n)
+    assert np.array_equal(temps, frame.values[TEMP1:TEMP2 + 1])
+    assert np.allclose(motion, frame.values[Q:], atol=1e-6)
+    assert layout.binary_schema()['header_bytes'] == BINARY_HEADER.size
+
+
+def test_payload_content_variants():
+    layout = g1_layout()
+    frame = layout.decode(low_state(35), 1000.0)
+    full = layout.to_payload(frame)
+    assert len(full['temperatures']) == len(full['positions']) == layout.num_motors
+    first = full['temperatures'][0]
+    assert (first['surface'], first['winding'], first['avg']) == (30, 40, 35.0)
+    assert layout.to_payload(frame, 'temps')['positions'] == []
+    assert layout.to_payload(frame, 'positions')['temperatures'] == []
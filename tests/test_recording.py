@@ -0,0 +1,68 @@
+"""Recorder writer thread."""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_g1 import MOTOR_NAMES, MOTOR_TO_MESH                 # noqa: E402
+from motor_layout import NUM_FIELDS, MotorFrame, MotorLayout     # noqa: E402
+from recording import Recorder                                   # noqa: E402
+
+
+class FailingIndex:
+    """Index whose first add() raises something other than OSError."""
+
+    def __init__(self):
+        self.added = 0
+
+    def add(self, file, header):
+        self.added += 1
+        if self.added == 1:
+            raise ValueError("bad header")
+
+    def remove(self, file):
+        pass
+
+
+def test_writer_survives_non_os_errors(tmp_path):
+    layout = MotorLayout('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+    index = FailingIndex()
+    recorder = Recorder(str(tmp_path), layout, chunk_rows=10, buffers=2, fsync=False, index=index)
+    recorder.start()
+    values = np.zeros((NUM_FIELDS, layout.num_motors), dtype=np.float32)
+    for i in range(50):
+        recorder.append(MotorFrame(1000.0 + i * 0.01, values))
+        if i % 10 == 9:
+            # Let the writer keep up: with 2 buffers a stalled writer drops samples
+            deadline = time.monotonic() + 5
+            while recorder.stats()['pending'] and time.monotonic() < deadline:
+                time.sleep(0.001)
+    recorder.close()
+    stats = recorder.stats()
+    assert stats['errors'] == 1
+    assert stats['dropped'] == 0
+    assert index.added == 5
+
+
+def test_size_limit_deletions_are_counted(tmp_path, capsys):
+    layout = MotorLayout('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+    recorder = Recorder(str(tmp_path), layout, chunk_rows=10, buffers=2, fsync=False,
+                        max_bytes=1, max_age=86400)
+    recorder.start()
+    values = np.zeros((NUM_FIELDS, layout.num_motors), dtype=np.float32)
+    for i in range(50):
+        recorder.append(MotorFrame(1000.0 + i * 0.01, values))
+        if i % 10 == 9:
+            deadline = time.monotonic() + 5
+            while recorder.stats()['pending'] and time.monotonic() < deadline:
+                time.sleep(0.001)
+    recorder.close()
+    stats = recorder.stats()
+    # Every chunk but the newest goes, all of them well within the age limit
+    assert stats['chunks'] == 1
+    assert stats['deleted'] == stats['deleted_for_size'] == 4
+    assert capsys.readouterr().out.count('size limit') == 1
@@ -0,0 +1,56 @@
+"""Shared, lazily encoded MotorSnapshot."""
+
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_g1 import MOTOR_NAMES, MOTOR_TO_MESH            # noqa: E402
+from motor_layout import MotorLayout, MotorSnapshot          # noqa: E402
+
+
+class CountingLayout(MotorLayout):
+    def __init__(self):
+        super().__init__('G1', MOTOR_NAMES, MOTOR_TO_MESH)
+        self.payloads = 0
+
+    def to_payload(self, frame, content='full', forecast=None):
+        self.payloads += 1
+        return super().to_payload(frame, content, forecast)
+
+
+def make_snapshot(seq=1, tag='abcd'):
+    layout = CountingLayout()
+    motors = [SimpleNamespace(temperature=[30, 40], q=0.0, dq=0.0, tau_est=0.0) for _ in range(35)]
+    frame = layout.decode(SimpleNamespace(motor_state=motors), 1000.0)
+    return layout, MotorSnapshot(layout, frame, seq, tag)
+
+
+def test_each_encoding_is_built_once_and_shared():
+    layout, snapshot = make_snapshot()
+    first = snapshot.json()
+    assert snapshot.json() is first
+    assert snapshot.payload() is snapshot.payload()
+    assert snapshot.binary() is snapshot.binary()
+    snapshot.json('temps')
+    snapshot.json('temps')
+    assert layout.payloads == 2   # 'full' and 'temps', once each
+
+
+def test_concurrent_readers_build_once():
+    layout, snapshot = make_snapshot()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snapshot.json())) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert layout.payloads == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_etag_is_tag_and_sequence():
+    assert make_snapshot(7, 'abcd')[1].etag == 'abcd-7'
+    assert make_snapshot(7, '')[1].etag == '7'
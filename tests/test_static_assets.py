@@ -0,0 +1,62 @@
+"""Content-hashed, precompressed /assets."""
+
+import gzip
+import os
+import sys
+
+from flask import Flask, render_template_string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from static_assets import IMMUTABLE, StaticAssets, init_static_assets   # noqa: E402
+
+SCRIPT = b'function f() { return 1; }\n' * 200
+
+
+def make_app(root, compress=False):
+    app = Flask(__name__)
+    assets = init_static_assets(app, root=str(root), compress=compress)
+    app.add_url_rule('/', 'index', lambda: render_template_string("{{ asset_url('js/app.js') }}"))
+    return app, assets
+
+
+def test_nothing_scanned_until_first_request(tmp_path):
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'app.js').write_bytes(SCRIPT)
+    app, assets = make_app(tmp_path)
+    assert not assets.scanned
+    url = app.test_client().get('/').get_data(as_text=True)
+    assert assets.scanned
+    assert url.startswith('/assets/js/app.') and url.endswith('.js') and url != '/assets/js/app.js'
+
+
+def test_hashed_url_is_immutable_and_plain_url_revalidated(tmp_path):
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'app.js').write_bytes(SCRIPT)
+    app, _ = make_app(tmp_path)
+    client = app.test_client()
+    url = client.get('/').get_data(as_text=True)
+    hashed = client.get(url)
+    assert hashed.headers['Cache-Control'] == IMMUTABLE and hashed.data == SCRIPT
+    plain = client.get('/assets/js/app.js')
+    assert plain.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/assets/js/app.js', headers={'If-None-Match': plain.headers['ETag'].strip('"')}
+                      ).status_code == 304
+    assert client.get('/assets/js/missing.js').status_code == 404
+
+
+def test_gzip_variant_served_when_accepted(tmp_path):
+    (tmp_path / 'app.js').write_bytes(SCRIPT)
+    (tmp_path / 'image.png').write_bytes(os.urandom(1000))
+    assets = StaticAssets(str(tmp_path), cache_dir=str(tmp_path / '.cache'))
+    assets.compress()
+    assert 'gzip' in assets._assets['app.js'].variants
+    assert assets._assets['image.png'].variants == {}   # not compressible
+    app = Flask(__name__)
+    app.add_url_rule('/assets/<path:filename>', 'serve_assets', assets.serve)
+    client = app.test_client()
+    response = client.get('/assets/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == SCRIPT
+    assert client.get('/assets/app.js').data == SCRIPT
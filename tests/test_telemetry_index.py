@@ -0,0 +1,49 @@
+"""TelemetryIndex.search over small hand-written recordings."""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_layout import NUM_FIELDS, TEMP1, TEMP2, TEMP_PAIR   # noqa: E402
+from recording import chunk_filename, write_chunk              # noqa: E402
+from telemetry_index import TelemetryIndex                     # noqa: E402
+
+INFO = {'robot': 'G1', 'motor_ids': [0, 1], 'message_motors': 35, 'temp_format': TEMP_PAIR,
+        'has_temp': True, 'has_q': True, 'has_dq': True, 'has_tau': True}
+
+
+def write_recording(path, temps, start=1000.0, rate=100.0):
+    """One chunk with constant temp1/temp2 per motor (temps: one value per motor)."""
+    n = 100
+    values = np.zeros((NUM_FIELDS, n, len(temps)), dtype=np.float32)
+    values[TEMP1] = values[TEMP2] = temps
+    timestamps = start + np.arange(n) / rate
+    write_chunk(os.path.join(path, chunk_filename(start)), INFO, timestamps, values)
+
+
+def test_both_bounds_must_hold_for_one_motor(tmp_path):
+    # Motor 0 is above the range and motor 1 below it: no motor is ever in [50, 60]
+    write_recording(str(tmp_path), [95, 20])
+    matches, _, _ = TelemetryIndex(str(tmp_path)).search(field='temp2', above=50, below=60)
+    assert matches == []
+
+
+def test_both_bounds_peak_from_matching_values(tmp_path):
+    # Motor 1 is in range; motor 0 is hotter but out of range and must not be the peak
+    write_recording(str(tmp_path), [95, 55])
+    matches, _, _ = TelemetryIndex(str(tmp_path)).search(field='temp2', above=50, below=60)
+    assert len(matches) == 1
+    assert matches[0]['samples'] == 100
+    assert matches[0]['peak'] == 55
+    assert matches[0]['column'] == 1
+
+
+def test_single_bound(tmp_path):
+    write_recording(str(tmp_path), [95, 20])
+    matches, _, _ = TelemetryIndex(str(tmp_path)).search(field='temp2', above=90)
+    assert matches[0]['peak'] == 95 and matches[0]['column'] == 0
+    matches, _, _ = TelemetryIndex(str(tmp_path)).search(field='temp2', below=30)
+    assert matches[0]['peak'] == 20 and matches[0]['column'] == 1
@@ -0,0 +1,102 @@
+"""AlertEngine thresholds, hysteresis, rate of rise and divergence."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_layout import NUM_FIELDS, TEMP1, TEMP2, TEMP_PAIR, MotorFrame, MotorLayout   # noqa: E402
+from thermal_alerts import AlertEngine                                                 # noqa: E402
+
+
+def engine(**kwargs):
+    layout = MotorLayout('G1', {0: 'hip', 1: 'knee'}, {0: 'hip_link'})
+    layout.temp_format = TEMP_PAIR
+    kwargs.setdefault('warm', 60.0)
+    kwargs.setdefault('hot', 80.0)
+    return AlertEngine(layout, **kwargs)
+
+
+def frame(timestamp, winding, surface=None):
+    """Motor 0 at the given winding temperature (surface 5 degrees cooler), motor 1 at 30."""
+    values = np.zeros((NUM_FIELDS, 2))
+    values[TEMP2] = [winding, 30.0]
+    values[TEMP1] = [winding - 5.0 if surface is None else surface, 30.0]
+    return MotorFrame(timestamp, values)
+
+
+def states(events, kind='temperature'):
+    return [(event['state'], event['active']) for event in events if event['kind'] == kind]
+
+
+def test_warm_threshold_hysteresis():
+    alerts = engine(hysteresis=3.0)
+    assert alerts.update(frame(0.0, 55.0)) == []
+    events = alerts.update(frame(1.0, 61.0))
+    assert states(events) == [('warm', True)]
+    assert events[0]['motor_id'] == 0 and events[0]['mesh_name'] == 'hip_link'
+    assert events[0]['threshold'] == 60.0
+    # Toggling around the threshold stays raised until 3 degrees below it
+    for t, temp in enumerate([59.0, 61.0, 58.0, 60.0, 57.5]):
+        assert alerts.update(frame(2.0 + t, temp)) == []
+    assert [event['state'] for event in alerts.active()] == ['warm']
+    events = alerts.update(frame(10.0, 56.9))
+    assert states(events) == [('normal', False)]
+    assert alerts.active() == []
+
+
+def test_hot_falls_back_to_warm():
+    alerts = engine(hysteresis=3.0)
+    assert states(alerts.update(frame(0.0, 85.0))) == [('hot', True)]
+    assert alerts.update(frame(1.0, 78.0)) == []
+    events = alerts.update(frame(2.0, 76.0))
+    assert states(events) == [('warm', True)]
+    assert events[0]['threshold'] == 80.0
+    assert states(alerts.update(frame(3.0, 50.0))) == [('normal', False)]
+
+
+def test_rate_of_rise_raises_and_clears():
+    alerts = engine(warm=200.0, hot=300.0, rise_rate=3.0)
+    rising = []
+    # 6 degC/min for two minutes, then flat for five
+    for t in range(120):
+        rising += states(alerts.update(frame(float(t), 30.0 + t * 0.1)), 'rise')
+    assert rising == [('rising', True)]
+    assert alerts.rates[0] == pytest.approx(6.0, rel=0.2)
+    assert alerts.rates[1] == pytest.approx(0.0, abs=1e-9)
+    for t in range(120, 420):
+        rising += states(alerts.update(frame(float(t), 42.0)), 'rise')
+    assert rising == [('rising', True), ('normal', False)]
+
+
+def test_no_rise_alert_before_one_window():
+    alerts = engine(warm=200.0, hot=300.0, rise_rate=3.0, rate_window=30.0)
+    for t in range(29):
+        assert alerts.update(frame(float(t), 30.0 + t)) == []
+
+
+def test_divergence_hysteresis():
+    alerts = engine(warm=200.0, hot=300.0, divergence=15.0, hysteresis=3.0)
+    assert alerts.update(frame(0.0, 50.0, surface=40.0)) == []
+    assert states(alerts.update(frame(0.0, 60.0, surface=40.0)), 'divergence') == [('diverging', True)]
+    assert alerts.update(frame(0.0, 53.0, surface=40.0)) == []
+    assert states(alerts.update(frame(0.0, 51.0, surface=40.0)), 'divergence') == [('normal', False)]
+
+
+def test_events_since_id_and_limit():
+    alerts = engine()
+    for t, temp in enumerate([61.0, 50.0, 61.0, 50.0, 85.0]):
+        alerts.update(frame(float(t), temp))
+    ids = [event['id'] for event in alerts.events()]
+    assert ids == [1, 2, 3, 4, 5]
+    assert [event['id'] for event in alerts.events(since_id=3)] == [4, 5]
+    assert [event['id'] for event in alerts.events(limit=2)] == [4, 5]
+    assert [(event['kind'], event['state']) for event in alerts.active()] == [('temperature', 'hot')]
+
+
+def test_thresholds_must_be_ordered():
+    with pytest.raises(ValueError):
+        engine(warm=80.0, hot=60.0)
@@ -0,0 +1,107 @@
+"""ThermalForecaster RLS fit and time-to-threshold forecast."""
+
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_layout import NUM_FIELDS, TAU, TEMP1, TEMP2, MotorFrame   # noqa: E402
+from thermal_model import (LOAD_SCALE, TEMP_REF, TEMP_SCALE,          # noqa: E402
+                           ThermalForecaster, time_to_threshold)
+
+# Simulated motor: dT/dt = H * tau^2 + C - K * T (per minute), ambient 30 degC
+H, K, AMBIENT = 0.01, 0.1, 30.0
+C = K * AMBIENT
+
+
+def simulate(forecaster, torques, start=0.0, temperature=AMBIENT, step=1.0):
+    """Feed one frame per `step` seconds, integrating the model exactly between frames."""
+    temp = np.broadcast_to(temperature, 2).astype(float)
+    t = start
+    for torque in torques:
+        torque = np.asarray(torque, dtype=float)
+        steady = (H * torque ** 2 + C) / K
+        temp = steady + (temp - steady) * math.exp(-K * step / 60.0)
+        t += step
+        values = np.zeros((NUM_FIELDS, 2))
+        values[TAU] = torque
+        values[TEMP1] = temp - 2.0
+        values[TEMP2] = temp
+        forecaster.update(MotorFrame(t, values))
+    return t, temp
+
+
+def duty_cycle(minutes):
+    """Torque alternating between 20 N m and idle every 10 minutes; motor 1 at half load."""
+    torques = []
+    for second in range(int(minutes * 60)):
+        on = (second // 600) % 2 == 0
+        torques.append((20.0 if on else 0.0, 10.0 if on else 0.0))
+    return torques
+
+
+def test_no_forecast_before_first_window():
+    forecaster = ThermalForecaster(2, threshold=60.0)
+    assert forecaster.forecast() is None
+    simulate(forecaster, [(20.0, 0.0)] * 3)
+    assert forecaster.forecast() is None
+
+
+def test_warmup_hides_minutes():
+    forecaster = ThermalForecaster(2, threshold=60.0, warmup=12)
+    simulate(forecaster, [(20.0, 0.0)] * 30)
+    forecast = forecaster.forecast()
+    assert not forecast['ready']
+    assert np.isnan(forecast['minutes']).all()
+    assert forecast['rms_torque'] == pytest.approx([20.0, 0.0])
+
+
+def test_rls_converges_on_first_order_response():
+    forecaster = ThermalForecaster(2, threshold=60.0)
+    simulate(forecaster, duty_cycle(80))
+    theta = forecaster.state.theta
+    h = theta[:, 0] / LOAD_SCALE
+    k = theta[:, 2] / TEMP_SCALE
+    c = theta[:, 1] + k * TEMP_REF
+    assert h == pytest.approx([H, H], rel=0.1)
+    assert k == pytest.approx([K, K], rel=0.1)
+    assert c == pytest.approx([C, C], rel=0.1)
+
+
+def test_forecast_matches_closed_form():
+    forecaster = ThermalForecaster(2, threshold=60.0)
+    t, temp = simulate(forecaster, duty_cycle(80))
+    # Steady full load from here on: motor 0 heads for 70 degC, motor 1 for 40 degC
+    t, temp = simulate(forecaster, [(20.0, 10.0)] * 300, start=t, temperature=temp)
+    forecast = forecaster.forecast()
+    assert forecast['ready']
+    assert forecast['steady_state'] == pytest.approx([70.0, 40.0], abs=2.0)
+    assert forecast['time_constant'] == pytest.approx([10.0, 10.0], rel=0.1)
+    expected = math.log((70.0 - temp[0]) / (70.0 - 60.0)) / K
+    assert forecast['minutes'][0] == pytest.approx(expected, abs=1.0)
+    assert forecast['minutes'][1] == math.inf
+    # Same fit, another threshold
+    assert forecaster.forecast(threshold=temp[0] - 1)['minutes'][0] == 0.0
+
+
+def test_time_to_threshold_closed_form():
+    # theta for k = 0.1/min and a steady state of 70 degC at load 400
+    theta = np.array([[H * LOAD_SCALE, C - K * TEMP_REF, K * TEMP_SCALE]] * 3)
+    temperature = np.array([40.0, 65.0, 40.0])
+    load = np.array([400.0, 400.0, 0.0])
+    minutes, rate, steady, tau = time_to_threshold(theta, load, temperature, 60.0)
+    assert steady == pytest.approx([70.0, 70.0, 30.0])
+    assert tau == pytest.approx([10.0, 10.0, 10.0])
+    assert rate == pytest.approx([3.0, 0.5, -1.0])
+    assert minutes[0] == pytest.approx(10.0 * math.log(3.0))
+    assert minutes[1] == 0.0
+    assert minutes[2] == math.inf
+
+
+def test_interval_must_be_positive():
+    with pytest.raises(ValueError):
+        ThermalForecaster(2, threshold=60.0, interval=0)
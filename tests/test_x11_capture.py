@@ -0,0 +1,29 @@
+"""XShm capture checks that need no X display."""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from x11_capture import is_blank, overlaps     # noqa: E402
+
+
+def test_overlaps():
+    frame = (0, 0, 960, 1080)
+    assert overlaps(frame, (900, 100, 400, 300))
+    assert overlaps(frame, (-10, -10, 2000, 2000))
+    assert not overlaps(frame, (960, 0, 960, 1080))   # right half, touching only
+    assert not overlaps(frame, (0, 1080, 100, 100))
+
+
+def test_dark_grabs_are_blank():
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    assert is_blank(image)
+    image[:] = 10
+    assert is_blank(image)
+    image[:] = (0, 0, 40)   # red only: gray 0.299 * 40 = 12
+    assert not is_blank(image)
+    image[:, :80] = 200
+    assert not is_blank(image)
@@ -0,0 +1,172 @@
+"""
+Streaming thermal alerts.
+Every decoded sample updates a few per-motor arrays in O(motors) NumPy
+operations; no history is rescanned. Three kinds of alert are tracked:
+
+- temperature: the hotter of surface/winding crosses the warm or hot
+  threshold from the robot config; it clears only once the temperature is
+  `hysteresis` degrees below the threshold, so a sensor toggling between
+  two values does not flood clients.
+- rise: the rate of rise, an EWMA of dT/dt on the smoothed temperature,
+  exceeds `rise_rate` degC/min; it clears below half that rate.
+- divergence: winding minus surface exceeds `divergence` degrees (robots
+  reporting both sensors only), a sign of heat building up in the winding
+  faster than it reaches the case.
+
+Only state changes produce events; they are kept in a bounded list that
+REST clients poll by id and are pushed to Socket.IO clients as motor_alert.
+"""
+
+import collections
+import math
+from threading import Lock
+
+import numpy as np
+
+from motor_layout import TEMP1, TEMP2, TEMP_PAIR
+
+NORMAL, WARM, HOT = 0, 1, 2
+LEVEL_NAMES = ('normal', 'warm', 'hot')
+MAX_EVENTS = 1000
+
+
+class AlertEngine:
+    """Incremental alert state for all motors of one robot."""
+
+    def __init__(self, layout, warm, hot, hysteresis=3.0, rise_rate=3.0, divergence=15.0,
+                 smoothing=5.0, rate_window=30.0):
+        if not warm < hot:
+            raise ValueError(f"warm threshold ({warm}) must be below hot threshold ({hot})")
+        self.layout = layout
+        self.warm = float(warm)
+        self.hot = float(hot)
+        self.hysteresis = float(hysteresis)
+        self.rise_rate = float(rise_rate)       # degC per minute
+        self.divergence = float(divergence)     # degC, winding - surface
+        self.smoothing = float(smoothing)       # seconds, temperature EWMA time constant
+        self.rate_window = float(rate_window)   # seconds, dT/dt EWMA time constant
+        n = layout.num_motors
+        self._level = np.zeros(n, dtype=np.int8)
+        self._rising = np.zeros(n, dtype=bool)
+        self._diverging = np.zeros(n, dtype=bool)
+        self._smoothed = np.full(n, np.nan)
+        self._rate = np.zeros(n)                # degC per second
+        self._last_time = None
+        self._elapsed = 0.0
+        self._lock = Lock()
+        self._events = collections.deque(maxlen=MAX_EVENTS)
+        self._active = {}                       # (motor_id, kind) -> latest event
+        self._next_id = 1
+        self.samples = 0
+
+    @property
+    def rates(self):
+        """Current smoothed rate of rise per motor column, degC per minute."""
+        return self._rate * 60.0
+
+    def update(self, frame):
+        """Evaluate one MotorFrame; returns the list of new events (usually empty)."""
+        values = frame.values
+        n = values.shape[1]
+        surface, winding = values[TEMP1], values[TEMP2]
+        temp = np.fmax(surface, winding)
+        events = []
+
+        # Threshold levels: rise immediately, fall only below threshold - hysteresis
+        level = self._level[:n]
+        raised = np.where(temp >= self.hot, HOT, np.where(temp >= self.warm, WARM, NORMAL))
+        held = np.where(temp >= self.hot - self.hysteresis, HOT,
+                        np.where(temp >= self.warm - self.hysteresis, WARM, NORMAL))
+        new_level = np.maximum(raised, np.minimum(level, held)).astype(np.int8)
+        for k in np.flatnonzero(new_level != level):
+            events.append(self._event(frame.timestamp, k, 'temperature', LEVEL_NAMES[new_level[k]],
+                                      new_level[k] != NORMAL, temp[k],
+                                      self.hot if new_level[k] == HOT or level[k] == HOT else self.warm))
+        self._level[:n] = new_level
+
+        # Rate of rise: EWMA-smoothed temperature, then an EWMA of its derivative
+        timestamp = frame.timestamp
+        dt = timestamp - self._last_time if self._last_time is not None else 0.0
+        self._last_time = timestamp
+        smoothed = self._smoothed[:n]
+        valid = ~np.isnan(temp)
+        if dt > 0:
+            alpha = 1.0 - math.exp(-dt / self.smoothing)
+            beta = 1.0 - math.exp(-dt / self.rate_window)
+            updated = np.where(np.isnan(smoothed), temp, smoothed + alpha * (temp - smoothed))
+            derivative = np.where(np.isnan(smoothed), 0.0, (updated - smoothed) / dt)
+            self._rate[:n] = np.where(valid, self._rate[:n] + beta * (derivative - self._rate[:n]), self._rate[:n])
+            self._smoothed[:n] = np.where(valid, updated, smoothed)
+            self._elapsed += dt
+        elif self._last_time is not None:
+            self._smoothed[:n] = np.where(np.isnan(smoothed) & valid, temp, smoothed)
+
+        if self._elapsed >= self.rate_window:
+            # Not before one full window: the EWMA starts at zero and would under-read
+            per_minute = self._rate[:n] * 60.0
+            rising = self._rising[:n]
+            new_rising = np.where(rising, per_minute >= self.rise_rate / 2, per_minute >= self.rise_rate)
+            for k in np.flatnonzero(new_rising != rising):
+                events.append(self._event(timestamp, k, 'rise', 'rising' if new_rising[k] else 'normal',
+                                          bool(new_rising[k]), per_minute[k], self.rise_rate))
+            self._rising[:n] = new_rising
+
+        if self.layout.temp_format == TEMP_PAIR:
+            gap = winding - surface
+            diverging = self._diverging[:n]
+            new_diverging = np.where(diverging, gap >= self.divergence - self.hysteresis, gap >= self.divergence)
+            for k in np.flatnonzero(new_diverging != diverging):
+                events.append(self._event(timestamp, k, 'divergence', 'diverging' if new_diverging[k] else 'normal',
+                                          bool(new_diverging[k]), gap[k], self.divergence))
+            self._diverging[:n] = new_diverging
+
+        self.samples += 1
+        if events:
+            with self._lock:
+                for event in events:
+                    self._events.append(event)
+                    key = (event['motor_id'], event['kind'])
+                    if event['active']:
+                        self._active[key] = event
+                    else:
+                        self._active.pop(key, None)
+        return events
+
+    def _event(self, timestamp, k, kind, state, active, value, threshold):
+        layout = self.layout
+        event = {
+            'id': self._next_id,
+            'timestamp': timestamp,
+            'kind': kind,
+            'state': state,
+            'active': bool(active),
+            'value': round(float(value), 3),
+            'threshold': threshold,
+            'motor_id': layout.motor_ids[k],
+            'motor_name': layout.motor_names[k],
+            'mesh_name': layout.mesh_names[k],
+        }
+        self._next_id += 1
+        return event
+
+    def events(self, since_id=0, limit=100):
+        """Events with id > since_id, oldest first, at most limit (the newest ones)."""
+        with self._lock:
+            events = [event for event in self._events if event['id'] > since_id]
+        return events[-limit:] if limit else events
+
+    def active(self):
+        """Alerts currently raised, hottest first."""
+        with self._lock:
+            active = list(self._active.values())
+        order = {'temperature': 0, 'divergence': 1, 'rise': 2}
+        return sorted(active, key=lambda event: (order[event['kind']], -event['value']))
+
+    def config(self):
+        return {
+            'warm': self.warm,
+            'hot': self.hot,
+            'hysteresis': self.hysteresis,
+            'rise_rate': self.rise_rate,
+            'divergence': self.divergence if self.layout.temp_format == TEMP_PAIR else None,
+        }
@@ -0,0 +1,179 @@
+"""
+Online thermal model and time-to-overheat forecast per motor.
+Each motor is modelled as a first-order RC system heated by copper losses
+(proportional to torque squared) and cooling toward a fixed ambient:
+
+    dT/dt = h * tau^2 + c - k * T
+
+h, c and k are fitted per motor by recursive least squares with a
+forgetting factor, so the model tracks changes in cooling or load within a
+few minutes. T is the winding temperature (temp2; robots with one sensor
+report it in both columns): the surface lags it and would make the motor
+look slower to cool than it is. Samples are only summed as they arrive (constant work per
+sample); the fit runs once per window of `interval` seconds, which also
+averages out the 1 degC quantization of the temperature sensors.
+
+At the recent duty cycle (torque^2 averaged over `duty_window` seconds) the
+temperature approaches T_ss = (h * tau^2 + c) / k with time constant 1/k, so
+the time to reach a threshold has a closed form.
+"""
+
+import math
+
+import numpy as np
+
+from motor_layout import TAU, TEMP2
+
+# Regressor scaling: keeps the three parameters of similar magnitude for RLS
+LOAD_SCALE = 100.0   # N^2 m^2
+TEMP_REF = 40.0      # degC
+TEMP_SCALE = 10.0    # degC
+MAX_COVARIANCE = 1e4    # bound on trace(P), against wind-up while the load is steady
+MIN_COOLING = 1e-3      # 1/min; below this k is unidentified and the forecast is linear
+HORIZON = 480.0         # minutes; later crossings are reported as never
+
+
+class ForecastState:
+    """Fitted parameters and forecast published after each window (treat as immutable)."""
+
+    __slots__ = ('timestamp', 'updates', 'temperature', 'load', 'theta', 'threshold', 'minutes')
+
+    def __init__(self, timestamp, updates, temperature, load, theta, threshold, minutes):
+        self.timestamp = timestamp
+        self.updates = updates
+        self.temperature = temperature
+        self.load = load
+        self.theta = theta
+        self.threshold = threshold
+        self.minutes = minutes
+
+
+def time_to_threshold(theta, load, temperature, threshold):
+    """
+    Minutes until each motor reaches threshold at a constant load (mean tau^2),
+    from the fitted theta (n, 3). inf if it never does within HORIZON, 0 if it already has.
+    Returns (minutes, rate in degC/min now, steady-state temperature, time constant in minutes).
+    """
+    k = theta[:, 2] / TEMP_SCALE
+    drive = theta[:, 0] * load / LOAD_SCALE + theta[:, 1] + k * TEMP_REF
+    rate = drive - k * temperature
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stable = k > MIN_COOLING
+        steady = np.where(stable, drive / k, np.inf)
+        tau = np.where(stable, 1.0 / k, np.inf)
+        ratio = (steady - temperature) / (steady - threshold)
+        exponential = np.where(ratio > 1, np.log(ratio) / k, np.inf)
+        linear = np.where(rate > 0, (threshold - temperature) / rate, np.inf)
+        minutes = np.where(stable, np.where(steady > threshold, exponential, np.inf), linear)
+    minutes = np.where(temperature >= threshold, 0.0, minutes)
+    minutes = np.where(minutes > HORIZON, np.inf, minutes)
+    return minutes, rate, steady, tau
+
+
+class ThermalForecaster:
+    """Recursive per-motor RC fit over decoded MotorFrames."""
+
+    def __init__(self, num_motors, threshold, interval=5.0, memory=900.0, duty_window=60.0, warmup=12):
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, got {interval}")
+        self.num_motors = num_motors
+        self.threshold = float(threshold)
+        self.interval = float(interval)
+        self.forgetting = math.exp(-interval / memory)   # RLS memory of about `memory` seconds
+        self.duty_alpha = 1.0 - math.exp(-interval / duty_window)
+        self.warmup = warmup                             # windows before forecasts are reported
+        n = num_motors
+        self._theta = np.zeros((n, 3))
+        self._theta[:, 2] = TEMP_SCALE / 10.0            # prior: 10 minute time constant
+        self._covariance = np.tile(np.eye(3) * 100.0, (n, 1, 1))
+        self._load = np.full(n, np.nan)
+        self._sum_temp = np.zeros(n)
+        self._sum_load = np.zeros(n)
+        self._count = 0
+        self._window_start = None
+        self._last_time = None
+        self._previous = None   # (time, mean temperature, mean load) of the previous window
+        self.updates = 0
+        self.samples = 0
+        self.state = None       # latest ForecastState, replaced whole after each window
+
+    def update(self, frame):
+        """Add one MotorFrame; fits and republishes the forecast when a window closes."""
+        values = frame.values
+        n = values.shape[1]
+        timestamp = frame.timestamp
+        if self._window_start is None:
+            self._window_start = timestamp
+        self._sum_temp[:n] += values[TEMP2]
+        self._sum_load[:n] += values[TAU] * values[TAU]
+        self._count += 1
+        self._last_time = timestamp
+        self.samples += 1
+        elapsed = timestamp - self._window_start
+        if elapsed >= self.interval or elapsed < 0:   # < 0: the clock was set back
+            self._close_window()
+
+    def _close_window(self):
+        middle = (self._window_start + self._last_time) / 2
+        temp = self._sum_temp / self._count
+        load = np.nan_to_num(self._sum_load / self._count)
+        self._sum_temp[:] = 0.0
+        self._sum_load[:] = 0.0
+        self._count = 0
+        self._window_start = None
+
+        if self._previous is not None:
+            previous_time, previous_temp, previous_load = self._previous
+            minutes = (middle - previous_time) / 60.0
+            if minutes > 0:
+                self._fit((temp - previous_temp) / minutes, (temp + previous_temp) / 2,
+                          (load + previous_load) / 2)
+        self._previous = (middle, temp, load)
+        self._load = np.where(np.isnan(self._load), load, self._load + self.duty_alpha * (load - self._load))
+
+        if self.updates >= self.warmup:
+            minutes = time_to_threshold(self._theta, self._load, temp, self.threshold)[0]
+        else:
+            minutes = np.full(self.num_motors, np.nan)
+        self.state = ForecastState(self._last_time, self.updates, temp, self._load.copy(),
+                                   self._theta.copy(), self.threshold, minutes)
+
+    def _fit(self, rate, temp, load):
+        """One RLS step for all motors: rate (degC/min) ~ [load, 1, -temp] . theta."""
+        phi = np.stack([load / LOAD_SCALE, np.ones_like(temp), -(temp - TEMP_REF) / TEMP_SCALE], axis=1)
+        valid = np.isfinite(rate) & np.isfinite(phi).all(axis=1)
+        phi = np.where(valid[:, None], phi, 0.0)
+        p_phi = np.einsum('nij,nj->ni', self._covariance, phi)
+        gain = p_phi / (self.forgetting + np.einsum('ni,ni->n', phi, p_phi))[:, None]
+        error = np.where(valid, rate - np.einsum('ni,ni->n', phi, self._theta), 0.0)
+        self._theta += gain * error[:, None]
+        covariance = (self._covariance - gain[:, :, None] * p_phi[:, None, :]) / self.forgetting
+        trace = np.trace(covariance, axis1=1, axis2=2)
+        covariance *= np.minimum(1.0, MAX_COVARIANCE / trace)[:, None, None]
+        self._covariance = np.where(valid[:, None, None], covariance, self._covariance)
+        self.updates += 1
+
+    def forecast(self, threshold=None):
+        """
+        Per-motor forecast from the latest window for any threshold.
+        Returns None before the first window; otherwise a dict of arrays:
+        minutes, rate, steady_state, time_constant, temperature, rms_torque.
+        """
+        state = self.state
+        if state is None:
+            return None
+        threshold = state.threshold if threshold is None else float(threshold)
+        minutes, rate, steady, tau = time_to_threshold(state.theta, state.load, state.temperature, threshold)
+        if state.updates < self.warmup:
+            minutes = np.full_like(minutes, np.nan)
+        return {
+            'timestamp': state.timestamp,
+            'threshold': threshold,
+            'ready': state.updates >= self.warmup,
+            'minutes': minutes,
+            'rate': rate,
+            'steady_state': steady,
+            'time_constant': tau,
+            'temperature': state.temperature,
+            'rms_torque': np.sqrt(state.load),
+        }
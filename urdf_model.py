@@ -0,0 +1,90 @@
+"""
+Server-side URDF parsing.
+The robot's URDF is parsed once at startup into a compact kinematic tree
+(links, joints, axes, origins, mesh references and the motor -> joint map),
+kept in memory with its JSON encoding and served at /api/model, so neither
+the server nor the browsers re-read or re-parse the XML per page load.
+"""
+
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+
+ZERO = [0.0, 0.0, 0.0]
+
+
+def _vector(element, attribute, default):
+    """Parse an 'x y z' attribute, or return default when absent."""
+    if element is None or not element.get(attribute):
+        return list(default)
+    return [float(v) for v in element.get(attribute).split()]
+
+
+def parse_urdf(urdf_text):
+    """
+    Parse URDF XML into (links, joints) dicts shaped like parseURDF() in the templates:
+    links[name] = {name, visual, visualOrigin: {xyz, rpy}}, with visual None for links without a mesh;
+    joints[name] = {name, type, parent, child, xyz, rpy, axis, limit}.
+    """
+    root = ET.fromstring(urdf_text)
+    links = {}
+    for link in root.iter('link'):
+        name = link.get('name')
+        links[name] = {'name': name, 'visual': None}
+        visual = link.find('visual')
+        mesh = visual.find('geometry/mesh') if visual is not None else None
+        if mesh is not None:
+            origin = visual.find('origin')
+            links[name]['visual'] = mesh.get('filename')
+            links[name]['visualOrigin'] = {'xyz': _vector(origin, 'xyz', ZERO),
+                                           'rpy': _vector(origin, 'rpy', ZERO)}
+
+    joints = {}
+    for joint in root.iter('joint'):
+        name = joint.get('name')
+        origin = joint.find('origin')
+        limit = joint.find('limit')
+        joints[name] = {
+            'name': name,
+            'type': joint.get('type'),
+            'parent': joint.find('parent').get('link'),
+            'child': joint.find('child').get('link'),
+            'xyz': _vector(origin, 'xyz', ZERO),
+            'rpy': _vector(origin, 'rpy', ZERO),
+            'axis': _vector(joint.find('axis'), 'xyz', [0.0, 0.0, 1.0]),
+            'limit': ({'lower': float(limit.get('lower', 0)), 'upper': float(limit.get('upper', 0))}
+                      if limit is not None and joint.get('type') in ('revolute', 'prismatic') else None),
+        }
+    return links, joints
+
+
+class RobotModel:
+    """Parsed URDF of one robot plus its cached encodings (URDF bytes, JSON) and ETags."""
+
+    def __init__(self, robot_type, urdf_path, motor_to_mesh):
+        with open(urdf_path, 'rb') as f:
+            self.urdf = f.read()
+        self.urdf_etag = hashlib.sha256(self.urdf).hexdigest()[:16]
+        self.robot_type = robot_type
+        self.links, self.joints = parse_urdf(self.urdf)
+
+        children = {joint['child'] for joint in self.joints.values()}
+        roots = [name for name in self.links if name not in children]
+        self.root = roots[0] if roots else None
+        # Motor id -> joint that moves the motor's link
+        joint_by_child = {joint['child']: name for name, joint in self.joints.items()}
+        self.motor_joints = {motor_id: joint_by_child[link]
+                             for motor_id, link in sorted(motor_to_mesh.items())
+                             if link in joint_by_child}
+
+        self.json = json.dumps(self.to_dict(), separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha256(self.json).hexdigest()[:16]
+
+    def to_dict(self):
+        return {
+            'robot': self.robot_type,
+            'root': self.root,
+            'links': self.links,
+            'joints': self.joints,
+            'motor_joints': self.motor_joints,
+        }
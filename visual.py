@@ -3,15 +3,15 @@ import time
 import subprocess
 import threading
 import signal
-import queue
 import secrets
 import tempfile
 import re
 from flask import Blueprint, render_template, Response, request, make_response, session
 import numpy as np
 import cv2
-from collections import defaultdict
 from datetime import datetime, timedelta
+from visual_frames import FramePublisher, StreamSlots, WindowCache
+from x11_capture import XShmCapture
 
 
 print("Checking dependencies for the method of cutting off invisible parts...")
@@ -41,14 +41,30 @@ visual_bp = Blueprint('visual', __name__, url_prefix='/visual')
 
 
 app_processes = []
-client_queues_individual = defaultdict(lambda: defaultdict(lambda: queue.Queue(maxsize=10)))
-client_queues_tiled = defaultdict(lambda: queue.Queue(maxsize=10))
 client_last_activity = {}
 client_session_map = {}
 clients_lock = threading.Lock()
 CLEANUP_INTERVAL = 5
 CLIENT_TIMEOUT = 10
 max_windows = 10
+FIRST_FRAME_TIMEOUT = 5
+# Per-stream targets; each stream lowers JPEG quality, then resolution, then frame rate
+# when its viewers fall behind or it exceeds the bitrate, and raises them again with headroom
+TARGET_FPS = float(os.environ.get('VISUAL_FPS', 15))
+TARGET_KBPS = float(os.environ.get('VISUAL_KBPS', 8000))   # kbit/s per stream
+# Latest frame of each stream, shared by every client (no per-client queues)
+stream_slots = StreamSlots(max_windows, TARGET_FPS, TARGET_KBPS * 1000 / 8)
+frame_publisher = FramePublisher(stream_slots, max_windows)
+# Previous grab of each window: unchanged windows are not cropped or encoded again
+window_cache = WindowCache()
+WINDOW_LIST_INTERVAL = 2   # seconds between wmctrl/xwininfo listings of the windows
+NO_CLIENT_POLL = 0.5       # seconds between client checks while nobody is watching
+# 'xshm': in-process MIT-SHM grabs, falling back to the subprocess methods per window;
+# 'subprocess': xdotool/wmctrl/import only
+CAPTURE_BACKEND = os.environ.get('VISUAL_CAPTURE', 'xshm')
+xshm_capture = None
+xshm_error = None
+capture_fallbacks = 0
 
 print("Starting a virtual display...")
 original_display = os.environ.get('DISPLAY', ':0')
@@ -455,6 +471,47 @@ def capture_clean_window(window_id, app_name=None, display=':99', is_child=False
         traceback.print_exc()
         return None
 
+def get_xshm_capture(display=':99'):
+    """Shared XShmCapture of the display, or None if disabled or unavailable."""
+    global xshm_capture, xshm_error
+    if CAPTURE_BACKEND != 'xshm' or xshm_error is not None:
+        return None
+    if xshm_capture is None:
+        try:
+            xshm_capture = XShmCapture(display)
+            print(f"In-process XShm capture on {display}")
+        except RuntimeError as e:
+            xshm_error = str(e)
+            print(f"XShm capture unavailable ({e}), using subprocess capture")
+            return None
+    return xshm_capture
+
+
+def capture_window(window_id, app_name=None, display=':99'):
+    """
+    Captures a window in-process through XShm (no helper processes or temp files),
+    falling back to capture_clean_window when the grab fails, the window is
+    overlapped or the grab is nearly black.
+    """
+    global capture_fallbacks
+    capture = get_xshm_capture(display)
+    if capture is not None:
+        img = capture.capture(window_id)
+        if img is not None:
+            return img
+        capture_fallbacks += 1
+    return capture_clean_window(window_id, app_name=app_name, display=display)
+
+
+def capture_stats():
+    if xshm_capture is not None:
+        stats = xshm_capture.stats()
+    else:
+        stats = {'backend': 'subprocess', 'error': xshm_error}
+    stats['fallbacks'] = capture_fallbacks
+    return stats
+
+
 def get_main_window_info(display=':99'):
     """Gets info about the main app windows"""
     windows = []
@@ -614,6 +671,9 @@ def cleanup_processes():
         except Exception as e:
             print(f"  Application completion error: {e}")
     
+    if xshm_capture is not None:
+        xshm_capture.close()
+    
     try:
         if xvfb_process and xvfb_process.poll() is None:
             print("  Completion Xvfb...")
@@ -639,7 +699,7 @@ def capture_app_windows():
         
         windows = []
         
-        window_infos = get_main_window_info()
+        window_infos = cached_window_infos()
         
         for win_info in window_infos:
             window_id = win_info.get('id')
@@ -651,7 +711,15 @@ def capture_app_windows():
                 print("  Skip window without ID")
                 continue
             
-            img = capture_clean_window(window_id, app_name=app_name)
+            img = capture_window(window_id, app_name=app_name)
+            
+            cached = window_cache.lookup(window_id, img) if img is not None else None
+            if cached is not None:
+                windows.append(cached)
+                if len(windows) >= max_windows:
+                    break
+                continue
+            raw = img
             
             if img is not None and img.shape[0] > 10 and img.shape[1] > 10:
                 h, w = img.shape[:2]
@@ -680,38 +748,25 @@ def capture_app_windows():
                         if x_end > x_start and y_end > y_start:
                             img = img[y_start:y_end, x_start:x_end]
                 
-                windows.append({
+                window = {
                     'id': window_id,
                     'name': f"{app_name}: Main window",
                     'image': img,
                     'width': img.shape[1],
                     'height': img.shape[0],
                     'app': app_name
-                })
+                }
+                window_cache.store(window_id, raw, window)
+                windows.append(window)
 
                 if len(windows) >= max_windows:
                     break
 
+        window_cache.retain(win_info.get('id') for win_info in window_infos)
+
         if not windows:
             print("No application windows found, creating placeholders")
-            for i, appl in enumerate(apps[:2]):
-                app_name = appl.split()[0] if ' ' in appl else appl
-                placeholder = np.zeros((400, 600, 3), dtype=np.uint8)
-                cv2.putText(placeholder, f"App: {app_name}", (30, 100),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(placeholder, "Wait window...", (30, 140),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 255), 1)
-                cv2.putText(placeholder, "Trying redraw...", (30, 180),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 200, 200), 1)
-                
-                windows.append({
-                    'id': f'placeholder_{i}',
-                    'name': f'{app_name} (placegholder)',
-                    'image': placeholder,
-                    'width': 600,
-                    'height': 400,
-                    'app': app_name
-                })
+            return placeholder_windows()
         
         return windows
         
@@ -722,6 +777,42 @@ def capture_app_windows():
         return []
 
 
+def cached_window_infos():
+    """get_main_window_info(), listed again at most every WINDOW_LIST_INTERVAL seconds."""
+    now = time.time()
+    cached = getattr(cached_window_infos, '_cached', None)
+    if cached is None or now - cached[0] > WINDOW_LIST_INTERVAL:
+        cached = (now, get_main_window_info())
+        cached_window_infos._cached = cached
+    return cached[1]
+
+
+def placeholder_windows():
+    """Placeholder windows, built once so that an empty display is not re-encoded every cycle."""
+    if not hasattr(placeholder_windows, '_windows'):
+        windows = []
+        for i, appl in enumerate(apps[:2]):
+            app_name = appl.split()[0] if ' ' in appl else appl
+            placeholder = np.zeros((400, 600, 3), dtype=np.uint8)
+            cv2.putText(placeholder, f"App: {app_name}", (30, 100),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            cv2.putText(placeholder, "Wait window...", (30, 140),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 255), 1)
+            cv2.putText(placeholder, "Trying redraw...", (30, 180),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 200, 200), 1)
+            
+            windows.append({
+                'id': f'placeholder_{i}',
+                'name': f'{app_name} (placegholder)',
+                'image': placeholder,
+                'width': 600,
+                'height': 400,
+                'app': app_name
+            })
+        placeholder_windows._windows = windows
+    return list(placeholder_windows._windows)
+
+
 def create_tiled_view(windows, max_width=1920, tile_width=400, tile_height=300):
     if not windows:
         empty = np.zeros((tile_height, tile_width, 3), dtype=np.uint8)
@@ -766,23 +857,6 @@ def cleanup_inactive_clients():
                 to_remove.append(client_id)
         
         for client_id in to_remove:
-            if client_id in client_queues_tiled:
-                while not client_queues_tiled[client_id].empty():
-                    try:
-                        client_queues_tiled[client_id].get_nowait()
-                    except queue.Empty:
-                        break
-                del client_queues_tiled[client_id]
-            
-            if client_id in client_queues_individual:
-                for window_idx in list(client_queues_individual[client_id].keys()):
-                    while not client_queues_individual[client_id][window_idx].empty():
-                        try:
-                            client_queues_individual[client_id][window_idx].get_nowait()
-                        except queue.Empty:
-                            break
-                del client_queues_individual[client_id]
-            
             if client_id in client_last_activity:
                 del client_last_activity[client_id]
             
@@ -804,44 +878,22 @@ def broadcast_frames():
     last_cleanup = time.time()
     
     while True:
+        delay = 0
         try:
-            windows = capture_app_windows()
-            tiled_image = create_tiled_view(windows)
-            
             with clients_lock:
                 current_time = time.time()
-                active_client_ids = list(client_last_activity.keys())
-                
-                for client_id in active_client_ids:
-                    if current_time - client_last_activity.get(client_id, 0) > CLIENT_TIMEOUT:
-                        continue
-                    
-                    try:
-                        if client_queues_tiled[client_id].full():
-                            try:
-                                client_queues_tiled[client_id].get_nowait()
-                            except queue.Empty:
-                                pass
-                        
-                        _, buffer_tiled = cv2.imencode('.jpg', tiled_image, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                        client_queues_tiled[client_id].put_nowait(buffer_tiled.tobytes())
-
-
-                        for i, window in enumerate(windows):
-                            if i >= max_windows:
-                                break
-                            
-                            if client_queues_individual[client_id][i].full():
-                                try:
-                                    client_queues_individual[client_id][i].get_nowait()
-                                except queue.Empty:
-                                    pass
-                            
-                            _, buffer_window = cv2.imencode('.jpg', window['image'], [cv2.IMWRITE_JPEG_QUALITY, 95])
-                            client_queues_individual[client_id][i].put_nowait(buffer_window.tobytes())
-                            
-                    except (queue.Full, Exception) as e:
-                        pass
+                active_client_ids = [client_id for client_id, last_active in client_last_activity.items()
+                                     if current_time - last_active <= CLIENT_TIMEOUT]
+
+            if active_client_ids:
+                # Encoded once per cycle into the shared slots; unchanged windows reuse their JPEG,
+                # and a cycle without changes publishes nothing and backs off the next capture
+                cycle_start = time.monotonic()
+                windows = capture_app_windows()
+                frame_publisher.submit(windows, create_tiled_view, cycle_start)
+                delay = frame_publisher.delay
+            else:
+                delay = NO_CLIENT_POLL
             
             if time.time() - last_cleanup > CLEANUP_INTERVAL:
                 removed = cleanup_inactive_clients()
@@ -852,7 +904,8 @@ def broadcast_frames():
         except Exception as e:
             print(f"Error in broadcast_frames: {e}")
         
-        # time.sleep(0.016)
+        if delay:
+            time.sleep(delay)
 
 def get_or_create_client_id():
     with clients_lock:
@@ -874,34 +927,35 @@ def get_or_create_client_id():
         client_last_activity[client_id] = time.time()
         return client_id
 
-def generate_tiled_for_client(client_id):
+def generate_frames(slot, description):
+    """MJPEG parts of one stream: waits for a newer frame than the last one sent."""
+    seq = 0
     while True:
         try:
-            frame_bytes = client_queues_tiled[client_id].get(timeout=1.0)
+            latest = slot.wait(seq, timeout=1.0)
+            if latest is None:
+                continue
+            if seq and latest[0] > seq + 1:
+                # Newer frames were published while this viewer was still sending: it is falling behind
+                slot.controller.on_dropped(latest[0] - seq - 1)
+            seq, frame_bytes = latest
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + 
                    frame_bytes + b'\r\n')
-        except queue.Empty:
-            continue
         except Exception as e:
-            print(f"Error in generate_tiled_for_client for user {client_id}: {e}")
+            print(f"Error in generate_frames for {description}: {e}")
             break
 
+def generate_tiled_for_client(client_id):
+    return generate_frames(stream_slots.tiled, f"user {client_id}")
+
 def generate_window_for_client(client_id, window_idx):
-    while True:
-        try:
-            if window_idx in client_queues_individual[client_id]:
-                frame_bytes = client_queues_individual[client_id][window_idx].get(timeout=1.0)
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + 
-                       frame_bytes + b'\r\n')
-            # else:
-                # time.sleep(0.1)
-        except queue.Empty:
-            continue
-        except Exception as e:
-            print(f"Error in generate_window_for_client for user {client_id}, window {window_idx}: {e}")
-            break
+    return generate_frames(stream_slots.window(window_idx), f"user {client_id}, window {window_idx}")
+
+def latest_frame(slot):
+    """Newest frame of a stream, waiting up to FIRST_FRAME_TIMEOUT for the first one."""
+    latest = slot.wait(0, timeout=FIRST_FRAME_TIMEOUT)   # returns at once once a frame exists
+    return latest[1] if latest is not None else None
 
 
 # ============= FLASK ROUTES =============
@@ -940,7 +994,9 @@ def index():
 def screenshot_tiled():
     client_id = get_or_create_client_id()
     try:
-        frame_bytes = client_queues_tiled[client_id].get()
+        frame_bytes = latest_frame(stream_slots.tiled)
+        if frame_bytes is None:
+            return "No data available", 404
         response = make_response(frame_bytes)
         response.headers.set('Content-Type', 'image/jpeg')
         response.headers.set('Content-Disposition', 
@@ -953,8 +1009,11 @@ def screenshot_tiled():
 def screenshot_window(window_idx):
     client_id = get_or_create_client_id()
     try:
-        if window_idx in client_queues_individual[client_id]:
-            frame_bytes = client_queues_individual[client_id][window_idx].get()
+        slot = stream_slots.window(window_idx)
+        if slot is not None:
+            frame_bytes = latest_frame(slot)
+            if frame_bytes is None:
+                return "No data available", 404
             response = make_response(frame_bytes)
             response.headers.set('Content-Type', 'image/jpeg')
             response.headers.set('Content-Disposition', 
@@ -976,6 +1035,8 @@ def video_feed_tiled():
 @visual_bp.route('/video_feed_window/<int:window_idx>')
 def video_feed_window(window_idx):
     client_id = get_or_create_client_id()
+    if stream_slots.window(window_idx) is None:
+        return "Window not found", 404
     return Response(
         generate_window_for_client(client_id, window_idx),
         mimetype='multipart/x-mixed-replace; boundary=frame'
@@ -995,6 +1056,7 @@ def client_stats():
         return {
             'active_clients': active_clients,
             'total_sessions': len(client_session_map),
+            'streams': stream_slots.stats(),
             'server_time': datetime.now().isoformat()
         }
 
@@ -1060,7 +1122,9 @@ def debug():
             'clients': clients_info,
             'total_clients': len(client_last_activity),
             'active_clients': sum(1 for c in clients_info if c['active']),
-            'cleanup_timeout': CLIENT_TIMEOUT
+            'cleanup_timeout': CLIENT_TIMEOUT,
+            'capture': capture_stats(),
+            'frames': dict(frame_publisher.stats(), cache_hits=window_cache.hits, cache_misses=window_cache.misses)
         }
 
 @visual_bp.route('/place_windows')
@@ -0,0 +1,344 @@
+"""
+Frame encoding and fan-out for the /visual window streams (visual.py).
+Each capture cycle is JPEG-encoded once, whatever the number of viewers:
+EncodedFrames holds the bytes of the tiled view and of every window, and is
+published to one FrameSlot per stream that all viewers read.
+
+Idle windows cost no encoding: WindowCache hands back the previous window
+(same image object) when a new grab is pixel-identical, FramePublisher reuses
+the JPEG of every window whose image object did not change, skips a cycle in
+which nothing changed and backs off its poll interval until something does.
+
+Each stream has a StreamController: it caps the stream's frame rate at a
+target, and trades JPEG quality, then resolution, then frame rate against a
+target bitrate and the frames its viewers skip because they cannot keep up.
+Kept apart from visual.py, which starts Xvfb and the applications on import,
+so that benchmark.py can time this path on its own.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+JPEG_QUALITY = 95
+IDLE_POLL_MIN = 0.05   # s; first delay after a cycle without changes
+IDLE_POLL_MAX = 0.5    # s; longest delay while every window stays unchanged
+TARGET_FPS = 15
+TARGET_BITRATE = 1_000_000   # bytes/s per stream
+MIN_QUALITY = 40
+QUALITY_STEP_DOWN = 10
+QUALITY_STEP_UP = 5
+SCALES = (1.0, 0.75, 0.5)    # resolution steps, tried once quality is at MIN_QUALITY
+MIN_FPS = 2
+ADJUST_INTERVAL = 1.0        # s between controller adjustments
+HEADROOM = 0.7               # step up below this fraction of the target bitrate...
+CLEAN_INTERVALS = 3          # ...after this many intervals without skipped frames,
+MAX_CLEAN_INTERVALS = 60     # doubled up to this each time a step up is undone at once
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    """JPEG bytes of a BGR image; raises ValueError if OpenCV cannot encode it."""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError(f"Could not encode a {image.shape} image as JPEG")
+    return buffer.tobytes()
+
+
+class EncodedFrames:
+    """JPEG bytes of one capture cycle, shared by every client (treat as immutable)."""
+
+    __slots__ = ('tiled', 'windows', 'sources', 'tiled_sources')
+
+    def __init__(self, tiled, windows, sources=(), tiled_sources=()):
+        self.tiled = tiled                  # bytes of the tiled view
+        self.windows = windows              # bytes of each window, by window index
+        self.sources = sources              # window image arrays the bytes were encoded from
+        self.tiled_sources = tiled_sources  # window image arrays the tiled view was built from
+
+    def same_sources(self, windows):
+        """True if windows are exactly the images these frames (tiled view included) were encoded from."""
+        return (_same_images(windows, self.sources)
+                and _same_images(windows, self.tiled_sources))
+
+
+def _same_images(windows, sources):
+    return (len(windows) == len(sources)
+            and all(window['image'] is source for window, source in zip(windows, sources)))
+
+
+class StreamController:
+    """
+    Frame rate, JPEG quality and resolution of one stream. Frames its viewers
+    skip (they were still sending an older one when newer ones were published)
+    or a bitrate above target step quality down, then resolution, then frame
+    rate; sustained headroom steps them back up in reverse order.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, target_bitrate=TARGET_BITRATE, max_quality=JPEG_QUALITY):
+        self.target_fps = float(target_fps)
+        self.target_bitrate = float(target_bitrate)
+        self.max_quality = max_quality
+        self.fps_limit = self.target_fps
+        self.quality = max_quality
+        self.scale_index = 0
+        self.fps = 0.0                # measured over the last interval
+        self.bytes_per_second = 0.0
+        self.dropped = 0              # frames skipped by viewers, in total
+        self._lock = threading.Lock()   # skipped frames are reported from viewer threads
+        self._last_frame = None
+        self._interval_start = None
+        self._bytes = 0
+        self._frames = 0
+        self._drops = 0
+        self._clean = 0
+        self._clean_needed = CLEAN_INTERVALS
+        self._since_up = None         # intervals since the last step up
+
+    @property
+    def scale(self):
+        return SCALES[self.scale_index]
+
+    def due(self, now):
+        """True if the stream may take a new frame at its current frame rate limit."""
+        # 0.8: a capture loop paced at the same rate must not miss every other frame on jitter
+        return self._last_frame is None or now - self._last_frame >= 0.8 / self.fps_limit
+
+    def encode(self, image, now):
+        """JPEG bytes of image at the current quality and scale."""
+        if self.scale < 1.0:
+            height, width = image.shape[:2]
+            size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        data = encode_jpeg(image, self.quality)
+        self._last_frame = now
+        self._bytes += len(data)
+        self._frames += 1
+        return data
+
+    def on_dropped(self, count):
+        """A viewer skipped count frames: it could not keep up."""
+        with self._lock:
+            self._drops += count
+            self.dropped += count
+
+    def update(self, now):
+        """Measure the last interval and step the settings, at most once per ADJUST_INTERVAL."""
+        if self._interval_start is None:
+            self._interval_start = now
+            return
+        elapsed = now - self._interval_start
+        if elapsed < ADJUST_INTERVAL:
+            return
+        with self._lock:
+            drops, self._drops = self._drops, 0
+        frames = self._frames
+        self.fps = frames / elapsed
+        self.bytes_per_second = self._bytes / elapsed
+        self._bytes = self._frames = 0
+        self._interval_start = now
+        if self._since_up is not None:
+            self._since_up += 1
+        if drops or self.bytes_per_second > self.target_bitrate:
+            if self._since_up is not None and self._since_up <= 2:
+                # The last step up did not hold: probe less often
+                self._clean_needed = min(MAX_CLEAN_INTERVALS, self._clean_needed * 2)
+            self._since_up = None
+            self._clean = 0
+            self._step_down()
+        elif frames and self.bytes_per_second < HEADROOM * self.target_bitrate:
+            self._clean += 1
+            if self._clean >= self._clean_needed:
+                self._clean = 0
+                self._since_up = 0
+                self._step_up()
+
+    def _step_down(self):
+        if self.quality > MIN_QUALITY:
+            self.quality = max(MIN_QUALITY, self.quality - QUALITY_STEP_DOWN)
+        elif self.scale_index < len(SCALES) - 1:
+            self.scale_index += 1
+        elif self.fps_limit > MIN_FPS:
+            self.fps_limit = max(MIN_FPS, self.fps_limit / 2)
+
+    def _step_up(self):
+        if self.fps_limit < self.target_fps:
+            self.fps_limit = min(self.target_fps, self.fps_limit * 2)
+        elif self.scale_index > 0:
+            self.scale_index -= 1
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + QUALITY_STEP_UP)
+
+    def stats(self):
+        return {
+            'fps': round(self.fps, 1),
+            'fps_limit': self.fps_limit,
+            'target_fps': self.target_fps,
+            'quality': self.quality,
+            'scale': self.scale,
+            'bytes_per_second': round(self.bytes_per_second),
+            'target_bytes_per_second': self.target_bitrate,
+            'dropped': self.dropped,
+        }
+
+
+class WindowCache:
+    """
+    Last grab of each window and the window built from it. A new grab that is
+    pixel-identical returns the cached window, image object included, so
+    nothing downstream (cropping, tiling, encoding) is redone for it.
+    """
+
+    def __init__(self):
+        self._windows = {}   # window id -> (raw grab, window dict)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, window_id, raw):
+        """Cached window if raw equals the previous grab of window_id, else None."""
+        cached = self._windows.get(window_id)
+        if cached is not None and cached[0].shape == raw.shape and np.array_equal(cached[0], raw):
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        return None
+
+    def store(self, window_id, raw, window):
+        self._windows[window_id] = (raw, window)
+
+    def retain(self, window_ids):
+        """Forget windows that are gone."""
+        for window_id in set(self._windows) - set(window_ids):
+            del self._windows[window_id]
+
+
+class FrameSlot:
+    """
+    Latest encoded frame of one stream and its sequence number.
+    publish() replaces the frame and wakes every viewer; each viewer waits for
+    a newer sequence number than the one it last sent, so a slow viewer skips
+    to the newest frame instead of working through a backlog.
+    """
+
+    def __init__(self, controller=None):
+        self._condition = threading.Condition()
+        self._latest = (0, None)   # (seq, frame bytes), replaced whole
+        self.controller = controller or StreamController()
+
+    def publish(self, frame):
+        with self._condition:
+            self._latest = (self._latest[0] + 1, frame)
+            self._condition.notify_all()
+
+    def latest(self):
+        """(seq, frame) of the newest frame; frame is None before the first one."""
+        return self._latest
+
+    def wait(self, after, timeout=None):
+        """Newest (seq, frame) with seq > after, or None if none arrives within timeout."""
+        with self._condition:
+            if self._condition.wait_for(lambda: self._latest[0] > after, timeout):
+                return self._latest
+        return None
+
+
+class StreamSlots:
+    """FrameSlot of the tiled view and of each window index, shared by all clients."""
+
+    def __init__(self, max_windows, fps=TARGET_FPS, bitrate=TARGET_BITRATE):
+        self.tiled = FrameSlot(StreamController(fps, bitrate))
+        self.windows = [FrameSlot(StreamController(fps, bitrate)) for _ in range(max_windows)]
+
+    def window(self, index):
+        """FrameSlot of a window index, or None if it is out of range."""
+        return self.windows[index] if 0 <= index < len(self.windows) else None
+
+    def publish(self, frames):
+        """
+        Publish one cycle of EncodedFrames: O(1) per stream, whatever the number
+        of viewers. Streams whose bytes were reused are left alone, so their
+        viewers are not woken to resend the same frame. Returns the number of streams published.
+        """
+        published = 0
+        for slot, data in zip([self.tiled] + self.windows, [frames.tiled] + frames.windows):
+            if slot.latest()[1] is not data:
+                slot.publish(data)
+                published += 1
+        return published
+
+    def controllers(self):
+        return [self.tiled.controller] + [slot.controller for slot in self.windows]
+
+    def stats(self):
+        """Controller state of the tiled view and of every window stream that has had a frame."""
+        return {
+            'tiled': self.tiled.controller.stats(),
+            'windows': {index: slot.controller.stats()
+                        for index, slot in enumerate(self.windows) if slot.latest()[0]},
+        }
+
+
+class FramePublisher:
+    """
+    Encodes capture cycles into StreamSlots. Each stream is encoded only when
+    its content changed and its controller is due; a cycle in which nothing
+    changed publishes nothing and backs off the next capture.
+    """
+
+    def __init__(self, slots, max_windows):
+        self.slots = slots
+        self.max_windows = max_windows
+        self.frames = None       # EncodedFrames last published
+        self.delay = 0.0         # seconds to wait before the next capture
+        self.published = 0
+        self.unchanged = 0
+
+    def submit(self, windows, make_tiled, now=None):
+        """
+        Publish one capture cycle (make_tiled(windows) builds the tiled image);
+        now is the time.monotonic() at which the cycle's capture started.
+        Returns False, and backs off delay, if no window changed since the last one.
+        """
+        now = time.monotonic() if now is None else now
+        windows = windows[:self.max_windows]
+        for controller in self.slots.controllers():
+            controller.update(now)
+        previous = self.frames
+        if previous is not None and previous.same_sources(windows):
+            self.unchanged += 1
+            self.delay = min(max(self.delay * 2, IDLE_POLL_MIN), IDLE_POLL_MAX)
+            return False
+
+        encoded, sources = [], []
+        for i, window in enumerate(windows):
+            image = window['image']
+            controller = self.slots.windows[i].controller
+            old_source = old_data = None
+            if previous is not None and i < len(previous.sources):
+                old_source, old_data = previous.sources[i], previous.windows[i]
+            if old_source is image or (old_data is not None and not controller.due(now)):
+                # Unchanged, or changed but over its frame rate: keep the old frame until due
+                encoded.append(old_data)
+                sources.append(old_source)
+            else:
+                encoded.append(controller.encode(image, now))
+                sources.append(image)
+
+        controller = self.slots.tiled.controller
+        if previous is not None and (_same_images(windows, previous.tiled_sources) or not controller.due(now)):
+            tiled, tiled_sources = previous.tiled, previous.tiled_sources
+        else:
+            tiled, tiled_sources = controller.encode(make_tiled(windows), now), [w['image'] for w in windows]
+
+        self.frames = EncodedFrames(tiled, encoded, sources, tiled_sources)
+        if self.slots.publish(self.frames):
+            self.published += 1
+        # Pace the loop at the fastest stream in use; streams with a lower limit skip cycles
+        in_use = [self.slots.tiled] + self.slots.windows[:len(windows)]
+        interval = 1.0 / max(slot.controller.fps_limit for slot in in_use)
+        self.delay = max(0.0, interval - (time.monotonic() - now))
+        return True
+
+    def stats(self):
+        return {'published': self.published, 'unchanged': self.unchanged, 'delay': self.delay}
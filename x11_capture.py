@@ -0,0 +1,315 @@
+"""
+In-process window capture on an X display with the MIT-SHM extension.
+XShmGetImage copies a window's pixels into a shared-memory segment mapped into
+this process, which is read as a NumPy array: no helper processes, temporary
+files or PNG round trip per frame. libX11 and libXext are used through ctypes,
+so no Python package is needed. XShmCapture() raises RuntimeError if the
+display or the extension is unavailable; capture() returns None for windows it
+cannot grab (unmapped, partly off screen, destroyed, not 32 bits per pixel),
+and the caller falls back to the subprocess methods in visual.py.
+
+Like `import -window ID -frame`, the window-manager frame (the ancestor that is
+a child of the root window) is grabbed, title bar and borders included. Xvfb
+has no compositing, so a grab returns whatever is on screen over the window:
+windows overlapped by a window higher in the stacking order, and nearly black
+grabs, also return None. The fallback raises the window before grabbing it;
+XShm never changes the stacking order or the focus.
+"""
+
+import ctypes
+import ctypes.util
+import threading
+
+import numpy as np
+
+Z_PIXMAP = 2
+LSB_FIRST = 0
+IS_VIEWABLE = 2
+ALL_PLANES = 0xFFFFFFFF
+MIN_BRIGHTNESS = 10   # mean gray level below which a grab is taken as blank, as in visual.py
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+MAX_SEGMENTS = 16   # cached shared-memory images, one per window size
+
+
+class XImage(ctypes.Structure):
+    # Leading fields only; the structure is always handled through Xlib's pointer
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int), ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int),
+                ('bitmap_pad', ctypes.c_int), ('depth', ctypes.c_int),
+                ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int)]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int)]
+
+
+class XWindowAttributes(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_int), ('y', ctypes.c_int), ('width', ctypes.c_int), ('height', ctypes.c_int),
+                ('border_width', ctypes.c_int), ('depth', ctypes.c_int), ('visual', ctypes.c_void_p),
+                ('root', ctypes.c_ulong), ('class_', ctypes.c_int), ('bit_gravity', ctypes.c_int),
+                ('win_gravity', ctypes.c_int), ('backing_store', ctypes.c_int),
+                ('backing_planes', ctypes.c_ulong), ('backing_pixel', ctypes.c_ulong),
+                ('save_under', ctypes.c_int), ('colormap', ctypes.c_ulong), ('map_installed', ctypes.c_int),
+                ('map_state', ctypes.c_int), ('all_event_masks', ctypes.c_long),
+                ('your_event_mask', ctypes.c_long), ('do_not_propagate_mask', ctypes.c_long),
+                ('override_redirect', ctypes.c_int), ('screen', ctypes.c_void_p)]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_int), ('display', ctypes.c_void_p), ('resourceid', ctypes.c_ulong),
+                ('serial', ctypes.c_ulong), ('error_code', ctypes.c_ubyte),
+                ('request_code', ctypes.c_ubyte), ('minor_code', ctypes.c_ubyte)]
+
+
+ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+
+_libraries = None
+_last_error = [0]   # error code of the latest X error, set by _on_error
+
+
+@ERROR_HANDLER
+def _on_error(display, event):
+    # Xlib's default handler exits the process; a vanished window must only fail its grab
+    _last_error[0] = event.contents.error_code
+    return 0
+
+
+def overlaps(a, b):
+    """Whether two (x, y, width, height) rectangles intersect."""
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def is_blank(image):
+    """Whether a BGR image is nearly black (mean gray level <= MIN_BRIGHTNESS)."""
+    # Every 4th pixel each way is enough for a mean and 16x cheaper than the full frame
+    sample = image[::4, ::4].reshape(-1, 3).mean(axis=0)
+    return sample @ (0.114, 0.587, 0.299) <= MIN_BRIGHTNESS
+
+
+def _load(name):
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise RuntimeError(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+
+def _load_libraries():
+    """libX11, libXext and libc with their prototypes, loaded once."""
+    global _libraries
+    if _libraries is None:
+        x11, xext, libc = _load('X11'), _load('Xext'), ctypes.CDLL(None, use_errno=True)
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XGetWindowAttributes.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XWindowAttributes)]
+        x11.XQueryTree.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                                   ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.POINTER(ctypes.c_ulong)),
+                                   ctypes.POINTER(ctypes.c_uint)]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XSetErrorHandler.argtypes = [ERROR_HANDLER]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_char_p, ctypes.POINTER(XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        x11.XSetErrorHandler(_on_error)
+        _libraries = (x11, xext, libc)
+    return _libraries
+
+
+class _Segment:
+    """Shared-memory XImage of one window size, attached to the X server."""
+
+    def __init__(self, display, attributes):
+        x11, xext, libc = _load_libraries()
+        self.display = display
+        self.info = XShmSegmentInfo()
+        self.image = None
+        self.address = None
+        self.attached = False
+        width, height = attributes.width, attributes.height
+        try:
+            self.image = xext.XShmCreateImage(display, attributes.visual, attributes.depth, Z_PIXMAP,
+                                              None, ctypes.byref(self.info), width, height)
+            if not self.image:
+                raise RuntimeError("XShmCreateImage failed")
+            image = self.image.contents
+            if image.bits_per_pixel != 32 or image.byte_order != LSB_FIRST:
+                raise RuntimeError(f"unsupported pixel format ({image.bits_per_pixel} bpp)")
+            size = image.bytes_per_line * height
+            self.info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+            if self.info.shmid < 0:
+                raise OSError(ctypes.get_errno(), "shmget failed")
+            address = libc.shmat(self.info.shmid, None, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                libc.shmctl(self.info.shmid, IPC_RMID, None)
+                raise OSError(ctypes.get_errno(), "shmat failed")
+            self.address = address
+            self.info.shmaddr = image.data = address
+            self.info.readOnly = 0
+            _last_error[0] = 0
+            attached = xext.XShmAttach(display, ctypes.byref(self.info))
+            x11.XSync(display, 0)
+            # Marked for removal now; the kernel frees it once both sides have detached
+            libc.shmctl(self.info.shmid, IPC_RMID, None)
+            if not attached or _last_error[0]:
+                raise RuntimeError(f"XShmAttach failed (X error {_last_error[0]})")
+            self.attached = True
+            buffer = (ctypes.c_uint8 * size).from_address(address)
+            # BGRX pixels, rows padded to bytes_per_line
+            self.pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(height, image.bytes_per_line // 4, 4)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        x11, xext, libc = _load_libraries()
+        if self.attached:
+            xext.XShmDetach(self.display, ctypes.byref(self.info))
+            x11.XSync(self.display, 0)
+            self.attached = False
+        if self.image:
+            self.image.contents.data = None   # the segment is not Xlib's to free
+            x11.XDestroyImage(self.image)
+            self.image = None
+        if self.address is not None:
+            libc.shmdt(self.address)
+            self.address = None
+
+
+class XShmCapture:
+    """Grabs windows of one X display into NumPy arrays through MIT-SHM (thread-safe)."""
+
+    def __init__(self, display=':99'):
+        x11, xext, _ = _load_libraries()
+        self.display_name = display
+        self._display = x11.XOpenDisplay(display.encode())
+        if not self._display:
+            raise RuntimeError(f"Cannot open X display {display}")
+        if not xext.XShmQueryExtension(self._display):
+            x11.XCloseDisplay(self._display)
+            self._display = None
+            raise RuntimeError(f"X display {display} has no MIT-SHM extension")
+        self._lock = threading.Lock()
+        self._segments = {}   # (width, height, depth, visual) -> _Segment
+        self.grabs = 0
+        self.failures = 0
+        self.occluded = 0
+        self.blank = 0
+
+    def capture(self, window_id):
+        """BGR image (height, width, 3) of a window ('0x...' or int), or None if it cannot be grabbed."""
+        window = int(window_id, 0) if isinstance(window_id, str) else int(window_id)
+        x11, xext, _ = _load_libraries()
+        with self._lock:
+            if self._display is None:
+                return None
+            _last_error[0] = 0
+            frame, above = self._frame(window)
+            attributes = XWindowAttributes()
+            if (frame is None
+                    or not x11.XGetWindowAttributes(self._display, frame, ctypes.byref(attributes))
+                    or attributes.map_state != IS_VIEWABLE or attributes.width <= 0 or attributes.height <= 0):
+                self.failures += 1
+                return None
+            if self._covered(attributes, above):
+                self.occluded += 1
+                return None
+            try:
+                segment = self._segment(attributes)
+            except (RuntimeError, OSError) as e:
+                print(f"XShm capture of {window_id} unavailable: {e}")
+                self.failures += 1
+                return None
+            if not xext.XShmGetImage(self._display, frame, segment.image, 0, 0, ALL_PLANES) or _last_error[0]:
+                self.failures += 1
+                return None
+            # Copy out: the segment is overwritten by the next grab of this size
+            image = segment.pixels[:attributes.height, :attributes.width, :3].copy()
+            if is_blank(image):
+                self.blank += 1
+                return None
+            self.grabs += 1
+            return image
+
+    def _children(self, window):
+        """(root, parent, children bottom to top) of a window, or None if it is gone."""
+        x11, _, _ = _load_libraries()
+        root, parent = ctypes.c_ulong(), ctypes.c_ulong()
+        children, count = ctypes.POINTER(ctypes.c_ulong)(), ctypes.c_uint()
+        if not x11.XQueryTree(self._display, window, ctypes.byref(root), ctypes.byref(parent),
+                              ctypes.byref(children), ctypes.byref(count)) or _last_error[0]:
+            return None
+        stacking = children[:count.value]
+        if children:
+            x11.XFree(children)
+        return root.value, parent.value, stacking
+
+    def _frame(self, window):
+        """(top-level ancestor of a window, top-level windows stacked above it)."""
+        tree = self._children(window)
+        while tree is not None and tree[1] != tree[0]:
+            window = tree[1]
+            tree = self._children(window)
+        if tree is None:
+            return None, []
+        siblings = self._children(tree[0])
+        if siblings is None or window not in siblings[2]:
+            return None, []
+        stacking = siblings[2]
+        return window, stacking[stacking.index(window) + 1:]
+
+    def _covered(self, attributes, above):
+        """Whether a viewable window in above overlaps the frame described by attributes."""
+        x11, _, _ = _load_libraries()
+        border = 2 * attributes.border_width
+        frame = (attributes.x, attributes.y, attributes.width + border, attributes.height + border)
+        other = XWindowAttributes()
+        for window in above:
+            if (x11.XGetWindowAttributes(self._display, window, ctypes.byref(other))
+                    and other.map_state == IS_VIEWABLE
+                    and overlaps(frame, (other.x, other.y, other.width + 2 * other.border_width,
+                                         other.height + 2 * other.border_width))):
+                return True
+        return False
+
+    def _segment(self, attributes):
+        key = (attributes.width, attributes.height, attributes.depth, attributes.visual)
+        segment = self._segments.pop(key, None)
+        if segment is None:
+            if len(self._segments) >= MAX_SEGMENTS:
+                self._segments.pop(next(iter(self._segments))).close()
+            segment = _Segment(self._display, attributes)
+        self._segments[key] = segment   # most recently used last
+        return segment
+
+    def stats(self):
+        return {'backend': 'xshm', 'display': self.display_name, 'grabs': self.grabs,
+                'failures': self.failures, 'occluded': self.occluded, 'blank': self.blank,
+                'segments': len(self._segments)}
+
+    def close(self):
+        x11, _, _ = _load_libraries()
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            if self._display is not None:
+                x11.XCloseDisplay(self._display)
+                self._display = None